@@ -1,8 +1,28 @@
 import os
 from celery import Celery
 from celery.schedules import crontab
+from kombu import Queue
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+# Проверки Django при старте воркера импортируют URLconf со всеми
+# представлениями; их выполняют manage.py check и веб-процессы при деплое.
+# CELERY_SKIP_CHECKS= (пустое значение) возвращает проверки
+os.environ.setdefault("CELERY_SKIP_CHECKS", "True")
+
+# Очереди по типу нагрузки: долгая рассылка не задерживает оплату,
+# а ночной обход пользователей — уведомления. Каждую очередь обслуживает
+# свой воркер с подходящим пулом и параллелизмом (см. README)
+DEFAULT_QUEUE = 'celery'
+NOTIFICATIONS_QUEUE = 'notifications'
+MAINTENANCE_QUEUE = 'maintenance'
+PAYMENTS_QUEUE = 'payments'
+MEDIA_QUEUE = 'media'
+
+# Приоритет внутри очереди, брокер Redis: 0 — наивысший, 9 — низший
+# (в RabbitMQ шкала обратная)
+HIGH_PRIORITY = 0
+DEFAULT_PRIORITY = 5
+LOW_PRIORITY = 9
 
 app = Celery("config")
 app.config_from_object("django.conf:settings", namespace="CELERY")
@@ -13,9 +33,64 @@ app.conf.beat_schedule = {
         'schedule': crontab(hour=0, minute=0),
     },
 }
-app.conf.task_default_queue = 'celery'
+app.conf.task_default_queue = DEFAULT_QUEUE
+# Ключ маршрутизации у каждой очереди свой, иначе обменник direct
+# доставит сообщение во все очереди с общим ключом
+app.conf.task_queues = tuple(
+    Queue(name, routing_key=name)
+    for name in (
+        DEFAULT_QUEUE,
+        NOTIFICATIONS_QUEUE,
+        MAINTENANCE_QUEUE,
+        PAYMENTS_QUEUE,
+        MEDIA_QUEUE,
+    )
+)
 app.conf.task_routes = {
-    'materials.tasks.*': {'queue': 'celery'}
+    # Планировщик рассылки идет раньше уже поставленных пакетов писем:
+    # рассылка по новому обновлению начинается, не дожидаясь чужих пакетов
+    'materials.tasks.send_course_update_notification': {
+        'queue': NOTIFICATIONS_QUEUE,
+        'priority': HIGH_PRIORITY,
+    },
+    'materials.tasks.send_course_update_batch': {
+        'queue': NOTIFICATIONS_QUEUE,
+        'priority': DEFAULT_PRIORITY,
+    },
+    'users.tasks.check_inactive_users': {
+        'queue': MAINTENANCE_QUEUE,
+        'priority': LOW_PRIORITY,
+    },
+    'users.tasks.create_checkout_session': {
+        'queue': PAYMENTS_QUEUE,
+        'priority': HIGH_PRIORITY,
+    },
+    # Перекодирование изображений нагружает процессор: отдельный пул процессов
+    'materials.tasks.generate_image_variants': {
+        'queue': MEDIA_QUEUE,
+        'priority': DEFAULT_PRIORITY,
+    },
 }
-app.conf.worker_pool = 'solo'
-app.conf.broker_connection_retry_on_startup = True
\ No newline at end of file
+app.conf.task_default_priority = DEFAULT_PRIORITY
+# Redis поддерживает приоритеты через подочереди на каждый уровень
+app.conf.broker_transport_options = {
+    'queue_order_strategy': 'priority',
+    'priority_steps': list(range(10)),
+    'sep': ':',
+}
+
+# Пул и параллелизм задаются окружением для каждого воркера; параметры
+# командной строки (-P, -c) их переопределяют. Пулы eventlet и gevent
+# указываются только через -P: подмена стандартной библиотеки должна
+# произойти до импорта остальных модулей
+app.conf.worker_pool = os.getenv('CELERY_WORKER_POOL') or 'prefork'
+app.conf.worker_concurrency = int(os.getenv('CELERY_WORKER_CONCURRENCY') or 0) or None
+# Воркер берет по одной задаче на процесс: длинные задачи не копятся
+# за занятым процессом, и приоритеты соблюдаются
+app.conf.worker_prefetch_multiplier = int(
+    os.getenv('CELERY_WORKER_PREFETCH_MULTIPLIER') or 1
+)
+app.conf.worker_max_tasks_per_child = (
+    int(os.getenv('CELERY_WORKER_MAX_TASKS_PER_CHILD') or 0) or None
+)
+app.conf.broker_connection_retry_on_startup = True
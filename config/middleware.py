@@ -0,0 +1,199 @@
+import heapq
+import json
+import logging
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils.functional import LazyObject, empty
+
+logger = logging.getLogger("config.sql")
+
+# Длина SQL в логах и заголовках: хвост длинных IN (...) не нужен
+SQL_PREVIEW_LENGTH = 300
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Запрос выполнил больше SQL, чем разрешает бюджет представления."""
+
+
+class QueryStats:
+    """execute_wrapper: считает запросы, их суммарное время и самые медленные."""
+
+    def __init__(self, slowest=3):
+        self.count = 0
+        self.duration = 0.0
+        self.slowest_limit = slowest
+        self._slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.count += 1
+            self.duration += duration
+            if self.slowest_limit:
+                entry = (duration, self.count, sql[:SQL_PREVIEW_LENGTH])
+                if len(self._slowest) < self.slowest_limit:
+                    heapq.heappush(self._slowest, entry)
+                else:
+                    heapq.heappushpop(self._slowest, entry)
+
+    @property
+    def slowest(self):
+        return [
+            {"ms": round(duration * 1000, 2), "sql": sql}
+            for duration, _, sql in sorted(self._slowest, reverse=True)
+        ]
+
+
+# Счетчик текущего запроса. Контекст копируется в потоки sync_to_async,
+# поэтому запросы асинхронного ORM из async-представлений тоже учитываются
+_current_stats = ContextVar("query_stats", default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    stats = _current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats(execute, sql, params, many, context)
+
+
+def install_query_recorder(connection, **kwargs):
+    """Постоянный execute_wrapper соединения, пишущий в счетчик запроса."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+# Соединения открываются в разных потоках (в том числе в потоке асинхронного
+# ORM), поэтому счетчик подключается к каждому новому соединению
+connection_created.connect(install_query_recorder)
+
+
+def get_query_budget(request, view_func):
+    """
+    Бюджет SQL-запросов представления или None.
+
+    QUERY_BUDGETS в настройках (по имени URL) важнее атрибута query_budget
+    класса представления. Атрибут — число либо словарь по действию ViewSet
+    ("list", "retrieve") или HTTP-методу ("get", "post").
+    """
+    match = request.resolver_match
+    if match is not None and match.view_name in settings.QUERY_BUDGETS:
+        return settings.QUERY_BUDGETS[match.view_name]
+    budget = getattr(getattr(view_func, "cls", view_func), "query_budget", None)
+    if isinstance(budget, dict):
+        method = request.method.lower()
+        action = getattr(view_func, "actions", None) or {}
+        budget = budget.get(action.get(method), budget.get(method))
+    return budget
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Счетчики SQL на каждый запрос без DEBUG=True.
+
+    Число запросов, время в БД и самые медленные запросы пишутся в лог
+    config.sql (JSON), а для staff — в заголовки X-DB-Queries, X-DB-Time-Ms и
+    Server-Timing. Превышение бюджета запросов — предупреждение в логе, а
+    при QUERY_BUDGET_STRICT (тесты) — исключение QueryBudgetExceeded.
+
+    Работает и в синхронной, и в асинхронной цепочке middleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        # Соединения, открытые до загрузки middleware (например, в тестах)
+        for connection in connections.all():
+            install_query_recorder(connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not settings.SQL_INSTRUMENTATION:
+            return self.get_response(request)
+
+        stats = QueryStats(slowest=settings.SQL_SLOWEST_STATEMENTS)
+        token = _current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_stats.reset(token)
+        user = getattr(request, "user", None)
+        return self.process_stats(request, response, stats, started, user)
+
+    async def __acall__(self, request):
+        if not settings.SQL_INSTRUMENTATION:
+            return await self.get_response(request)
+
+        stats = QueryStats(slowest=settings.SQL_SLOWEST_STATEMENTS)
+        token = _current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_stats.reset(token)
+        # Ленивый request.user сессии нельзя вычислять в цикле событий;
+        # пользователя, найденного DRF по JWT, представление уже подставило
+        user = getattr(request, "user", None)
+        if isinstance(user, LazyObject) and user._wrapped is empty:
+            user = await request.auser()
+        return self.process_stats(request, response, stats, started, user)
+
+    def process_stats(self, request, response, stats, started, user):
+        elapsed = time.perf_counter() - started
+        # Бюджет определяется после ответа: resolver_match уже известен,
+        # и не нужен process_view, который в async-режиме ушел бы в поток
+        match = request.resolver_match
+        budget = get_query_budget(request, match.func) if match else None
+        exceeded = budget is not None and stats.count > budget
+        self.log(request, response, stats, elapsed, budget, exceeded)
+        self.add_headers(response, stats, user)
+        if exceeded and settings.QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(
+                f"{request.method} {request.path}: {stats.count} SQL-запросов "
+                f"при бюджете {budget}\n"
+                + "\n".join(item["sql"] for item in stats.slowest)
+            )
+        return response
+
+    def log(self, request, response, stats, elapsed, budget, exceeded):
+        level = logging.WARNING if exceeded else logging.INFO
+        if not logger.isEnabledFor(level):
+            return
+        match = request.resolver_match
+        record = {
+            "method": request.method,
+            "path": request.path,
+            "view": match.view_name if match else None,
+            "status": response.status_code,
+            "queries": stats.count,
+            "db_ms": round(stats.duration * 1000, 2),
+            "total_ms": round(elapsed * 1000, 2),
+            "budget": budget,
+            "budget_exceeded": exceeded,
+            "slowest": stats.slowest,
+        }
+        logger.log(level, json.dumps(record, ensure_ascii=False), extra={"sql": record})
+
+    def add_headers(self, response, stats, user):
+        if not (
+            settings.SQL_INSTRUMENTATION_HEADERS or getattr(user, "is_staff", False)
+        ):
+            return
+        db_ms = round(stats.duration * 1000, 2)
+        response.headers["X-DB-Queries"] = str(stats.count)
+        response.headers["X-DB-Time-Ms"] = str(db_ms)
+        response.headers["Server-Timing"] = f'db;dur={db_ms};desc="{stats.count} SQL"'
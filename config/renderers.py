@@ -0,0 +1,79 @@
+import math
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson необязателен
+    orjson = None
+
+# Нестандартные значения (datetime, Decimal, ленивые строки перевода и т.п.)
+# orjson передает в default кодировщика DRF, поэтому результат совпадает
+# с JSONRenderer
+ORJSON_OPTIONS = (
+    orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS if orjson else 0
+)
+
+
+def has_non_finite_float(data):
+    """Есть ли в данных NaN или бесконечность (orjson пишет их как null)."""
+    if isinstance(data, float):
+        return not math.isfinite(data)
+    if isinstance(data, dict):
+        return any(has_non_finite_float(value) for value in data.values())
+    if isinstance(data, (list, tuple)):
+        return any(has_non_finite_float(value) for value in data)
+    return False
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer на orjson.
+
+    Без orjson, с отступами (?indent, browsable API) и для значений, которые
+    orjson не кодирует (например, целые больше 64 бит), работает как
+    JSONRenderer DRF. NaN и бесконечность orjson молча пишет как null,
+    поэтому такие ответы тоже отдаются JSONRenderer: в строгом режиме он,
+    как и без orjson, отклоняет их с ValueError.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None or orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data, default=JSONEncoder().default, option=ORJSON_OPTIONS
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Нечисловое значение могло превратиться только в null, поэтому ответы
+        # без null не проверяются
+        if b"null" in ret and has_non_finite_float(data):
+            return super().render(data, accepted_media_type, renderer_context)
+        # Как в JSONRenderer: U+2028 и U+2029 экранируются для встраивания в JS
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+            b"\xe2\x80\xa9", b"\\u2029"
+        )
+
+
+class ORJSONParser(JSONParser):
+    """JSONParser на orjson; без orjson работает как JSONParser DRF."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        try:
+            body = stream.read()
+            if encoding.lower().replace("-", "") != "utf8":
+                body = body.decode(encoding)
+            return orjson.loads(body)
+        except (orjson.JSONDecodeError, UnicodeDecodeError) as exc:
+            raise ParseError("JSON parse error - %s" % str(exc))
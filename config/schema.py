@@ -0,0 +1,159 @@
+import hashlib
+import json
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+from django.conf import settings
+from django.http import Http404, HttpRequest, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from drf_yasg import openapi
+from rest_framework.request import Request
+
+SCHEMA_INFO = openapi.Info(
+    title="LSM Education Platform API",
+    default_version="v1",
+    description="API для управления курсами, уроками, пользователями и платежами.",
+    terms_of_service="https://your-terms-url.com/",
+    contact=openapi.Contact(email="support@lsm-education.com"),
+    license=openapi.License(name="Proprietary License"),
+)
+
+MANIFEST_NAME = "manifest.json"
+CONTENT_TYPES = {
+    "json": "application/json",
+    "yaml": "application/yaml; charset=utf-8",
+}
+# Имя файла с хэшем содержимого не меняется без изменения схемы
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+
+@dataclass(frozen=True)
+class SchemaArtifact:
+    schema_hash: str
+    contents: dict
+
+    @property
+    def etag(self):
+        return f'"{self.schema_hash}"'
+
+    def file_name(self, extension):
+        return f"openapi.{self.schema_hash}.{extension}"
+
+
+def generate_schema():
+    """
+    Строит схему OpenAPI обходом всех представлений (сотни миллисекунд).
+
+    Схема строится для анонимного запроса и не зависит от хоста: он берется
+    из SWAGGER_SETTINGS["DEFAULT_API_URL"], а без него клиенты используют
+    хост, с которого получена схема.
+    """
+    # Генератор и кодеки (YAML, валидаторы) нужны только при построении схемы
+    from drf_yasg.app_settings import swagger_settings
+    from drf_yasg.codecs import OpenAPICodecJson, OpenAPICodecYaml
+    from drf_yasg.generators import OpenAPISchemaGenerator
+
+    generator = OpenAPISchemaGenerator(
+        SCHEMA_INFO, url=swagger_settings.DEFAULT_API_URL or ""
+    )
+    request = Request(HttpRequest(), authenticators=())
+    schema = generator.get_schema(request=request, public=True)
+    contents = {
+        "json": OpenAPICodecJson(validators=[]).encode(schema),
+        "yaml": OpenAPICodecYaml(validators=[]).encode(schema),
+    }
+    schema_hash = hashlib.sha256(contents["json"]).hexdigest()[:12]
+    return SchemaArtifact(schema_hash, contents)
+
+
+def write_schema_artifact(artifact, directory=None):
+    """Сохраняет файлы схемы с хэшем в имени и манифест с текущим хэшем."""
+    directory = Path(directory or settings.OPENAPI_SCHEMA_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    for extension, content in artifact.contents.items():
+        (directory / artifact.file_name(extension)).write_bytes(content)
+    # Манифест пишется последним и атомарно: читатели не увидят его раньше файлов
+    manifest = directory / MANIFEST_NAME
+    temporary = manifest.with_suffix(".tmp")
+    temporary.write_text(json.dumps({"hash": artifact.schema_hash}))
+    temporary.replace(manifest)
+    return directory
+
+
+def read_schema_artifact(directory=None):
+    """Загружает сохраненную схему или возвращает None, если ее нет."""
+    directory = Path(directory or settings.OPENAPI_SCHEMA_DIR)
+    try:
+        schema_hash = json.loads((directory / MANIFEST_NAME).read_text())["hash"]
+        artifact = SchemaArtifact(schema_hash, {})
+        contents = {
+            extension: (directory / artifact.file_name(extension)).read_bytes()
+            for extension in CONTENT_TYPES
+        }
+    except (OSError, ValueError, KeyError):
+        return None
+    return SchemaArtifact(schema_hash, contents)
+
+
+_artifact = None
+_artifact_lock = threading.Lock()
+
+
+def get_schema_artifact():
+    """
+    Схема текущего процесса: из файлов generate_schema либо построенная
+    при первом запросе (только в памяти процесса).
+
+    Без OPENAPI_SCHEMA_FILES (по умолчанию в DEBUG) файлы не используются:
+    dev-сервер перезапускается при изменении кода, и схема строится заново.
+    """
+    global _artifact
+    if _artifact is None:
+        with _artifact_lock:
+            if _artifact is None:
+                artifact = None
+                if settings.OPENAPI_SCHEMA_FILES:
+                    artifact = read_schema_artifact()
+                if artifact is None:
+                    # Построенная на лету схема остается в памяти: записанный
+                    # манифест отдавался бы и после деплоя новой версии кода
+                    artifact = generate_schema()
+                _artifact = artifact
+    return _artifact
+
+
+def reset_schema_artifact():
+    global _artifact
+    _artifact = None
+
+
+def schema_response(request, artifact, extension, max_age, immutable=False):
+    response = get_conditional_response(request, etag=artifact.etag)
+    if response is None:
+        response = HttpResponse(
+            artifact.contents[extension], content_type=CONTENT_TYPES[extension]
+        )
+    response.headers["ETag"] = artifact.etag
+    patch_cache_control(response, public=True, max_age=max_age, immutable=immutable)
+    return response
+
+
+def schema_file_view(request, format):
+    """swagger.json / swagger.yaml: постоянный адрес, короткий кэш и ETag."""
+    extension = format.lstrip(".")
+    if extension not in CONTENT_TYPES:
+        raise Http404
+    return schema_response(
+        request, get_schema_artifact(), extension, settings.OPENAPI_SCHEMA_MAX_AGE
+    )
+
+
+def schema_artifact_view(request, schema_hash, extension):
+    """openapi.<hash>.json: неизменяемый файл, кэшируется на год."""
+    artifact = get_schema_artifact()
+    if schema_hash != artifact.schema_hash:
+        raise Http404
+    return schema_response(
+        request, artifact, extension, IMMUTABLE_MAX_AGE, immutable=True
+    )
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 import os
+import sys
 from datetime import timedelta
 from pathlib import Path
 from dotenv import load_dotenv
@@ -28,11 +29,17 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = os.getenv("SECRET_KEY")
 STRIPE_API_KEY = os.getenv("STRIPE_API_KEY")
 STRIPE_PUBLIC_KEY = os.getenv("STRIPE_PUBLIC_KEY")
+# Адрес API Stripe (например, локального stripe-mock); по умолчанию — боевой
+STRIPE_API_BASE = os.getenv("STRIPE_API_BASE")
+# Создавать платежные сессии в фоне (Celery) вместо потока запроса
+STRIPE_ASYNC_CHECKOUT = os.getenv("STRIPE_ASYNC_CHECKOUT") == "True"
+# Через сколько секунд клиенту повторить опрос статуса платежа (Retry-After)
+PAYMENT_STATUS_RETRY_AFTER = int(os.getenv("PAYMENT_STATUS_RETRY_AFTER") or 1)
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.getenv("DEBUG") == "True"
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [host for host in os.getenv("ALLOWED_HOSTS", "").split(",") if host]
 
 
 # Application definition
@@ -44,6 +51,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "rest_framework_simplejwt",
     "drf_yasg",
@@ -54,6 +62,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "config.middleware.QueryInstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -83,6 +92,16 @@ TEMPLATES = [
 WSGI_APPLICATION = "config.wsgi.application"
 
 
+# Кодировщик JSON для API: "orjson" (быстрее, если пакет установлен) или "json"
+API_JSON_BACKEND = os.getenv("API_JSON_BACKEND") or "orjson"
+
+if API_JSON_BACKEND == "orjson":
+    JSON_RENDERER_CLASS = "config.renderers.ORJSONRenderer"
+    JSON_PARSER_CLASS = "config.renderers.ORJSONParser"
+else:
+    JSON_RENDERER_CLASS = "rest_framework.renderers.JSONRenderer"
+    JSON_PARSER_CLASS = "rest_framework.parsers.JSONParser"
+
 REST_FRAMEWORK = {
     "DEFAULT_FILTER_BACKENDS": ["django_filters.rest_framework.DjangoFilterBackend"],
     "DEFAULT_AUTHENTICATION_CLASSES": (
@@ -93,6 +112,15 @@ REST_FRAMEWORK = {
     ],
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 10,
+    "DEFAULT_RENDERER_CLASSES": [
+        JSON_RENDERER_CLASS,
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        JSON_PARSER_CLASS,
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
 }
 
 
@@ -111,6 +139,51 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# Без CACHE_LOCATION у каждого процесса свой кэш в памяти: сброс версий
+# в одном веб-воркере или в Celery не виден остальным процессам, поэтому
+# зависящие от сброса кэши по умолчанию выключены (materials.checks)
+SHARED_CACHE = bool(os.getenv("CACHE_LOCATION"))
+
+if SHARED_CACHE:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("CACHE_LOCATION"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Время жизни закэшированной роли пользователя (модератор), в секундах.
+# Без общего кэша сброс роли виден только своему процессу: срок короткий,
+# чтобы снятые права модератора не действовали в других процессах
+ROLE_CACHE_TIMEOUT = int(
+    os.getenv("ROLE_CACHE_TIMEOUT") or (60 * 60 if SHARED_CACHE else 10)
+)
+
+# Время жизни кэша ответов курсов (список и детали), в секундах; 0 отключает кэш.
+# Без общего кэша по умолчанию выключен
+COURSE_RESPONSE_CACHE_TIMEOUT = int(
+    os.getenv("COURSE_RESPONSE_CACHE_TIMEOUT") or (300 if SHARED_CACHE else 0)
+)
+
+
+# ETag и Last-Modified материалов строятся по версиям в кэше: без общего
+# кэша процессы отвечали бы 304 по своим устаревшим версиям
+CONDITIONAL_GET = os.getenv("CONDITIONAL_GET", str(SHARED_CACHE)) == "True"
+
+
+# Сколько последних платежей показывать у пользователя в списке пользователей
+USER_LIST_RECENT_PAYMENTS = int(os.getenv("USER_LIST_RECENT_PAYMENTS") or 3)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -150,6 +223,19 @@ STATIC_URL = "static/"
 MEDIA_URL = "media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# Схема OpenAPI: файлы openapi.<hash>.json/.yaml, которые пишет generate_schema
+# при деплое; без них схема строится при первом запросе в памяти процесса
+OPENAPI_SCHEMA_DIR = os.getenv("OPENAPI_SCHEMA_DIR") or os.path.join(BASE_DIR, "schema")
+# Отдавать схему из этих файлов; без них схема строится заново при каждом
+# запуске процесса (разработка: код меняется между перезапусками)
+OPENAPI_SCHEMA_FILES = os.getenv("OPENAPI_SCHEMA_FILES", str(not DEBUG)) == "True"
+# Кэш swagger.json/.yaml по постоянному адресу, в секундах; дальше — ETag
+OPENAPI_SCHEMA_MAX_AGE = int(os.getenv("OPENAPI_SCHEMA_MAX_AGE") or 60 * 5)
+
+# Swagger UI и ReDoc берут готовую схему, а не генерируют ее на каждый запрос
+SWAGGER_SETTINGS = {"SPEC_URL": ("schema-json", {"format": ".json"})}
+REDOC_SETTINGS = {"SPEC_URL": ("schema-json", {"format": ".json"})}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -166,6 +252,8 @@ CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL")
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND")
 CELERY_TIMEZONE = "UTC"
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
+# Размер пакета при ночной деактивации неактивных пользователей
+INACTIVE_USERS_BATCH_SIZE = int(os.getenv("INACTIVE_USERS_BATCH_SIZE") or 1000)
 
 EMAIL_BACKEND = os.getenv('EMAIL_BACKEND')
 EMAIL_HOST = os.getenv('EMAIL_HOST')
@@ -174,4 +262,43 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 EMAIL_USE_TLS = True if os.getenv('EMAIL_USE_TLS') == 'True' else False
 EMAIL_USE_SSL = True if os.getenv('EMAIL_USE_SSL') == 'True' else False
-DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
\ No newline at end of file
+DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
+
+# Размер пакета адресов в одной задаче рассылки об обновлении курса
+COURSE_NOTIFICATION_BATCH_SIZE = int(os.getenv("COURSE_NOTIFICATION_BATCH_SIZE") or 100)
+# Окно (в секундах), в котором обновления курса сливаются в одно уведомление; 0 — без задержки.
+# Ожидающие изменения хранятся в кэше и читаются воркером: без общего кэша окна нет
+COURSE_NOTIFICATION_DEBOUNCE_SECONDS = int(
+    os.getenv("COURSE_NOTIFICATION_DEBOUNCE_SECONDS") or (60 if SHARED_CACHE else 0)
+)
+# Счетчики SQL на каждый запрос (config.middleware.QueryInstrumentationMiddleware)
+SQL_INSTRUMENTATION = os.getenv("SQL_INSTRUMENTATION", "True") == "True"
+# Заголовки X-DB-* для всех пользователей, а не только staff
+SQL_INSTRUMENTATION_HEADERS = os.getenv("SQL_INSTRUMENTATION_HEADERS") == "True"
+# Сколько самых медленных запросов попадает в лог
+SQL_SLOWEST_STATEMENTS = int(os.getenv("SQL_SLOWEST_STATEMENTS") or 3)
+# Бюджеты SQL-запросов по имени URL, например {"materials:course-list": 5};
+# дополняют атрибут query_budget представлений
+QUERY_BUDGETS = {}
+# Превышение бюджета роняет запрос (в тестах), иначе только предупреждение в логе
+QUERY_BUDGET_STRICT = (
+    os.getenv("QUERY_BUDGET_STRICT") == "True"
+    or sys.argv[1:2] == ["test"]
+    or "pytest" in sys.modules
+)
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        # INFO — строка на каждый запрос, WARNING — только превышения бюджета
+        "config.sql": {
+            "handlers": ["console"],
+            "level": os.getenv("SQL_LOG_LEVEL") or "WARNING",
+            "propagate": False,
+        },
+    },
+}
@@ -20,33 +20,46 @@ from django.urls import path, include
 
 from django.urls import re_path
 from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-
-schema_view = get_schema_view(
-    openapi.Info(
-        title="LSM Education Platform API",
-        default_version="v1",
-        description="API для управления курсами, уроками, пользователями и платежами.",
-        terms_of_service="https://your-terms-url.com/",
-        contact=openapi.Contact(email="support@lsm-education.com"),
-        license=openapi.License(name="Proprietary License"),
-    ),
-    public=True,
-    permission_classes=(permissions.AllowAny,),
-)
+
+from config.schema import SCHEMA_INFO, schema_artifact_view, schema_file_view
+
+
+def schema_ui_view(renderer):
+    """
+    Swagger UI или ReDoc: только HTML-страница, схему UI загружает с SPEC_URL,
+    а ?format=openapi не запускает генерацию на каждый запрос.
+
+    drf_yasg.views тянет генератор, YAML и валидаторы схемы, поэтому
+    импортируется при первом открытии страницы, а не при старте процесса.
+    """
+    view = None
+
+    def lazy_view(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            from drf_yasg.views import UI_RENDERERS, get_schema_view
+
+            schema_view = get_schema_view(
+                SCHEMA_INFO,
+                public=True,
+                permission_classes=(permissions.AllowAny,),
+            )
+            view = schema_view.as_cached_view(renderer_classes=UI_RENDERERS[renderer])
+        return view(request, *args, **kwargs)
+
+    return lazy_view
+
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("materials/", include("materials.urls", namespace="materials")),
     path("users/", include("users.urls", namespace="users")),
-    path(
-        "swagger<format>/", schema_view.without_ui(cache_timeout=0), name="schema-json"
-    ),
-    path(
-        "swagger/",
-        schema_view.with_ui("swagger", cache_timeout=0),
-        name="schema-swagger-ui",
+    path("swagger<format>/", schema_file_view, name="schema-json"),
+    re_path(
+        r"^schema/openapi\.(?P<schema_hash>[0-9a-f]{12})\.(?P<extension>json|yaml)$",
+        schema_artifact_view,
+        name="schema-artifact",
     ),
-    path("redoc/", schema_view.with_ui("redoc", cache_timeout=0), name="schema-redoc"),
+    path("swagger/", schema_ui_view("swagger"), name="schema-swagger-ui"),
+    path("redoc/", schema_ui_view("redoc"), name="schema-redoc"),
 ]
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class MaterialsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "materials"
+
+    def ready(self):
+        import materials.checks  # noqa: F401
+        import materials.signals  # noqa: F401
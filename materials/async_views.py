@@ -0,0 +1,351 @@
+from inspect import isawaitable
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse
+from django.shortcuts import aget_object_or_404
+from rest_framework import exceptions, status
+from rest_framework.generics import GenericAPIView
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+
+from materials.caching import (
+    CONTENT_MODIFIED_KEY,
+    CONTENT_VERSION_KEY,
+    acourse_detail_cache_key,
+    acourse_list_cache_key,
+    aconditional_validators,
+    aget_cached_response_data,
+    aget_modified,
+    aget_subscribed_course_ids,
+    course_modified_key,
+    course_version_key,
+    drop_fields,
+    make_etag,
+    merge_user_fields,
+    response_cache_enabled,
+    strip_user_fields,
+)
+from materials.mixins import ConditionalGetMixin, SparseFieldsetViewMixin
+from materials.models import Course, Lesson, Subscription
+from materials.paginators import (
+    CoursePaginator,
+    CourseCursorPaginator,
+    CursorPaginationMixin,
+    LessonPaginator,
+    LessonCursorPaginator,
+)
+from materials.serializers import (
+    CourseDetailSerializer,
+    CourseSerializer,
+    LessonSerializer,
+)
+from materials.views import CourseAnnotationMixin
+from users.authentication import AsyncJWTAuthentication
+from users.permissions import IsModer, IsOwner, aprepare_permissions
+
+
+class AsyncAPIView(APIView):
+    """
+    APIView с асинхронными обработчиками (async def get/post) для ASGI.
+
+    Аутентификация, роль пользователя и данные загружаются через асинхронный
+    ORM, поэтому медленный клиент или ожидание БД не держат поток. Проверки
+    прав — те же синхронные классы DRF: роль модератора для IsModer
+    загружается заранее (aprepare_permissions), и проверка идет без
+    ввода-вывода. Отвечает только JSON: browsable API рендерит формы
+    синхронно.
+    """
+
+    authentication_classes = (AsyncJWTAuthentication,)
+    renderer_classes = tuple(
+        renderer
+        for renderer in api_settings.DEFAULT_RENDERER_CLASSES
+        if not issubclass(renderer, BrowsableAPIRenderer)
+    )
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.ainitial(request, *args, **kwargs)
+            method = request.method.lower()
+            if method in self.http_method_names:
+                handler = getattr(self, method, self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if isawaitable(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.render_response(self.response)
+
+    async def ainitial(self, request, *args, **kwargs):
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+        neg = self.perform_content_negotiation(request)
+        request.accepted_renderer, request.accepted_media_type = neg
+        version, scheme = self.determine_version(request, *args, **kwargs)
+        request.version, request.versioning_scheme = version, scheme
+
+        await self.aperform_authentication(request)
+        await aprepare_permissions(request, self.get_permissions())
+        self.check_permissions(request)
+        self.check_throttles(request)
+
+    async def aperform_authentication(self, request):
+        """Аутентификация DRF; аутентификаторы без aauthenticate — в потоке."""
+        try:
+            for authenticator in request.authenticators:
+                if hasattr(authenticator, "aauthenticate"):
+                    user_auth_tuple = await authenticator.aauthenticate(request)
+                else:
+                    user_auth_tuple = await sync_to_async(authenticator.authenticate)(
+                        request
+                    )
+                if user_auth_tuple is not None:
+                    request._authenticator = authenticator
+                    request.user, request.auth = user_auth_tuple
+                    return
+        except exceptions.APIException:
+            self.set_unauthenticated(request)
+            raise
+        self.set_unauthenticated(request)
+
+    def set_unauthenticated(self, request):
+        request._authenticator = None
+        request.user = (
+            api_settings.UNAUTHENTICATED_USER()
+            if api_settings.UNAUTHENTICATED_USER
+            else None
+        )
+        request.auth = (
+            api_settings.UNAUTHENTICATED_TOKEN()
+            if api_settings.UNAUTHENTICATED_TOKEN
+            else None
+        )
+
+    def render_response(self, response):
+        # Response DRF Django дорендерил бы в отдельном потоке; готовый
+        # HttpResponse отдается из цикла событий без перехода в поток
+        if not isinstance(response, Response):
+            return response
+        response.render()
+        return HttpResponse(
+            response.content, status=response.status_code, headers=response.headers
+        )
+
+
+class AsyncGenericAPIView(AsyncAPIView, GenericAPIView):
+    """GenericAPIView для async-представлений: объект и страница без блокировки."""
+
+    async def aget_object(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        filter_kwargs = {self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        obj = await aget_object_or_404(queryset, **filter_kwargs)
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    async def apaginate_queryset(self, queryset):
+        """
+        Страница результатов или None без пагинации.
+
+        Пагинаторы DRF синхронные: COUNT, выборка страницы и prefetch
+        выполняются одним переходом в поток ORM — так же работают и
+        асинхронные методы QuerySet, но здесь переход один на страницу.
+        """
+        if self.paginator is None:
+            return None
+        return await sync_to_async(self.paginator.paginate_queryset)(
+            queryset, self.request, view=self
+        )
+
+    async def alist(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = await self.apaginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        objects = [obj async for obj in queryset]
+        return Response(self.get_serializer(objects, many=True).data)
+
+    async def aretrieve(self, request):
+        instance = await self.aget_object()
+        return Response(self.get_serializer(instance).data)
+
+
+class AsyncCourseMixin(
+    ConditionalGetMixin,
+    CursorPaginationMixin,
+    CourseAnnotationMixin,
+    SparseFieldsetViewMixin,
+):
+    """Выборка курсов как в CourseViewSet: sparse fieldset и аннотации."""
+
+    queryset = Course.objects.defer("search_vector")
+
+    def get_queryset(self):
+        queryset = self.apply_sparse_fieldset(super().get_queryset()).order_by("id")
+        return self.annotate_course_fields(queryset)
+
+
+class AsyncCourseListView(AsyncCourseMixin, AsyncGenericAPIView):
+    """Асинхронный вариант списка курсов (CourseViewSet.list)."""
+
+    serializer_class = CourseSerializer
+    pagination_class = CoursePaginator
+    cursor_pagination_class = CourseCursorPaginator
+    query_budget = 5
+
+    async def get(self, request, *args, **kwargs):
+        etag, last_modified = await aconditional_validators(
+            request, CONTENT_VERSION_KEY, CONTENT_MODIFIED_KEY, personal=True
+        )
+        return await self.aconditional_get(
+            request, self.list_response, etag, last_modified
+        )
+
+    async def list_response(self):
+        if not response_cache_enabled():
+            return await self.alist(self.request)
+        self.sparse_fieldset_extra_fields = self.user_merge_fields()
+        data = await aget_cached_response_data(
+            await acourse_list_cache_key(self.request), self.shared_list_data
+        )
+        subscribed = await aget_subscribed_course_ids(self.request.user)
+        data = merge_user_fields(data, subscribed)
+        return Response(drop_fields(data, self.sparse_fieldset_extra_fields))
+
+    async def shared_list_data(self):
+        return strip_user_fields((await self.alist(self.request)).data)
+
+
+class AsyncCourseDetailView(AsyncCourseMixin, AsyncGenericAPIView):
+    """Асинхронный вариант деталей курса (CourseViewSet.retrieve)."""
+
+    serializer_class = CourseDetailSerializer
+    query_budget = 5
+
+    async def get(self, request, *args, **kwargs):
+        course_id = self.kwargs["pk"]
+        etag, last_modified = await aconditional_validators(
+            request,
+            course_version_key(course_id),
+            course_modified_key(course_id),
+            personal=True,
+        )
+        return await self.aconditional_get(
+            request, self.retrieve_response, etag, last_modified
+        )
+
+    async def retrieve_response(self):
+        if not response_cache_enabled():
+            return await self.aretrieve(self.request)
+        course_id = self.kwargs["pk"]
+        data = await aget_cached_response_data(
+            await acourse_detail_cache_key(course_id, self.request),
+            self.shared_detail_data,
+        )
+        subscribed = await aget_subscribed_course_ids(self.request.user)
+        return Response(merge_user_fields(data, subscribed, course_id=course_id))
+
+    async def shared_detail_data(self):
+        return strip_user_fields((await self.aretrieve(self.request)).data)
+
+
+class AsyncLessonListView(
+    ConditionalGetMixin,
+    CursorPaginationMixin,
+    SparseFieldsetViewMixin,
+    AsyncGenericAPIView,
+):
+    """Асинхронный вариант списка уроков (LessonListApiView)."""
+
+    queryset = Lesson.objects.defer("search_vector").order_by("id")
+    serializer_class = LessonSerializer
+    permission_classes = (IsAuthenticated,)
+    pagination_class = LessonPaginator
+    cursor_pagination_class = LessonCursorPaginator
+    query_budget = 3
+
+    def get_queryset(self):
+        return self.apply_sparse_fieldset(super().get_queryset())
+
+    async def get(self, request, *args, **kwargs):
+        etag, last_modified = await aconditional_validators(
+            request, CONTENT_VERSION_KEY, CONTENT_MODIFIED_KEY
+        )
+        return await self.aconditional_get(
+            request, lambda: self.alist(request), etag, last_modified
+        )
+
+
+class AsyncLessonRetrieveView(
+    ConditionalGetMixin, SparseFieldsetViewMixin, AsyncGenericAPIView
+):
+    """Асинхронный вариант деталей урока (LessonRetrieveApiView)."""
+
+    queryset = Lesson.objects.defer("search_vector")
+    serializer_class = LessonSerializer
+    permission_classes = (
+        IsAuthenticated,
+        IsModer | IsOwner,
+    )
+    sparse_fieldset_required_fields = ("owner", "course", "updated_at")
+    query_budget = 3
+
+    def get_queryset(self):
+        return self.apply_sparse_fieldset(super().get_queryset())
+
+    async def get(self, request, *args, **kwargs):
+        lesson = await self.aget_object()
+        etag = make_etag(
+            lesson.pk,
+            lesson.updated_at.isoformat(),
+            request.get_full_path(),
+            request.accepted_renderer.format,
+        )
+        last_modified = max(
+            int(lesson.updated_at.timestamp()),
+            await aget_modified(course_modified_key(lesson.course_id)),
+        )
+
+        async def build_response():
+            return Response(self.get_serializer(lesson).data)
+
+        return await self.aconditional_get(request, build_response, etag, last_modified)
+
+
+class AsyncSubscriptionView(AsyncAPIView):
+    """Асинхронный вариант подписки/отписки на курс (SubscriptionAPIView)."""
+
+    permission_classes = (IsAuthenticated,)
+    query_budget = 10
+
+    async def post(self, request, *args, **kwargs):
+        user = request.user
+        course_id = request.data.get("course_id")
+        try:
+            course = await aget_object_or_404(Course.objects.only("id"), id=course_id)
+        except (TypeError, ValueError):
+            raise Http404
+        deleted, _ = await Subscription.objects.filter(
+            user=user, course=course
+        ).adelete()
+        if deleted:
+            message = "Подписка удалена"
+        else:
+            # get_or_create создает подписку в savepoint и переживает гонку
+            # с параллельным запросом, как и синхронный вариант
+            await Subscription.objects.aget_or_create(user=user, course=course)
+            message = "Подписка добавлена"
+        return Response({"message": message}, status=status.HTTP_200_OK)
@@ -0,0 +1,281 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from materials.models import Subscription
+
+# Версия всего контента материалов: меняется при любом изменении курса или урока
+CONTENT_VERSION_KEY = "materials:content:version"
+# Время последнего изменения контента (секунды epoch) для Last-Modified
+CONTENT_MODIFIED_KEY = "materials:content:modified"
+
+
+def course_version_key(course_id) -> str:
+    return f"materials:course:{course_id}:version"
+
+
+def course_modified_key(course_id) -> str:
+    return f"materials:course:{course_id}:modified"
+
+
+def user_subscriptions_key(user_id) -> str:
+    return f"materials:subscriptions:user:{user_id}"
+
+
+def user_subscriptions_modified_key(user_id) -> str:
+    return f"materials:subscriptions:user:{user_id}:modified"
+
+
+# Кэш в памяти процесса: сброс версии не доходит до других процессов
+PROCESS_LOCAL_CACHE_BACKENDS = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+def cache_is_shared() -> bool:
+    return settings.CACHES["default"]["BACKEND"] not in PROCESS_LOCAL_CACHE_BACKENDS
+
+
+def response_cache_enabled() -> bool:
+    return settings.COURSE_RESPONSE_CACHE_TIMEOUT > 0
+
+
+def get_version(key) -> int:
+    version = cache.get(key)
+    if version is None:
+        # Начальное значение от времени, чтобы после вытеснения ключа
+        # версия не совпала со старой и не подняла устаревший ответ
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+async def aget_version(key) -> int:
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), None)
+        version = await cache.aget(key)
+    return version
+
+
+def bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def get_modified(key) -> int:
+    """
+    Время последнего изменения для Last-Modified (секунды epoch).
+
+    Если отметки нет в кэше, ею становится текущее время: после вытеснения
+    ключа клиент получит полный ответ, но не ложный 304.
+    """
+    modified = cache.get(key)
+    if modified is None:
+        cache.add(key, int(time.time()), None)
+        modified = cache.get(key)
+    return modified
+
+
+async def aget_modified(key) -> int:
+    modified = await cache.aget(key)
+    if modified is None:
+        await cache.aadd(key, int(time.time()), None)
+        modified = await cache.aget(key)
+    return modified
+
+
+def touch_modified(key):
+    # Last-Modified имеет точность в секунду: отметка строго растет, чтобы
+    # второе изменение в ту же секунду не совпало с уже отданной датой
+    previous = cache.get(key) or 0
+    cache.set(key, max(int(time.time()), previous + 1), None)
+
+
+def bump_course_version(*course_ids):
+    for course_id in set(course_ids):
+        if course_id is not None:
+            bump_version(course_version_key(course_id))
+            touch_modified(course_modified_key(course_id))
+    bump_version(CONTENT_VERSION_KEY)
+    touch_modified(CONTENT_MODIFIED_KEY)
+
+
+def make_etag(*parts) -> str:
+    return '"%s"' % hashlib.md5(":".join(map(str, parts)).encode()).hexdigest()
+
+
+def _request_variant(request) -> str:
+    # Ответ зависит от хоста (ссылки next/previous) и параметров запроса
+    return hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+
+
+def _course_list_cache_key(version, request) -> str:
+    return f"materials:courses:v{version}:list:{_request_variant(request)}"
+
+
+def _course_detail_cache_key(course_id, version, request) -> str:
+    return f"materials:course:{course_id}:v{version}:detail:{_request_variant(request)}"
+
+
+def course_list_cache_key(request) -> str:
+    return _course_list_cache_key(get_version(CONTENT_VERSION_KEY), request)
+
+
+async def acourse_list_cache_key(request) -> str:
+    return _course_list_cache_key(await aget_version(CONTENT_VERSION_KEY), request)
+
+
+def course_detail_cache_key(course_id, request) -> str:
+    version = get_version(course_version_key(course_id))
+    return _course_detail_cache_key(course_id, version, request)
+
+
+async def acourse_detail_cache_key(course_id, request) -> str:
+    version = await aget_version(course_version_key(course_id))
+    return _course_detail_cache_key(course_id, version, request)
+
+
+def conditional_validators(request, version_key, modified_key, personal=False):
+    """
+    ETag и Last-Modified ответа по версии и отметке изменения из кэша.
+
+    Не обращается к БД. С personal=True учитываются подписки пользователя,
+    от которых зависит is_subscribed в ответе. С CONDITIONAL_GET=False
+    кэш не читается и возвращается (None, None).
+    """
+    if not settings.CONDITIONAL_GET:
+        return None, None
+    version = get_version(version_key)
+    modified = get_modified(modified_key)
+    subscriptions_modified = None
+    if personal and request.user.is_authenticated:
+        subscriptions_modified = get_modified(
+            user_subscriptions_modified_key(request.user.pk)
+        )
+    return _validators(request, version, modified, subscriptions_modified)
+
+
+async def aconditional_validators(request, version_key, modified_key, personal=False):
+    if not settings.CONDITIONAL_GET:
+        return None, None
+    version = await aget_version(version_key)
+    modified = await aget_modified(modified_key)
+    subscriptions_modified = None
+    if personal and request.user.is_authenticated:
+        subscriptions_modified = await aget_modified(
+            user_subscriptions_modified_key(request.user.pk)
+        )
+    return _validators(request, version, modified, subscriptions_modified)
+
+
+def _validators(request, version, modified, subscriptions_modified):
+    parts = [version, _request_variant(request), request.accepted_renderer.format]
+    if subscriptions_modified is not None:
+        parts.append(subscriptions_modified)
+        modified = max(modified, subscriptions_modified)
+    return make_etag(*parts), modified
+
+
+def get_cached_response_data(key, build):
+    """Возвращает общие для всех пользователей данные ответа из кэша или строит их."""
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data, settings.COURSE_RESPONSE_CACHE_TIMEOUT)
+    return data
+
+
+async def aget_cached_response_data(key, build):
+    """get_cached_response_data для async-представлений: build — корутинная функция."""
+    data = await cache.aget(key)
+    if data is None:
+        data = await build()
+        await cache.aset(key, data, settings.COURSE_RESPONSE_CACHE_TIMEOUT)
+    return data
+
+
+def get_subscribed_course_ids(user) -> frozenset:
+    """Идентификаторы курсов, на которые подписан пользователь (кэшируются)."""
+    if not user.is_authenticated:
+        return frozenset()
+    key = user_subscriptions_key(user.pk)
+    course_ids = cache.get(key)
+    if course_ids is None:
+        course_ids = frozenset(
+            Subscription.objects.filter(user=user).values_list("course_id", flat=True)
+        )
+        cache.set(key, course_ids, settings.COURSE_RESPONSE_CACHE_TIMEOUT)
+    return course_ids
+
+
+async def aget_subscribed_course_ids(user) -> frozenset:
+    """get_subscribed_course_ids для async-представлений."""
+    if not user.is_authenticated:
+        return frozenset()
+    key = user_subscriptions_key(user.pk)
+    course_ids = await cache.aget(key)
+    if course_ids is None:
+        course_ids = frozenset(
+            [
+                course_id
+                async for course_id in Subscription.objects.filter(
+                    user=user
+                ).values_list("course_id", flat=True)
+            ]
+        )
+        await cache.aset(key, course_ids, settings.COURSE_RESPONSE_CACHE_TIMEOUT)
+    return course_ids
+
+
+def invalidate_user_subscriptions(*user_ids):
+    cache.delete_many([user_subscriptions_key(user_id) for user_id in user_ids])
+    for user_id in user_ids:
+        touch_modified(user_subscriptions_modified_key(user_id))
+
+
+def strip_user_fields(data):
+    """Обнуляет в данных курса (или страницы курсов) персональный is_subscribed."""
+    if "results" in data:
+        return {
+            **data,
+            "results": [strip_user_fields(item) for item in data["results"]],
+        }
+    if "is_subscribed" not in data:
+        return dict(data)
+    # Ключ остается на месте, чтобы при слиянии сохранился порядок полей
+    return {**data, "is_subscribed": None}
+
+
+def merge_user_fields(data, subscribed_course_ids, course_id=None):
+    """Добавляет к общим данным курса (или страницы) is_subscribed пользователя."""
+    if "results" in data:
+        return {
+            **data,
+            "results": [
+                merge_user_fields(item, subscribed_course_ids)
+                for item in data["results"]
+            ],
+        }
+    if "is_subscribed" not in data:
+        return data
+    if course_id is None:
+        course_id = data["id"]
+    return {**data, "is_subscribed": int(course_id) in subscribed_course_ids}
+
+
+def drop_fields(data, field_names):
+    """Убирает из данных курса (или страницы курсов) служебные поля."""
+    if not field_names:
+        return data
+    if "results" in data:
+        return {
+            **data,
+            "results": [drop_fields(item, field_names) for item in data["results"]],
+        }
+    return {key: value for key, value in data.items() if key not in field_names}
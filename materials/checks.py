@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+from materials.caching import cache_is_shared
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Кэш ответов, валидаторы условных GET и отложенные уведомления держатся
+    на данных в кэше: нужен общий для процессов кэш.
+    """
+    if cache_is_shared():
+        return []
+    errors = []
+    if settings.COURSE_RESPONSE_CACHE_TIMEOUT > 0:
+        errors.append(
+            Error(
+                "Кэш ответов курсов включен, а кэш по умолчанию свой у каждого "
+                "процесса: другие процессы будут отдавать устаревшие данные.",
+                hint="Задайте CACHE_LOCATION (Redis) или "
+                "COURSE_RESPONSE_CACHE_TIMEOUT=0.",
+                id="materials.E001",
+            )
+        )
+    if settings.CONDITIONAL_GET:
+        errors.append(
+            Error(
+                "Условные GET включены, а кэш по умолчанию свой у каждого "
+                "процесса: процесс может ответить 304 на измененные данные.",
+                hint="Задайте CACHE_LOCATION (Redis) или CONDITIONAL_GET=False.",
+                id="materials.E002",
+            )
+        )
+    if settings.COURSE_NOTIFICATION_DEBOUNCE_SECONDS > 0:
+        errors.append(
+            Error(
+                "Уведомления об обновлении курса откладываются, а кэш по "
+                "умолчанию свой у каждого процесса: воркер не увидит изменений, "
+                "а правки после окна будут потеряны.",
+                hint="Задайте CACHE_LOCATION (Redis) или "
+                "COURSE_NOTIFICATION_DEBOUNCE_SECONDS=0.",
+                id="materials.E003",
+            )
+        )
+    return errors
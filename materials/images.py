@@ -0,0 +1,139 @@
+import hashlib
+import io
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+# Размеры: (ширина, высота) и обрезка под размер; full вписывается целиком
+IMAGE_VARIANTS = {
+    "thumbnail": ((160, 160), True),
+    "card": ((480, 270), True),
+    "full": ((1600, 1600), False),
+}
+# Расширение файла: формат Pillow и параметры кодирования
+IMAGE_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+# Пути адресуются хэшем исходника; при изменении размеров или параметров
+# кодирования версия повышается, чтобы не отдавать старые файлы
+VARIANTS_DIR = "variants/v1"
+
+
+def variants_field(field_name):
+    return f"{field_name}_variants"
+
+
+def hash_field(field_name):
+    return f"{field_name}_hash"
+
+
+def loaded_image_name(instance, field_name):
+    """
+    Имя файла изображения без обращения к БД; None, если поле отложено.
+
+    До первого обращения в __dict__ лежит строка из БД, после — FieldFile.
+    """
+    if field_name not in instance.__dict__:
+        return None
+    value = instance.__dict__[field_name]
+    return getattr(value, "name", value) or ""
+
+
+def remember_image_names(instance, *field_names):
+    """
+    Запоминает в post_init имена файлов, для которых уже построены копии.
+
+    У нового объекта копий еще нет: изображение, переданное в конструктор,
+    обрабатывается при первом сохранении.
+    """
+    instance._image_names = {
+        field_name: (
+            "" if instance.pk is None else loaded_image_name(instance, field_name)
+        )
+        for field_name in field_names
+    }
+
+
+def content_hash(file) -> str:
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in file.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def variant_path(digest, variant, extension) -> str:
+    return f"{VARIANTS_DIR}/{digest[:2]}/{digest}/{variant}.{extension}"
+
+
+def _encode(image, extension):
+    pil_format, options = IMAGE_FORMATS[extension]
+    if pil_format == "JPEG" and image.mode != "RGB":
+        # JPEG без прозрачности: прозрачные области на белом фоне
+        background = Image.new("RGB", image.size, "white")
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    output = io.BytesIO()
+    image.save(output, pil_format, **options)
+    return output.getvalue()
+
+
+def render_variants(file, digest, storage=default_storage):
+    """
+    Сохраняет уменьшенные копии изображения и возвращает их пути
+    {размер: {расширение: путь}}.
+
+    Файлы с тем же хэшем уже сохранены при прежней загрузке того же
+    изображения (в любой модели): тогда исходник не декодируется.
+    """
+    paths = {
+        variant: {
+            extension: variant_path(digest, variant, extension)
+            for extension in IMAGE_FORMATS
+        }
+        for variant in IMAGE_VARIANTS
+    }
+    if all(
+        storage.exists(path)
+        for extensions in paths.values()
+        for path in extensions.values()
+    ):
+        return paths
+
+    file.seek(0)
+    with Image.open(file) as source:
+        # JPEG декодируется сразу в уменьшенном масштабе (DCT scaling):
+        # многомегапиксельный исходник не разворачивается целиком
+        largest = max(size for size, _ in IMAGE_VARIANTS.values())
+        source.draft("RGB", largest)
+        image = ImageOps.exif_transpose(source)
+        has_alpha = "A" in image.getbands() or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+    for variant, (size, crop) in IMAGE_VARIANTS.items():
+        if crop:
+            resized = ImageOps.fit(image, size, Image.Resampling.LANCZOS)
+        else:
+            resized = image.copy()
+            resized.thumbnail(size, Image.Resampling.LANCZOS)
+        for extension, path in paths[variant].items():
+            if not storage.exists(path):
+                paths[variant][extension] = storage.save(
+                    path, ContentFile(_encode(resized, extension))
+                )
+    return paths
+
+
+def image_variant_urls(variants, request=None):
+    """Пути копий изображения -> {размер: {расширение: URL}}."""
+    urls = {}
+    for variant, extensions in (variants or {}).items():
+        urls[variant] = {}
+        for extension, path in extensions.items():
+            url = default_storage.url(path)
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            urls[variant][extension] = url
+    return urls
@@ -0,0 +1,240 @@
+import json
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    CaptureQueriesContext,
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from users.generators import FIXED, DataGenerator
+from users.models import User
+from users.roles import MODERATORS_GROUP
+
+PERCENTILES = (50, 90, 95, 99)
+ROLES = ("user", "moderator", "staff")
+
+
+def seed_dataset(seed, users, courses, lessons, subscribers, payments):
+    """Заполняет пустую БД набором данных заданного размера."""
+    generator = DataGenerator(seed=seed)
+    generator.generate(
+        users=users,
+        courses=courses,
+        lessons=lessons,
+        subscribers=subscribers,
+        payments=payments,
+        lessons_distribution=FIXED,
+        subscribers_distribution=FIXED,
+        payments_distribution=FIXED,
+    )
+    return generator.user_ids, generator.course_ids
+
+
+def apply_role(user, role):
+    """Выдает пользователю роль, от имени которой идут замеры."""
+    if role == "moderator":
+        group, _ = Group.objects.get_or_create(name=MODERATORS_GROUP)
+        user.groups.add(group)
+    elif role == "staff":
+        user.is_staff = True
+        user.save(update_fields=["is_staff"])
+
+
+def summarize(latencies, queries, statuses):
+    cut_points = statistics.quantiles(latencies, n=100, method="inclusive")
+    latency = {f"p{p}": round(cut_points[p - 1], 3) for p in PERCENTILES}
+    latency.update(
+        min=round(min(latencies), 3),
+        max=round(max(latencies), 3),
+        mean=round(statistics.fmean(latencies), 3),
+    )
+    return {
+        "requests": len(latencies),
+        "statuses": {str(code): statuses.count(code) for code in sorted(set(statuses))},
+        "latency_ms": latency,
+        "queries": {
+            "min": min(queries),
+            "max": max(queries),
+            "mean": round(statistics.fmean(queries), 2),
+        },
+    }
+
+
+class Command(BaseCommand):
+    help = "Benchmark API endpoints on a seeded test database and report JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=200, help="Пользователей")
+        parser.add_argument("--courses", type=int, default=50, help="Курсов")
+        parser.add_argument(
+            "--lessons", type=int, default=20, help="Уроков в каждом курсе"
+        )
+        parser.add_argument(
+            "--subscribers", type=int, default=20, help="Подписчиков каждого курса"
+        )
+        parser.add_argument(
+            "--payments", type=int, default=5, help="Платежей каждого пользователя"
+        )
+        parser.add_argument(
+            "--requests", type=int, default=100, help="Замеров на эндпоинт"
+        )
+        parser.add_argument(
+            "--warmup", type=int, default=5, help="Запросов прогрева на эндпоинт"
+        )
+        parser.add_argument("--seed", type=int, default=0, help="Seed генератора")
+        parser.add_argument(
+            "--role",
+            choices=ROLES,
+            default="user",
+            help="Роль пользователя, от имени которого идут запросы",
+        )
+        parser.add_argument(
+            "--no-response-cache",
+            action="store_true",
+            help="Отключить кэш ответов курсов (COURSE_RESPONSE_CACHE_TIMEOUT=0)",
+        )
+        parser.add_argument(
+            "--keepdb",
+            action="store_true",
+            help="Не удалять тестовую БД после замеров",
+        )
+        parser.add_argument("--output", help="Файл для JSON-отчета (иначе stdout)")
+
+    def handle(self, *args, **options):
+        if options["requests"] < 2:
+            # statistics.quantiles требует хотя бы двух замеров
+            raise CommandError("--requests должно быть не меньше 2")
+        if options["users"] < 1 or options["courses"] < 1:
+            # Запросы идут от имени первого пользователя и к первому курсу
+            raise CommandError("--users и --courses должны быть не меньше 1")
+
+        # Замеры идут в отдельной тестовой БД и локальном кэше, рабочие данные
+        # и общий кэш не затрагиваются
+        overrides = {
+            "CACHES": {
+                "default": {
+                    "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                    "LOCATION": "benchmark-api",
+                }
+            }
+        }
+        if options["no_response_cache"]:
+            overrides["COURSE_RESPONSE_CACHE_TIMEOUT"] = 0
+
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options["keepdb"]
+        )
+        try:
+            with override_settings(**overrides):
+                report = self.run_benchmark(options)
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options["keepdb"]
+            )
+            teardown_test_environment()
+
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as file:
+                file.write(output + "\n")
+            self.stderr.write(f"Отчет записан в {options['output']}")
+        else:
+            self.stdout.write(output)
+
+    def run_benchmark(self, options):
+        rng = random.Random(options["seed"])
+        started = time.perf_counter()
+        user_ids, course_ids = seed_dataset(
+            options["seed"],
+            users=options["users"],
+            courses=options["courses"],
+            lessons=options["lessons"],
+            subscribers=options["subscribers"],
+            payments=options["payments"],
+        )
+        seed_seconds = time.perf_counter() - started
+
+        user = User.objects.get(pk=user_ids[0])
+        apply_role(user, options["role"])
+        client = APIClient()
+        # Через настоящий JWT, чтобы в замер входила аутентификация
+        client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}"
+        )
+
+        def get(url):
+            return lambda: client.get(url)
+
+        def course_detail():
+            return client.get(
+                reverse("materials:course-detail", args=[rng.choice(course_ids)])
+            )
+
+        def toggle_subscription():
+            return client.post(
+                reverse("materials:subscriptions"),
+                {"course_id": course_ids[0]},
+                format="json",
+            )
+
+        endpoints = {
+            "courses-list": get(reverse("materials:course-list")),
+            "courses-retrieve": course_detail,
+            "lessons-list": get(reverse("materials:lessons_list")),
+            "subscription-toggle": toggle_subscription,
+            "payments-list": get(reverse("users:payment-list")),
+            "users-list": get(reverse("users:users-list")),
+        }
+
+        results = {}
+        for name, request in endpoints.items():
+            for _ in range(options["warmup"]):
+                request()
+            latencies, queries, statuses = [], [], []
+            for _ in range(options["requests"]):
+                with CaptureQueriesContext(connection) as captured:
+                    request_started = time.perf_counter()
+                    response = request()
+                    latencies.append((time.perf_counter() - request_started) * 1000)
+                queries.append(len(captured))
+                statuses.append(response.status_code)
+            results[name] = summarize(latencies, queries, statuses)
+            self.stderr.write(
+                f"{name}: p50 {results[name]['latency_ms']['p50']} мс, "
+                f"{results[name]['queries']['max']} запросов"
+            )
+
+        return {
+            "created_at": timezone.now().isoformat(),
+            "database": connection.vendor,
+            "response_cache_timeout": settings.COURSE_RESPONSE_CACHE_TIMEOUT,
+            "role": options["role"],
+            "dataset": {
+                key: options[key]
+                for key in (
+                    "users",
+                    "courses",
+                    "lessons",
+                    "subscribers",
+                    "payments",
+                    "seed",
+                )
+            },
+            "seed_seconds": round(seed_seconds, 3),
+            "requests_per_endpoint": options["requests"],
+            "endpoints": results,
+        }
@@ -0,0 +1,116 @@
+import io
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from config.renderers import ORJSONParser, ORJSONRenderer, orjson
+from materials.models import Course, Lesson
+from materials.serializers import CourseSerializer
+
+
+def build_courses(courses, lessons):
+    """
+    Несохраненные курсы с уроками и аннотациями, как после CourseViewSet.get_queryset.
+
+    Уроки подкладываются в кэш prefetch, поэтому сериализация не обращается к БД.
+    """
+    now = timezone.now()
+    result = []
+    for course_id in range(1, courses + 1):
+        course = Course(
+            id=course_id,
+            name=f"Курс {course_id}: Python-разработчик",
+            description="Полный курс по Python, Django и Django REST framework. " * 5,
+            price=course_id * 1000,
+            owner_id=1,
+            updated_at=now,
+        )
+        course.lessons_count = lessons
+        course.user_is_subscribed = course_id % 2 == 0
+        course._prefetched_objects_cache = {
+            "lesson_set": [
+                Lesson(
+                    id=course_id * lessons + number,
+                    name=f"Урок {number}: функции и замыкания",
+                    description="Разбираем аргументы, области видимости и "
+                    "декораторы на примерах. " * 3,
+                    video_link=f"https://youtube.com/watch?v={course_id}-{number}",
+                    course_id=course_id,
+                    owner_id=1,
+                    updated_at=now,
+                )
+                for number in range(lessons)
+            ]
+        }
+        result.append(course)
+    return result
+
+
+def measure(func, repeat):
+    """Среднее время вызова в миллисекундах."""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+class Command(BaseCommand):
+    help = "Compare JSON renderers and parsers on CourseSerializer output"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--courses", type=int, default=50, help="Курсов в ответе")
+        parser.add_argument(
+            "--lessons", type=int, default=20, help="Уроков в каждом курсе"
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=200, help="Повторов каждого замера"
+        )
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stderr.write(
+                "orjson не установлен: ORJSONRenderer работает как JSONRenderer"
+            )
+        courses = build_courses(options["courses"], options["lessons"])
+        data = {
+            "count": len(courses),
+            "next": None,
+            "previous": None,
+            "results": CourseSerializer(courses, many=True).data,
+        }
+        repeat = options["repeat"]
+        backends = (
+            ("json", JSONRenderer(), JSONParser()),
+            ("orjson", ORJSONRenderer(), ORJSONParser()),
+        )
+
+        timings = {}
+        for name, renderer, parser in backends:
+            body = renderer.render(data, "application/json", {})
+            # Результат должен совпадать с ответом стандартного рендерера
+            if json.loads(body) != json.loads(backends[0][1].render(data)):
+                self.stderr.write(self.style.ERROR(f"{name}: ответ отличается"))
+            timings[name] = (
+                len(body),
+                measure(lambda: renderer.render(data, "application/json", {}), repeat),
+                measure(
+                    lambda: parser.parse(io.BytesIO(body), "application/json", {}),
+                    repeat,
+                ),
+            )
+
+        base_render, base_parse = timings["json"][1:]
+        self.stdout.write(
+            f"{options['courses']} курсов x {options['lessons']} уроков, "
+            f"{repeat} повторов"
+        )
+        for name, (size, render_ms, parse_ms) in timings.items():
+            self.stdout.write(
+                f"{name:>7}: {size} байт, render {render_ms:.3f} мс "
+                f"(x{base_render / render_ms:.1f}), parse {parse_ms:.3f} мс "
+                f"(x{base_parse / parse_ms:.1f})"
+            )
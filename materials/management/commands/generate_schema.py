@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from config.schema import generate_schema, write_schema_artifact
+
+
+class Command(BaseCommand):
+    help = "Generate the OpenAPI schema once and store it as hashed static files"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output-dir",
+            help="Каталог для файлов схемы (по умолчанию OPENAPI_SCHEMA_DIR)",
+        )
+
+    def handle(self, *args, **options):
+        artifact = generate_schema()
+        directory = write_schema_artifact(artifact, options["output_dir"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Схема {artifact.file_name('json')} записана в {directory}"
+            )
+        )
@@ -0,0 +1,139 @@
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Код, который выполняет процесс при холодном старте. Веб-процессы загружают
+# URLconf (а с ним все представления) при первом запросе, поэтому он входит
+# в замер; воркер Celery при старте настраивает Django и импортирует задачи
+ENTRY_POINTS = {
+    "wsgi": (
+        "import config.wsgi\n"
+        "from django.urls import get_resolver\n"
+        "get_resolver().url_patterns"
+    ),
+    "asgi": (
+        "import config.asgi\n"
+        "from django.urls import get_resolver\n"
+        "get_resolver().url_patterns"
+    ),
+    "worker": "from config.celery import app\napp.loader.import_default_modules()",
+}
+
+# import time: <self, мкс> | <cumulative, мкс> | <отступ><модуль>
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)\s*$")
+
+
+def parse_importtime(output):
+    """Разбирает вывод python -X importtime в список записей по модулям."""
+    modules = []
+    for line in output.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match is None:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        modules.append(
+            {
+                "module": name,
+                "self_us": int(self_us),
+                "cumulative_us": int(cumulative_us),
+                "depth": (len(indent) - 1) // 2,
+            }
+        )
+    return modules
+
+
+def summarize_imports(modules, top):
+    """Суммарное время импорта, самые дорогие пакеты и модули."""
+    packages = defaultdict(int)
+    for module in modules:
+        packages[module["module"].split(".")[0]] += module["self_us"]
+    slowest_packages = sorted(packages.items(), key=lambda item: -item[1])[:top]
+    slowest_modules = sorted(modules, key=lambda module: -module["cumulative_us"])
+    return {
+        "modules": len(modules),
+        "import_ms": round(sum(module["self_us"] for module in modules) / 1000, 1),
+        "packages_ms": {
+            name: round(self_us / 1000, 1) for name, self_us in slowest_packages
+        },
+        "slowest_imports_ms": {
+            module["module"]: round(module["cumulative_us"] / 1000, 1)
+            for module in slowest_modules[:top]
+        },
+    }
+
+
+def profile_entry_point(code, env):
+    """Запускает код в новом интерпретаторе с -X importtime."""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=settings.BASE_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return wall_ms, parse_importtime(result.stderr)
+
+
+class Command(BaseCommand):
+    help = "Profile import time of the web and worker entry points and report JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--entry",
+            action="append",
+            choices=ENTRY_POINTS,
+            help="Точка входа (можно несколько; по умолчанию все)",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=3,
+            help="Запусков на точку входа; в отчет идет самый быстрый",
+        )
+        parser.add_argument(
+            "--top", type=int, default=15, help="Сколько пакетов и модулей показать"
+        )
+        parser.add_argument("--output", help="Файл для JSON-отчета (иначе stdout)")
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        report = {}
+        for name in options["entry"] or ENTRY_POINTS:
+            runs = [
+                profile_entry_point(ENTRY_POINTS[name], env)
+                for _ in range(options["repeat"])
+            ]
+            # Самый быстрый запуск меньше всего искажен шумом и компиляцией .pyc
+            wall_ms, modules = min(
+                runs, key=lambda run: sum(module["self_us"] for module in run[1])
+            )
+            report[name] = {
+                "wall_ms": round(wall_ms, 1),
+                "wall_ms_median": round(statistics.median(run[0] for run in runs), 1),
+                **summarize_imports(modules, options["top"]),
+            }
+            heaviest = ", ".join(list(report[name]["packages_ms"])[:5])
+            self.stderr.write(
+                f"{name}: импорт {report[name]['import_ms']} мс, "
+                f"{report[name]['modules']} модулей; тяжелее всего: {heaviest}"
+            )
+
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as file:
+                file.write(output + "\n")
+            self.stderr.write(f"Отчет записан в {options['output']}")
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:12
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicate_subscriptions(apps, schema_editor):
+    """Оставляет по одной подписке на пару (пользователь, курс)."""
+    Subscription = apps.get_model("materials", "Subscription")
+    keep_ids = (
+        Subscription.objects.values("user_id", "course_id")
+        .annotate(keep_id=Min("id"))
+        .values("keep_id")
+    )
+    Subscription.objects.exclude(id__in=keep_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0004_course_price"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_subscriptions, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="subscription",
+            constraint=models.UniqueConstraint(
+                fields=("user", "course"), name="unique_subscription_user_course"
+            ),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0005_subscription_unique_user_course"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Новый индекс создается до удаления индекса по course_id
+        migrations.AddIndex(
+            model_name="lesson",
+            index=models.Index(
+                fields=["course", "id"], name="materials_lesson_course_id_idx"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="lesson",
+            name="course",
+            field=models.ForeignKey(
+                db_index=False,
+                help_text="Выберите курс",
+                on_delete=django.db.models.deletion.CASCADE,
+                to="materials.course",
+                verbose_name="Курс",
+            ),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:23
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+CREATE_TRIGGER_SQL = """
+CREATE OR REPLACE FUNCTION {table}_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('russian', coalesce(NEW.name, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(NEW.description, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER {table}_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF name, description ON {table}
+    FOR EACH ROW EXECUTE FUNCTION {table}_search_vector_update();
+
+UPDATE {table} SET name = name;
+
+CREATE INDEX {index} ON {table} USING gin (search_vector);
+"""
+
+DROP_TRIGGER_SQL = """
+DROP INDEX IF EXISTS {index};
+DROP TRIGGER IF EXISTS {table}_search_vector_trigger ON {table};
+DROP FUNCTION IF EXISTS {table}_search_vector_update();
+"""
+
+SEARCH_INDEXES = {
+    "materials_course": "materials_course_search_idx",
+    "materials_lesson": "materials_lesson_search_idx",
+}
+
+
+def create_search_triggers(apps, schema_editor):
+    """Триггеры и GIN-индексы полнотекстового поиска (только PostgreSQL)."""
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for table, index in SEARCH_INDEXES.items():
+        schema_editor.execute(CREATE_TRIGGER_SQL.format(table=table, index=index))
+
+
+def drop_search_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for table, index in SEARCH_INDEXES.items():
+        schema_editor.execute(DROP_TRIGGER_SQL.format(table=table, index=index))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0006_hot_path_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="course",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="lesson",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        # Триггеры и GIN-индексы создаются только на PostgreSQL и не входят в
+        # состояние моделей: пересоздание таблиц на SQLite не знает USING gin
+        migrations.RunPython(create_search_triggers, drop_search_triggers),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0008_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="course",
+            name="preview_hash",
+            field=models.CharField(
+                blank=True, editable=False, max_length=64, verbose_name="Хэш превью"
+            ),
+        ),
+        migrations.AddField(
+            model_name="course",
+            name="preview_variants",
+            field=models.JSONField(
+                blank=True, default=dict, editable=False, verbose_name="Размеры превью"
+            ),
+        ),
+        migrations.AddField(
+            model_name="lesson",
+            name="preview_hash",
+            field=models.CharField(
+                blank=True, editable=False, max_length=64, verbose_name="Хэш превью"
+            ),
+        ),
+        migrations.AddField(
+            model_name="lesson",
+            name="preview_variants",
+            field=models.JSONField(
+                blank=True, default=dict, editable=False, verbose_name="Размеры превью"
+            ),
+        ),
+    ]
@@ -0,0 +1,123 @@
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_QUERY_PARAM = "fields"
+EXPAND_QUERY_PARAM = "expand"
+
+
+def _query_param_set(request, name):
+    value = request.query_params.get(name)
+    if value is None:
+        return None
+    return {item.strip() for item in value.split(",") if item.strip()}
+
+
+def get_requested_fields(request, serializer_class):
+    """
+    Поля, запрошенные клиентом через ?fields= и ?expand=, либо None (все поля).
+
+    ?fields=id,name оставляет только перечисленные поля. Дорогие поля из
+    Meta.expandable_fields при ?fields= попадают в ответ, только если они
+    перечислены в fields или в ?expand=. Без ?fields= ответ не меняется.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    fields = _query_param_set(request, FIELDS_QUERY_PARAM)
+    if fields is None:
+        return None
+    expandable = set(getattr(serializer_class.Meta, "expandable_fields", ()))
+    expand = _query_param_set(request, EXPAND_QUERY_PARAM) or set()
+    return fields | (expand & expandable)
+
+
+class SparseFieldsetSerializerMixin:
+    """Убирает из сериализатора поля, не запрошенные через ?fields=/?expand=."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = get_requested_fields(self.context.get("request"), type(self))
+        if requested is None:
+            return
+        requested |= set(self.context.get("sparse_fieldset_extra_fields", ()))
+        for field_name in set(self.fields) - requested:
+            self.fields.pop(field_name)
+
+
+class SparseFieldsetViewMixin:
+    """
+    Согласует SQL с запрошенными полями: ``only()`` по полям модели и
+    флаги для пропуска аннотаций и prefetch ненужных вычисляемых полей.
+
+    ``sparse_fieldset_required_fields`` — поля модели, которые нужны
+    представлению независимо от ответа (например, owner для проверки прав).
+    ``sparse_fieldset_extra_fields`` — поля, которые сериализуются сверх
+    запрошенных, потому что их читает само представление.
+    """
+
+    sparse_fieldset_required_fields = ()
+    sparse_fieldset_extra_fields = ()
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["sparse_fieldset_extra_fields"] = self.sparse_fieldset_extra_fields
+        return context
+
+    def get_requested_fields(self):
+        return get_requested_fields(self.request, self.get_serializer_class())
+
+    def is_field_requested(self, field_name):
+        requested = self.get_requested_fields()
+        return requested is None or field_name in requested
+
+    def apply_sparse_fieldset(self, queryset):
+        requested = self.get_requested_fields()
+        if requested is None:
+            return queryset
+        model_fields = {field.name for field in queryset.model._meta.concrete_fields}
+        only_fields = (requested | set(self.sparse_fieldset_required_fields)) & (
+            model_fields
+        )
+        return queryset.only(queryset.model._meta.pk.name, *sorted(only_fields))
+
+
+class ConditionalGetMixin:
+    """
+    Условные GET: If-None-Match по ETag и If-Modified-Since по Last-Modified.
+
+    Если копия клиента актуальна, ответ 304 отдается без сборки данных и
+    сериализации. Ответ зависит от пользователя, поэтому добавляется
+    Vary: Authorization. С CONDITIONAL_GET=False ответ строится всегда
+    и отдается без валидаторов.
+    """
+
+    conditional_vary_headers = ("Authorization",)
+
+    def conditional_get(self, request, build_response, etag, last_modified):
+        if not settings.CONDITIONAL_GET:
+            return build_response()
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = build_response()
+        return self.set_validators(response, etag, last_modified)
+
+    async def aconditional_get(self, request, build_response, etag, last_modified):
+        """conditional_get для async-представлений: build_response — корутинная."""
+        if not settings.CONDITIONAL_GET:
+            return await build_response()
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = await build_response()
+        return self.set_validators(response, etag, last_modified)
+
+    def set_validators(self, response, etag, last_modified):
+        if response.status_code in (200, 304):
+            response.headers["ETag"] = etag
+            response.headers["Last-Modified"] = http_date(last_modified)
+        patch_vary_headers(response, self.conditional_vary_headers)
+        return response
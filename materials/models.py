@@ -1,4 +1,5 @@
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 
 from materials.validators import validate_youtube_url
@@ -18,6 +19,19 @@ class Course(models.Model):
         verbose_name="Превью курса",
         help_text="Загрузите превью курса",
     )
+    # Уменьшенные копии изображения (materials.images), заполняет задача Celery
+    preview_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name="Размеры превью",
+    )
+    preview_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        editable=False,
+        verbose_name="Хэш превью",
+    )
     description = models.TextField(
         blank=True,
         null=True,
@@ -33,6 +47,10 @@ class Course(models.Model):
         help_text="Укажите автора курса",
     )
     price = models.PositiveIntegerField(default=0, verbose_name="Цена курса")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата изменения")
+    # Заполняется триггером БД из name и description (русская морфология);
+    # GIN-индекс и триггер создаются миграцией 0007 только на PostgreSQL
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         verbose_name = "Курс"
@@ -58,6 +76,19 @@ class Lesson(models.Model):
         verbose_name="Превью урока",
         help_text="Загрузите превью урока",
     )
+    # Уменьшенные копии изображения (materials.images), заполняет задача Celery
+    preview_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name="Размеры превью",
+    )
+    preview_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        editable=False,
+        verbose_name="Хэш превью",
+    )
     video_link = models.URLField(
         unique=True,
         verbose_name="Ссылка на видео",
@@ -65,7 +96,12 @@ class Lesson(models.Model):
         validators=[validate_youtube_url],
     )
     course = models.ForeignKey(
-        Course, on_delete=models.CASCADE, verbose_name="Курс", help_text="Выберите курс"
+        Course,
+        on_delete=models.CASCADE,
+        # Отдельный индекс по course_id не нужен: его заменяет индекс (course, id)
+        db_index=False,
+        verbose_name="Курс",
+        help_text="Выберите курс",
     )
     owner = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -75,10 +111,20 @@ class Lesson(models.Model):
         verbose_name="Автор урока",
         help_text="Укажите автора урока",
     )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата изменения")
+    # Заполняется триггером БД из name и description (русская морфология);
+    # GIN-индекс и триггер создаются миграцией 0007 только на PostgreSQL
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         verbose_name = "Урок"
         verbose_name_plural = "Уроки"
+        indexes = [
+            # Уроки курса в порядке id (prefetch уроков курса, keyset-пагинация)
+            models.Index(
+                fields=["course", "id"], name="materials_lesson_course_id_idx"
+            ),
+        ]
 
 
 class Subscription(models.Model):
@@ -98,3 +144,8 @@ class Subscription(models.Model):
     class Meta:
         verbose_name = "Подписка"
         verbose_name_plural = "Подписки"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "course"], name="unique_subscription_user_course"
+            ),
+        ]
@@ -1,4 +1,6 @@
-from rest_framework.pagination import PageNumberPagination
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination, PageNumberPagination
 
 
 class CoursePaginator(PageNumberPagination):
@@ -11,3 +13,120 @@ class LessonPaginator(PageNumberPagination):
     page_size = 10
     page_size_query_param = "page_size"
     max_page_size = 100
+
+
+class CourseCursorPaginator(CursorPagination):
+    """Keyset-пагинация курсов: без COUNT(*) и OFFSET, непрозрачный курсор."""
+
+    page_size = 5
+    page_size_query_param = "page_size"
+    max_page_size = 50
+    ordering = ("id",)
+
+
+class LessonCursorPaginator(CursorPagination):
+    """Keyset-пагинация уроков: без COUNT(*) и OFFSET, непрозрачный курсор."""
+
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = ("id",)
+
+
+class CursorPaginationMixin:
+    """
+    Включает keyset-пагинацию по запросу клиента.
+
+    Режим выбирается параметром ``?pagination=cursor`` либо наличием
+    ``?cursor=`` (ссылки next/previous). Без них остается постраничная
+    пагинация ``pagination_class`` для старых клиентов.
+    """
+
+    cursor_pagination_class = None
+    pagination_mode_query_param = "pagination"
+
+    def use_cursor_pagination(self):
+        if self.cursor_pagination_class is None:
+            return False
+        params = self.request.query_params
+        return (
+            params.get(self.pagination_mode_query_param) == "cursor"
+            or self.cursor_pagination_class.cursor_query_param in params
+        )
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            if self.use_cursor_pagination():
+                self._paginator = self.cursor_pagination_class()
+            elif self.pagination_class is None:
+                self._paginator = None
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+
+class SearchCursorPaginator(CursorPagination):
+    """
+    Keyset-пагинация результатов поиска: сначала самые релевантные.
+
+    Курсор хранит rank и id граничной записи, и следующая страница — это
+    rank < r OR (rank = r AND id > i): без OFFSET даже при равных rank.
+    Стандартный CursorPagination фильтрует только по первому полю
+    сортировки и для равных rank переходит на OFFSET.
+    """
+
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 50
+    ordering = ("-rank", "id")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        if self.cursor is not None:
+            rank, pk = self.decode_position(self.cursor.position)
+            if reverse:
+                after = Q(rank__gt=rank) | Q(rank=rank, pk__lt=pk)
+            else:
+                after = Q(rank__lt=rank) | Q(rank=rank, pk__gt=pk)
+            queryset = queryset.filter(after)
+        ordering = ("rank", "-id") if reverse else self.ordering
+
+        # Лишняя запись показывает, есть ли страница дальше, без COUNT(*)
+        results = list(queryset.order_by(*ordering)[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[: self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+        return self.page
+
+    def decode_position(self, position):
+        try:
+            rank, pk = position.split(":")
+            return float(rank), int(pk)
+        except (AttributeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def position_cursor(self, obj, reverse):
+        # repr(float) восстанавливается без потерь: равенство rank точное
+        return Cursor(offset=0, reverse=reverse, position=f"{obj.rank!r}:{obj.pk}")
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.position_cursor(self.page[-1], False))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.position_cursor(self.page[0], True))
@@ -0,0 +1,28 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import Cast
+
+# Конфигурация должна совпадать с триггерами из миграции 0007_search_vector
+SEARCH_CONFIG = "russian"
+SEARCH_QUERY_PARAM = "q"
+
+
+def search_queryset(queryset, text):
+    """
+    Фильтрует курсы или уроки по полнотекстовому запросу и добавляет rank.
+
+    На PostgreSQL поиск идет по хранимому search_vector (GIN-индекс) с
+    русской морфологией и синтаксисом websearch ("фраза", or, -исключение).
+    На других СУБД остается простой поиск подстроки без ранжирования.
+    """
+    if connection.vendor != "postgresql":
+        return queryset.filter(
+            Q(name__icontains=text) | Q(description__icontains=text)
+        ).annotate(rank=Value(1.0, output_field=FloatField()))
+    query = SearchQuery(text, config=SEARCH_CONFIG, search_type="websearch")
+    # ts_rank возвращает real; double precision приходит в Python без
+    # округления, и rank из курсора пагинации сравнивается точно
+    return queryset.filter(search_vector=query).annotate(
+        rank=Cast(SearchRank(F("search_vector"), query), FloatField())
+    )
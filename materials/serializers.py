@@ -1,19 +1,44 @@
-from rest_framework.fields import SerializerMethodField
-from rest_framework.serializers import ModelSerializer
+from rest_framework.fields import (
+    FloatField,
+    IntegerField,
+    ListField,
+    ReadOnlyField,
+    SerializerMethodField,
+)
+from rest_framework.serializers import ModelSerializer, Serializer, ValidationError
+from materials.images import image_variant_urls
+from materials.mixins import SparseFieldsetSerializerMixin
 from materials.models import Course, Lesson, Subscription
 from materials.validators import validate_youtube_url
 
 
-class CourseSerializer(ModelSerializer):
+class ImageVariantsField(ReadOnlyField):
+    """
+    URL уменьшенных копий изображения: {"card": {"webp": ..., "jpg": ...}}.
+
+    Пока копии строятся (или изображения нет) — пустой объект, клиент
+    показывает исходное изображение.
+    """
+
+    def to_representation(self, value):
+        return image_variant_urls(value, self.context.get("request"))
+
+
+class CourseSerializer(SparseFieldsetSerializerMixin, ModelSerializer):
     count_lessons_in_course = SerializerMethodField()
     lessons = SerializerMethodField()
     is_subscribed = SerializerMethodField()
+    preview_variants = ImageVariantsField()
 
     class Meta:
         model = Course
-        fields = "__all__"
+        exclude = ("search_vector", "preview_hash")
+        expandable_fields = ("lessons",)
 
     def get_count_lessons_in_course(self, course):
+        # Аннотация из CourseViewSet.get_queryset избавляет от COUNT на каждый курс
+        if hasattr(course, "lessons_count"):
+            return course.lessons_count
         return course.lesson_set.count()
 
     def get_lessons(self, course):
@@ -21,18 +46,23 @@ class CourseSerializer(ModelSerializer):
         return LessonSerializer(lessons, many=True).data
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, "user_is_subscribed"):
+            return obj.user_is_subscribed
         user = self.context["request"].user
         if user.is_authenticated:
             return obj.subscriptions.filter(user=user).exists()
         return False
 
 
-class CourseDetailSerializer(ModelSerializer):
+class CourseDetailSerializer(SparseFieldsetSerializerMixin, ModelSerializer):
     count_lessons_in_course = SerializerMethodField()
     lessons = SerializerMethodField()
     is_subscribed = SerializerMethodField()
 
     def get_count_lessons_in_course(self, course):
+        # Аннотация из CourseViewSet.get_queryset избавляет от COUNT на каждый курс
+        if hasattr(course, "lessons_count"):
+            return course.lessons_count
         return course.lesson_set.count()
 
     def get_lessons(self, course):
@@ -40,6 +70,8 @@ class CourseDetailSerializer(ModelSerializer):
         return LessonSerializer(lessons, many=True).data
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, "user_is_subscribed"):
+            return obj.user_is_subscribed
         user = self.context["request"].user
         if user.is_authenticated:
             return obj.subscriptions.filter(user=user).exists()
@@ -53,16 +85,55 @@ class CourseDetailSerializer(ModelSerializer):
             "lessons",
             "is_subscribed",
         )
+        expandable_fields = ("lessons",)
+
 
+class LessonSerializer(SparseFieldsetSerializerMixin, ModelSerializer):
+    preview_variants = ImageVariantsField()
 
-class LessonSerializer(ModelSerializer):
     class Meta:
         model = Lesson
-        fields = "__all__"
+        exclude = ("search_vector", "preview_hash")
         extra_kwargs = {"video_link": {"validators": [validate_youtube_url]}}
 
 
-class SubscriptionSerializer(ModelSerializer):
+class CourseSearchSerializer(CourseSerializer):
+    rank = FloatField(read_only=True)
+
+
+class LessonSearchSerializer(LessonSerializer):
+    rank = FloatField(read_only=True)
+
+
+class SubscriptionSerializer(SparseFieldsetSerializerMixin, ModelSerializer):
     class Meta:
         model = Subscription
         fields = "__all__"
+
+
+class SubscriptionBulkSerializer(Serializer):
+    """Список курсов для подписки и список курсов для отписки."""
+
+    subscribe = ListField(
+        child=IntegerField(min_value=1), required=False, default=list, max_length=500
+    )
+    unsubscribe = ListField(
+        child=IntegerField(min_value=1), required=False, default=list, max_length=500
+    )
+
+    def validate(self, attrs):
+        subscribe = set(attrs["subscribe"])
+        unsubscribe = set(attrs["unsubscribe"])
+        if not subscribe and not unsubscribe:
+            raise ValidationError("Укажите курсы для подписки или отписки")
+        if subscribe & unsubscribe:
+            raise ValidationError(
+                "Курс не может быть одновременно в subscribe и unsubscribe"
+            )
+        existing = set(
+            Course.objects.filter(id__in=subscribe).values_list("id", flat=True)
+        )
+        missing = subscribe - existing
+        if missing:
+            raise ValidationError({"subscribe": f"Курсы не найдены: {sorted(missing)}"})
+        return {"subscribe": subscribe, "unsubscribe": unsubscribe}
@@ -0,0 +1,59 @@
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from materials.caching import bump_course_version, invalidate_user_subscriptions
+from materials.images import remember_image_names
+from materials.models import Course, Lesson, Subscription
+from materials.tasks import schedule_image_variants
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def reset_course_cache(sender, instance, **kwargs):
+    # Версия повышается после коммита: иначе параллельный запрос успел бы
+    # закэшировать старые данные под новой версией
+    transaction.on_commit(partial(bump_course_version, instance.pk))
+
+
+@receiver(post_init, sender=Lesson)
+def remember_lesson_course(sender, instance, **kwargs):
+    # Без обращения к отложенному полю, чтобы не делать лишний запрос
+    instance._loaded_course_id = instance.__dict__.get("course_id")
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def reset_lesson_course_cache(sender, instance, **kwargs):
+    # Урок мог быть перенесен в другой курс: сбрасываются оба
+    transaction.on_commit(
+        partial(bump_course_version, instance.course_id, instance._loaded_course_id)
+    )
+    instance._loaded_course_id = instance.course_id
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def reset_subscriptions_cache(sender, instance, **kwargs):
+    transaction.on_commit(partial(invalidate_user_subscriptions, instance.user_id))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def reset_new_user_subscriptions_cache(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(partial(invalidate_user_subscriptions, instance.pk))
+
+
+@receiver(post_init, sender=Course)
+@receiver(post_init, sender=Lesson)
+def remember_preview_name(sender, instance, **kwargs):
+    remember_image_names(instance, "preview")
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Lesson)
+def build_preview_variants(sender, instance, **kwargs):
+    schedule_image_variants(instance, "preview")
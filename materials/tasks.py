@@ -1,30 +1,266 @@
-from django.core.mail import send_mail
+import logging
+import time
+from itertools import islice
+from smtplib import SMTPException
+
 from celery import shared_task
-from config import settings
+from celery.utils.time import get_exponential_backoff_interval
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, UnidentifiedImageError
+
+from materials.images import (
+    content_hash,
+    hash_field,
+    loaded_image_name,
+    render_variants,
+    variants_field,
+)
 from materials.models import Course, Subscription
-import logging
 
 logger = logging.getLogger(__name__)
 
+
+def _chunks(iterable, size):
+    """Разбивает поток значений на списки не длиннее size."""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def notification_pending_key(course_id) -> str:
+    return f"materials:course:{course_id}:notification:pending"
+
+
+def notification_change_key(course_id, field_name) -> str:
+    return f"materials:course:{course_id}:notification:changes:{field_name}"
+
+
+def schedule_course_update_notification(course_id, changed_fields=()):
+    """
+    Ставит уведомление об обновлении курса с задержкой и объединяет повторы.
+
+    Все изменения курса в пределах окна COURSE_NOTIFICATION_DEBOUNCE_SECONDS
+    попадают в одну отложенную задачу: пока она ждет, маркер в кэше подавляет
+    новые задачи, а измененные поля накапливаются для текста письма.
+    Возвращает True, если была поставлена новая задача.
+    """
+    window = settings.COURSE_NOTIFICATION_DEBOUNCE_SECONDS
+    if window <= 0:
+        send_course_update_notification.delay(course_id, list(changed_fields))
+        return True
+
+    # Маркер и изменения живут дольше окна, чтобы пережить задержку очереди.
+    # Каждое поле — отдельный ключ: параллельные правки не перезаписывают
+    # накопленное друг друга, как при чтении и записи общего множества
+    timeout = window * 2
+    cache.set_many(
+        {notification_change_key(course_id, field): True for field in changed_fields},
+        timeout,
+    )
+
+    if not cache.add(notification_pending_key(course_id), True, timeout):
+        return False
+    send_course_update_notification.apply_async(args=[course_id], countdown=window)
+    return True
+
+
+def _pop_pending_changes(course_id):
+    # Маркер снимается до чтения изменений: правка, пришедшая в этот момент,
+    # поставит новую задачу, а не потеряется
+    cache.delete(notification_pending_key(course_id))
+    # delete атомарно сообщает, был ли ключ: поле попадает ровно в одну рассылку
+    return {
+        field.name
+        for field in Course._meta.concrete_fields
+        if cache.delete(notification_change_key(course_id, field.name))
+    }
+
+
+def _changes_summary(changed_fields):
+    names = []
+    for field_name in sorted(changed_fields):
+        try:
+            names.append(str(Course._meta.get_field(field_name).verbose_name))
+        except FieldDoesNotExist:
+            names.append(field_name)
+    return ", ".join(names)
+
+
 @shared_task
-def send_course_update_notification(course_id):
+def send_course_update_notification(course_id, changed_fields=None):
+    """Разбивает подписчиков курса на пакеты и ставит отправку каждого в очередь.
+
+    Без changed_fields берет изменения, накопленные отложенными обновлениями.
+    """
     try:
-        course = Course.objects.get(id=course_id)
-        subscribers_emails = Subscription.objects.filter(
-            course=course
-        ).values_list('user__email', flat=True)
+        if changed_fields is None:
+            changed_fields = _pop_pending_changes(course_id)
+        summary = _changes_summary(changed_fields)
+        course = Course.objects.only("id", "name").get(id=course_id)
+        batch_size = settings.COURSE_NOTIFICATION_BATCH_SIZE
+        # Адреса читаются потоком, без загрузки всего списка в память
+        subscribers_emails = (
+            Subscription.objects.filter(course_id=course.id)
+            .order_by("id")
+            .values_list("user__email", flat=True)
+            .iterator(chunk_size=batch_size)
+        )
+
+        total = batches = 0
+        for batch in _chunks(subscribers_emails, batch_size):
+            send_course_update_batch.delay(course.id, course.name, batch, summary)
+            total += len(batch)
+            batches += 1
 
-        if not subscribers_emails:
+        if not total:
             return "Нет подписчиков для рассылки"
 
-        send_mail(
-            subject=f"Обновление курса: {course.name}",
-            message=f"Курс '{course.name}' был обновлен",
-            from_email=settings.EMAIL_HOST_USER,
-            recipient_list=list(subscribers_emails),
-            fail_silently=False,
+        logger.info(
+            f"Рассылка по курсу {course.id}: {total} подписчиков, {batches} пакетов"
         )
-        return f"Уведомления отправлены {len(subscribers_emails)} подписчикам"
+        return f"Уведомления для {total} подписчиков поставлены в очередь ({batches} пакетов)"
     except Exception as e:
         logger.error(f"Ошибка: {str(e)}")
-        return f"Ошибка при отправке: {str(e)}"
\ No newline at end of file
+        return f"Ошибка при отправке: {str(e)}"
+
+
+@shared_task(bind=True, max_retries=5)
+def send_course_update_batch(self, course_id, course_name, emails, summary=""):
+    """Отправляет пакет уведомлений через одно SMTP-соединение.
+
+    При ошибке SMTP повторяется только остаток пакета: письма, ушедшие
+    до сбоя, повторно не отправляются.
+    """
+    started = time.monotonic()
+    body = f"Курс '{course_name}' был обновлен"
+    if summary:
+        body += f"\nИзменено: {summary}"
+    messages = [
+        EmailMessage(
+            subject=f"Обновление курса: {course_name}",
+            body=body,
+            from_email=settings.EMAIL_HOST_USER,
+            to=[email],
+        )
+        for email in emails
+    ]
+    sent = done = 0
+    try:
+        with get_connection(fail_silently=False) as connection:
+            for message in messages:
+                sent += connection.send_messages([message]) or 0
+                done += 1
+    except (SMTPException, OSError) as e:
+        logger.warning(
+            f"Пакет уведомлений курса {course_id}: ошибка после {done}/{len(emails)} "
+            f"писем, повтор для оставшихся: {str(e)}"
+        )
+        raise self.retry(
+            exc=e,
+            args=[course_id, course_name, emails[done:], summary],
+            countdown=get_exponential_backoff_interval(
+                factor=1, retries=self.request.retries, maximum=600, full_jitter=True
+            ),
+        )
+    elapsed = time.monotonic() - started
+
+    rate = sent / elapsed if elapsed else float(sent)
+    logger.info(
+        f"Пакет уведомлений курса {course_id}: отправлено {sent}/{len(emails)} "
+        f"писем за {elapsed:.3f} с ({rate:.1f} писем/с), попытка {self.request.retries + 1}"
+    )
+    return {
+        "course_id": course_id,
+        "sent": sent,
+        "seconds": round(elapsed, 3),
+        "emails_per_second": round(rate, 1),
+    }
+
+
+def _has_updated_at(model):
+    # updated_at входит в ETag и Last-Modified: без него клиенты с кэшем
+    # получали бы 304 и не видели новые копии изображения
+    try:
+        model._meta.get_field("updated_at")
+    except FieldDoesNotExist:
+        return False
+    return True
+
+
+def schedule_image_variants(instance, field_name):
+    """
+    Ставит построение копий изображения после сохранения, если файл сменился.
+
+    Копии прежнего файла сбрасываются сразу, чтобы не отдавать старое
+    изображение, пока задача строит новые. Имя загруженного файла хранится
+    в instance._image_names (заполняется в post_init).
+    """
+    name = loaded_image_name(instance, field_name)
+    if name is None:
+        return False
+    previous = instance._image_names.get(field_name)
+    instance._image_names[field_name] = name
+    if name == previous:
+        return False
+
+    reset = {variants_field(field_name): {}, hash_field(field_name): ""}
+    if any(getattr(instance, field, None) for field in reset):
+        if _has_updated_at(type(instance)):
+            reset["updated_at"] = timezone.now()
+        type(instance)._default_manager.filter(pk=instance.pk).update(**reset)
+        for field, value in reset.items():
+            setattr(instance, field, value)
+    if not name:
+        return False
+    transaction.on_commit(
+        lambda: generate_image_variants.delay(
+            instance._meta.label, instance.pk, field_name, name
+        )
+    )
+    return True
+
+
+@shared_task
+def generate_image_variants(model_label, pk, field_name, name):
+    """Строит уменьшенные копии изображения и сохраняет их пути в модели.
+
+    Повтор задачи и повторная загрузка того же изображения не кодируют
+    его заново: копии адресуются хэшем содержимого.
+    """
+    model = apps.get_model(model_label)
+    instance = model._default_manager.filter(pk=pk).first()
+    if instance is None or getattr(instance, field_name).name != name:
+        return "Изображение уже заменено или удалено"
+
+    image = getattr(instance, field_name)
+    try:
+        with image.open("rb"):
+            digest = content_hash(image)
+            if digest == getattr(instance, hash_field(field_name)) and getattr(
+                instance, variants_field(field_name)
+            ):
+                return "Копии изображения уже построены"
+            started = time.monotonic()
+            variants = render_variants(image, digest)
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as e:
+        logger.error(f"Ошибка обработки изображения {model_label} {pk}: {str(e)}")
+        return f"Ошибка обработки изображения: {str(e)}"
+
+    setattr(instance, variants_field(field_name), variants)
+    setattr(instance, hash_field(field_name), digest)
+    update_fields = [variants_field(field_name), hash_field(field_name)]
+    if _has_updated_at(model):
+        update_fields.append("updated_at")
+    # Сохранение запускает обычные сигналы модели (сброс кэша ответов)
+    instance.save(update_fields=update_fields)
+    logger.info(
+        f"Копии изображения {model_label} {pk} ({field_name}) построены "
+        f"за {time.monotonic() - started:.3f} с"
+    )
+    return variants
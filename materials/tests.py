@@ -1,9 +1,61 @@
+import io
+import json
+import tempfile
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+from pathlib import Path
+from uuid import UUID
+
 from django.contrib.auth.models import Group
+from unittest import skipUnless
+from smtplib import SMTPServerDisconnected
+from unittest.mock import patch
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import urlencode
+from django.utils.translation import gettext_lazy
 from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APITestCase
+from PIL import Image
+from rest_framework_simplejwt.tokens import RefreshToken
+from config.celery import app as celery_app
+from config.middleware import QueryBudgetExceeded
+from config import schema
+from config.renderers import ORJSONParser, ORJSONRenderer
+from materials.management.commands.benchmark_api import (
+    apply_role,
+    seed_dataset,
+    summarize,
+)
+from materials.management.commands.profile_startup import (
+    parse_importtime,
+    summarize_imports,
+)
+from materials.caching import course_version_key, get_version
+from materials.checks import check_shared_cache
+from materials.images import IMAGE_FORMATS, IMAGE_VARIANTS
 from materials.models import Course, Lesson, Subscription
-from users.models import User
+from materials.views import CourseViewSet
+from materials.tasks import (
+    generate_image_variants,
+    send_course_update_batch,
+    send_course_update_notification,
+)
+from users.models import Payment, User
+from users.roles import MODERATORS_GROUP
+from users.tasks import check_inactive_users
 
 
 # Create your tests here.
@@ -108,3 +160,1253 @@ class SubscriptionTestCase(APITestCase):
         self.assertFalse(
             Subscription.objects.filter(user=self.user, course=self.course).exists()
         )
+
+
+@override_settings(COURSE_RESPONSE_CACHE_TIMEOUT=0)
+class CourseQueryCountTestCase(APITestCase):
+    def setUp(self):
+        """Подготовка курсов с уроками и подписками."""
+        self.user = User.objects.create(email="reader@test.com", password="testpass")
+        self.list_url = reverse("materials:course-list")
+
+    def _create_courses(self, count):
+        start = Course.objects.count()
+        for i in range(start, start + count):
+            course = Course.objects.create(name=f"Course {i}")
+            for j in range(3):
+                Lesson.objects.create(
+                    name=f"Lesson {i}-{j}",
+                    course=course,
+                    video_link=f"https://youtube.com/{i}-{j}",
+                )
+            if i % 2 == 0:
+                Subscription.objects.create(user=self.user, course=course)
+
+    def test_course_list_query_count_is_constant(self):
+        """Число запросов списка курсов не зависит от размера страницы."""
+        self.client.force_authenticate(user=self.user)
+        self._create_courses(1)
+        with self.assertNumQueries(3):
+            self.client.get(self.list_url)
+
+        self._create_courses(4)
+        with self.assertNumQueries(3):
+            response = self.client.get(self.list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data["results"]
+        self.assertEqual(len(results), 5)
+        self.assertEqual(results[0]["count_lessons_in_course"], 3)
+        self.assertEqual(len(results[0]["lessons"]), 3)
+        self.assertEqual(
+            [course["is_subscribed"] for course in results],
+            [True, False, True, False, True],
+        )
+
+    def test_course_retrieve_query_count(self):
+        """Детальная информация о курсе собирается фиксированным числом запросов."""
+        self.client.force_authenticate(user=self.user)
+        self._create_courses(1)
+        course = Course.objects.get()
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                reverse("materials:course-detail", kwargs={"pk": course.pk})
+            )
+        self.assertEqual(response.data["count_lessons_in_course"], 3)
+        self.assertTrue(response.data["is_subscribed"])
+
+
+class LessonCursorPaginationTestCase(APITestCase):
+    def setUp(self):
+        """Подготовка уроков для постраничного обхода."""
+        self.user = User.objects.create(email="pager@test.com", password="testpass")
+        self.course = Course.objects.create(name="Paged Course")
+        for i in range(25):
+            Lesson.objects.create(
+                name=f"Lesson {i}",
+                course=self.course,
+                video_link=f"https://youtube.com/page-{i}",
+            )
+        self.url = reverse("materials:lessons_list")
+
+    def test_page_number_mode_is_default(self):
+        """Без параметров остается постраничная пагинация с count."""
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.data["count"], 25)
+
+    def test_cursor_mode_walks_all_lessons_without_count(self):
+        """Keyset-режим обходит все уроки по курсору и не считает COUNT(*)."""
+        self.client.force_authenticate(user=self.user)
+        seen = []
+        url = f"{self.url}?pagination=cursor"
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            self.assertNotIn("count", response.data)
+            seen.extend(lesson["id"] for lesson in response.data["results"])
+            url = response.data["next"]
+        self.assertEqual(
+            seen, list(Lesson.objects.order_by("id").values_list("id", flat=True))
+        )
+
+
+# В тестах один процесс: кэш в памяти для него общий
+@override_settings(COURSE_RESPONSE_CACHE_TIMEOUT=300)
+class CourseResponseCacheTestCase(APITestCase):
+    def setUp(self):
+        """Подготовка курса, урока и двух читателей."""
+        cache.clear()
+        self.reader = User.objects.create(email="cached@test.com", password="testpass")
+        self.other = User.objects.create(email="other@test.com", password="testpass")
+        self.course = Course.objects.create(name="Cached Course")
+        self.lesson = Lesson.objects.create(
+            name="Cached Lesson",
+            course=self.course,
+            video_link="https://youtube.com/cached",
+        )
+        self.detail_url = reverse(
+            "materials:course-detail", kwargs={"pk": self.course.pk}
+        )
+
+    def test_course_detail_is_served_from_cache(self):
+        """Повторное чтение курса не обращается к БД."""
+        self.client.force_authenticate(user=self.reader)
+        self.client.get(self.detail_url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.detail_url)
+        self.assertEqual(response.data["name"], "Cached Course")
+        self.assertEqual(response.data["count_lessons_in_course"], 1)
+
+    def test_course_version_is_bumped_after_commit(self):
+        """До коммита версия курса прежняя: чтение не закэширует старые данные."""
+        key = course_version_key(self.course.pk)
+        version = get_version(key)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.lesson.name = "Uncommitted"
+            self.lesson.save()
+            self.assertEqual(get_version(key), version)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_version(key), version)
+
+    def test_lesson_change_bumps_course_version(self):
+        """Изменение урока сбрасывает закэшированные данные курса."""
+        self.client.force_authenticate(user=self.reader)
+        self.client.get(self.detail_url)
+        self.lesson.name = "Renamed Lesson"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lesson.save()
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.data["lessons"][0]["name"], "Renamed Lesson")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lesson.delete()
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.data["count_lessons_in_course"], 0)
+
+    def test_sparse_list_without_id_merges_subscription(self):
+        """?fields= без id: подписка подмешивается, id в ответ не попадает."""
+        with self.captureOnCommitCallbacks(execute=True):
+            Subscription.objects.create(user=self.reader, course=self.course)
+        self.client.force_authenticate(user=self.reader)
+        url = reverse("materials:course-list")
+        for path in (url, reverse("materials:async_course_list")):
+            response = self.client.get(path, {"fields": "name,is_subscribed"})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(
+                response.json()["results"],
+                [{"name": "Cached Course", "is_subscribed": True}],
+            )
+
+        self.client.force_authenticate(user=self.other)
+        response = self.client.get(url, {"fields": "name,is_subscribed"})
+        self.assertEqual(
+            response.json()["results"],
+            [{"name": "Cached Course", "is_subscribed": False}],
+        )
+
+    def test_subscription_changes_only_user_fragment(self):
+        """Подписка меняет is_subscribed только у подписавшегося пользователя."""
+        self.client.force_authenticate(user=self.reader)
+        self.client.get(self.detail_url)
+        self.client.force_authenticate(user=self.other)
+        self.client.get(self.detail_url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Subscription.objects.create(user=self.reader, course=self.course)
+
+        self.client.force_authenticate(user=self.reader)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.detail_url)
+        self.assertTrue(response.data["is_subscribed"])
+
+        self.client.force_authenticate(user=self.other)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.detail_url)
+        self.assertFalse(response.data["is_subscribed"])
+
+    def test_course_list_merges_user_fragment(self):
+        """Список курсов общий, а is_subscribed — свой у каждого пользователя."""
+        Subscription.objects.create(user=self.reader, course=self.course)
+        list_url = reverse("materials:course-list")
+
+        self.client.force_authenticate(user=self.reader)
+        response = self.client.get(list_url)
+        self.assertTrue(response.data["results"][0]["is_subscribed"])
+
+        self.client.force_authenticate(user=self.other)
+        with self.assertNumQueries(1):
+            response = self.client.get(list_url)
+        self.assertFalse(response.data["results"][0]["is_subscribed"])
+
+
+class SubscriptionBulkTestCase(APITestCase):
+    def setUp(self):
+        """Подготовка курсов для массовой подписки."""
+        self.user = User.objects.create(email="bulk@test.com", password="testpass")
+        self.courses = [Course.objects.create(name=f"Course {i}") for i in range(5)]
+        self.url = reverse("materials:subscriptions_bulk")
+
+    def test_bulk_subscribe_and_unsubscribe(self):
+        """Подписка и отписка на несколько курсов одним запросом."""
+        self.client.force_authenticate(user=self.user)
+        Subscription.objects.create(user=self.user, course=self.courses[0])
+        Subscription.objects.create(user=self.user, course=self.courses[4])
+        subscribe = [course.pk for course in self.courses[:3]]
+
+        response = self.client.post(
+            self.url,
+            data={"subscribe": subscribe, "unsubscribe": [self.courses[4].pk]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(
+                Subscription.objects.filter(user=self.user).values_list(
+                    "course_id", flat=True
+                )
+            ),
+            set(subscribe),
+        )
+
+    def test_bulk_subscribe_unknown_course(self):
+        """Несуществующий курс отклоняется целиком."""
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(
+            self.url, data={"subscribe": [self.courses[0].pk, 999999]}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Subscription.objects.exists())
+
+    def test_subscription_is_unique(self):
+        """Повторная подписка на тот же курс запрещена на уровне БД."""
+        Subscription.objects.create(user=self.user, course=self.courses[0])
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Subscription.objects.create(user=self.user, course=self.courses[0])
+
+
+@override_settings(COURSE_NOTIFICATION_BATCH_SIZE=2)
+class CourseUpdateNotificationTestCase(APITestCase):
+    def setUp(self):
+        """Подготовка курса с пятью подписчиками."""
+        self.course = Course.objects.create(name="Notified Course")
+        for i in range(5):
+            user = User.objects.create(email=f"sub{i}@test.com", password="testpass")
+            Subscription.objects.create(user=user, course=self.course)
+
+    def test_notification_is_split_into_batches(self):
+        """Подписчики разбиваются на пакеты, каждый отправляется отдельной задачей."""
+        with patch.object(
+            send_course_update_batch, "delay", side_effect=send_course_update_batch
+        ) as delay:
+            send_course_update_notification(self.course.pk)
+
+        self.assertEqual(
+            [len(call.args[2]) for call in delay.call_args_list], [2, 2, 1]
+        )
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            [f"sub{i}@test.com" for i in range(5)],
+        )
+
+    def test_batch_reports_metrics(self):
+        """Пакет возвращает число отправленных писем и скорость отправки."""
+        result = send_course_update_batch(
+            self.course.pk, self.course.name, ["a@test.com", "b@test.com"]
+        )
+        self.assertEqual(result["sent"], 2)
+        self.assertIn("emails_per_second", result)
+
+    def test_batch_retry_resends_only_failed_emails(self):
+        """Повтор после сбоя SMTP отправляет только неотправленные письма."""
+        send_messages = EmailBackend.send_messages
+        failures = iter([False, False, True])
+
+        def flaky_send(backend, messages):
+            if next(failures, False):
+                raise SMTPServerDisconnected("connection lost")
+            return send_messages(backend, messages)
+
+        emails = [f"sub{i}@test.com" for i in range(5)]
+        with patch.object(EmailBackend, "send_messages", flaky_send), self.assertLogs(
+            "materials.tasks", level="WARNING"
+        ):
+            result = send_course_update_batch.apply(
+                args=[self.course.pk, self.course.name, emails]
+            )
+
+        self.assertEqual(result.get()["sent"], 3)
+        self.assertEqual([message.to[0] for message in mail.outbox], emails)
+
+
+@override_settings(COURSE_NOTIFICATION_DEBOUNCE_SECONDS=60)
+class CourseUpdateDebounceTestCase(APITestCase):
+    def setUp(self):
+        """Подготовка курса автора с одним подписчиком."""
+        cache.clear()
+        self.owner = User.objects.create(email="author@test.com", password="testpass")
+        self.subscriber = User.objects.create(
+            email="reader@test.com", password="testpass"
+        )
+        self.course = Course.objects.create(name="Draft", owner=self.owner)
+        Subscription.objects.create(user=self.subscriber, course=self.course)
+        self.url = reverse("materials:course-detail", kwargs={"pk": self.course.pk})
+
+    def test_updates_within_window_are_coalesced(self):
+        """Несколько правок курса подряд ставят одну отложенную рассылку."""
+        self.client.force_authenticate(user=self.owner)
+        with patch.object(send_course_update_notification, "apply_async") as schedule:
+            self.client.patch(self.url, data={"name": "Draft 2"})
+            self.client.patch(self.url, data={"description": "Новое описание"})
+            self.client.patch(self.url, data={"name": "Final"})
+        schedule.assert_called_once_with(args=[self.course.pk], countdown=60)
+
+        with patch.object(
+            send_course_update_batch, "delay", side_effect=send_course_update_batch
+        ):
+            send_course_update_notification(self.course.pk)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("Название курса", mail.outbox[0].body)
+        self.assertIn("Описание курса", mail.outbox[0].body)
+
+        # После отправки новая правка снова ставит задачу
+        with patch.object(send_course_update_notification, "apply_async") as schedule:
+            self.client.patch(self.url, data={"name": "Final 2"})
+        schedule.assert_called_once()
+
+    def test_update_without_changes_is_not_notified(self):
+        """Сохранение без изменений не порождает рассылку."""
+        self.client.force_authenticate(user=self.owner)
+        with patch.object(send_course_update_notification, "apply_async") as schedule:
+            self.client.patch(self.url, data={"name": "Draft"})
+        schedule.assert_not_called()
+
+
+@override_settings(COURSE_RESPONSE_CACHE_TIMEOUT=0)
+class QueryPlanTestCase(APITestCase):
+    """Проверка, что горячие запросы представлений и задач используют индексы (EXPLAIN)."""
+
+    def setUp(self):
+        self.user = User.objects.create(email="plan@test.com", password="testpass")
+        self.course = Course.objects.create(name="Plan Course")
+        Lesson.objects.create(name="Plan Lesson", course=self.course)
+        Subscription.objects.create(user=self.user, course=self.course)
+        Payment.objects.create(
+            user=self.user, paid_course=self.course, amount=100, payment_method="card"
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def explain(self, sql):
+        with transaction.atomic(), connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                # На маленьких тестовых таблицах планировщик выбрал бы seq scan
+                cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}")
+            return "\n".join(" ".join(map(str, row)) for row in cursor.fetchall())
+
+    def assertQueriesUseIndex(self, queries, table, *index_names):
+        """Каждый выполненный SELECT по таблице table использует один из индексов."""
+        selects = [
+            query["sql"]
+            for query in queries
+            if query["sql"].startswith("SELECT") and f'FROM "{table}"' in query["sql"]
+        ]
+        self.assertTrue(selects, f"Нет запросов к {table}")
+        for sql in selects:
+            plan = self.explain(sql)
+            self.assertTrue(
+                any(index_name in plan for index_name in index_names),
+                f"Ни один из индексов {index_names} не используется:\n{sql}\n{plan}",
+            )
+
+    def test_course_list_subscription_uses_unique_index(self):
+        """is_subscribed в списке курсов проверяется по уникальному индексу подписки."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse("materials:course-list"), {"fields": "id,is_subscribed"}
+            )
+        self.assertTrue(response.data["results"][0]["is_subscribed"])
+        self.assertQueriesUseIndex(
+            queries,
+            "materials_subscription",
+            "unique_subscription_user_course",
+            # SQLite создает индекс ограничения под своим именем
+            "sqlite_autoindex_materials_subscription",
+        )
+
+    def test_payment_list_uses_user_date_index(self):
+        """Список платежей пользователя читается по индексу (user, -payment_date)."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("users:payment-list"))
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertQueriesUseIndex(
+            queries, "users_payment", "users_payment_user_date_idx"
+        )
+
+    def test_user_list_payments_use_user_date_index(self):
+        """Сводка и последние платежи в списке пользователей идут по тому же индексу."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("users:users-list"))
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertQueriesUseIndex(
+            queries, "users_payment", "users_payment_user_date_idx"
+        )
+
+    def test_course_lessons_use_course_id_index(self):
+        """Уроки курса подгружаются по индексу (course, id)."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse("materials:course-detail", kwargs={"pk": self.course.pk})
+            )
+        self.assertEqual(len(response.data["lessons"]), 1)
+        self.assertQueriesUseIndex(
+            queries, "materials_lesson", "materials_lesson_course_id_idx"
+        )
+
+    def test_inactive_users_sweep_uses_active_id_index(self):
+        """Пакет неактивных пользователей читается по индексу (id, last_login)."""
+        with CaptureQueriesContext(connection) as queries:
+            check_inactive_users(resume=False)
+        self.assertQueriesUseIndex(
+            queries, "users_user", "users_user_active_id_login_idx"
+        )
+
+
+@override_settings(COURSE_RESPONSE_CACHE_TIMEOUT=0)
+class SparseFieldsetTestCase(APITestCase):
+    def setUp(self):
+        """Подготовка курса с уроком."""
+        self.user = User.objects.create(email="mobile@test.com", password="testpass")
+        self.course = Course.objects.create(
+            name="Sparse Course", description="Длинное описание"
+        )
+        Lesson.objects.create(
+            name="Sparse Lesson",
+            description="Длинное описание урока",
+            course=self.course,
+            video_link="https://youtube.com/sparse",
+        )
+
+    def test_fields_limit_response_and_sql(self):
+        """?fields= оставляет только запрошенные поля и не считает лишнего."""
+        self.client.force_authenticate(user=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse("materials:course-list"), {"fields": "id,name"}
+            )
+        self.assertEqual(
+            response.data["results"], [{"id": self.course.pk, "name": "Sparse Course"}]
+        )
+        # COUNT для пагинации и один SELECT без описания, уроков и подписок
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn("description", queries[1]["sql"])
+
+    def test_expand_adds_expensive_field(self):
+        """?expand=lessons добавляет уроки к выбранным полям."""
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(
+            reverse("materials:course-list"), {"fields": "id", "expand": "lessons"}
+        )
+        course = response.data["results"][0]
+        self.assertEqual(set(course), {"id", "lessons"})
+        self.assertEqual(course["lessons"][0]["name"], "Sparse Lesson")
+
+    def test_lesson_list_fields(self):
+        """Sparse fieldset работает и для списка уроков."""
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(
+            reverse("materials:lessons_list"), {"fields": "id,name"}
+        )
+        self.assertEqual(set(response.data["results"][0]), {"id", "name"})
+
+
+class SearchTestCase(APITestCase):
+    def setUp(self):
+        """Курсы и уроки с русскими названиями для поиска."""
+        self.user = User.objects.create(email="search@test.com", password="testpass")
+        self.course = Course.objects.create(
+            name="Программирование на Python", description="Основы языка"
+        )
+        Course.objects.create(name="Рисование", description="Акварель и гуашь")
+        for i in range(15):
+            Lesson.objects.create(
+                name=f"Функции {i}",
+                description="Аргументы функций и возвращаемые значения",
+                course=self.course,
+                video_link=f"https://youtube.com/search-{i}",
+            )
+        Lesson.objects.create(
+            name="Циклы",
+            description="Цикл for",
+            course=self.course,
+            video_link="https://youtube.com/search-loops",
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_query_is_required(self):
+        """Без ?q= поиск возвращает 400."""
+        response = self.client.get(reverse("materials:course_search"))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_course_search_returns_ranked_matches(self):
+        """Поиск курсов находит совпадения и возвращает rank."""
+        response = self.client.get(reverse("materials:course_search"), {"q": "Python"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data["results"]
+        self.assertEqual([course["id"] for course in results], [self.course.id])
+        self.assertIn("rank", results[0])
+        self.assertEqual(results[0]["count_lessons_in_course"], 16)
+
+    def test_lesson_search_walks_pages_by_cursor(self):
+        """Результаты поиска уроков обходятся keyset-курсором без COUNT(*)."""
+        seen = []
+        url = reverse("materials:lesson_search") + "?" + urlencode({"q": "Функции"})
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            self.assertNotIn("count", response.data)
+            seen.extend(lesson["id"] for lesson in response.data["results"])
+            url = response.data["next"]
+        self.assertEqual(len(seen), 15)
+        self.assertEqual(len(set(seen)), 15)
+
+    def test_search_cursor_walks_back_over_equal_ranks(self):
+        """Курсор (rank, id) не теряет записи с равным rank в обе стороны."""
+        url = (
+            reverse("materials:lesson_search")
+            + "?"
+            + urlencode({"q": "Функции", "page_size": 4})
+        )
+        pages = []
+        while url:
+            response = self.client.get(url)
+            pages.append([lesson["id"] for lesson in response.data["results"]])
+            url = response.data["next"]
+        self.assertEqual(sum(len(page) for page in pages), 15)
+
+        url = response.data["previous"]
+        for expected in reversed(pages[:-1]):
+            response = self.client.get(url)
+            self.assertEqual(
+                [lesson["id"] for lesson in response.data["results"]], expected
+            )
+            url = response.data["previous"]
+        self.assertIsNone(url)
+
+    @skipUnless(connection.vendor == "postgresql", "Полнотекстовый поиск PostgreSQL")
+    def test_search_uses_russian_stemming(self):
+        """Вектор обновляется при сохранении, словоформы находятся по основе."""
+        response = self.client.get(reverse("materials:lesson_search"), {"q": "циклами"})
+        self.assertEqual(
+            [lesson["name"] for lesson in response.data["results"]], ["Циклы"]
+        )
+
+        lesson = Lesson.objects.get(name="Циклы")
+        lesson.description = "Рекурсия"
+        lesson.save()
+        response = self.client.get(
+            reverse("materials:lesson_search"), {"q": "рекурсии"}
+        )
+        self.assertEqual([item["id"] for item in response.data["results"]], [lesson.id])
+
+    @skipUnless(connection.vendor == "postgresql", "Полнотекстовый поиск PostgreSQL")
+    def test_name_match_ranks_above_description_match(self):
+        """Совпадение в названии весит больше совпадения в описании."""
+        other = Course.objects.create(
+            name="Основы рисования", description="Python для художников"
+        )
+        response = self.client.get(reverse("materials:course_search"), {"q": "python"})
+        self.assertEqual(
+            [course["id"] for course in response.data["results"]],
+            [self.course.id, other.id],
+        )
+
+
+@override_settings(CONDITIONAL_GET=True)
+class ConditionalGetTestCase(APITestCase):
+    def setUp(self):
+        """Подготовка курса с уроком, владелец урока читает материалы."""
+        cache.clear()
+        self.user = User.objects.create(email="etag@test.com", password="testpass")
+        self.course = Course.objects.create(name="ETag Course")
+        self.lesson = Lesson.objects.create(
+            name="ETag Lesson",
+            course=self.course,
+            video_link="https://youtube.com/etag",
+            owner=self.user,
+        )
+        self.detail_url = reverse(
+            "materials:course-detail", kwargs={"pk": self.course.pk}
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_unchanged_course_returns_304_without_queries(self):
+        """Актуальная копия курса подтверждается 304 без обращений к БД."""
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response.headers["ETag"]
+        self.assertIn("Last-Modified", response.headers)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.headers["ETag"], etag)
+
+    def test_lesson_change_invalidates_course_etag(self):
+        """Изменение урока меняет ETag и Last-Modified курса."""
+        response = self.client.get(self.detail_url)
+        etag = response.headers["ETag"]
+        last_modified = response.headers["Last-Modified"]
+        self.lesson.name = "Renamed"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lesson.save()
+
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(
+            self.detail_url, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["lessons"][0]["name"], "Renamed")
+
+    def test_subscription_invalidates_course_list(self):
+        """Подписка меняет is_subscribed, поэтому список отдается заново."""
+        url = reverse("materials:course-list")
+        response = self.client.get(url)
+        etag = response.headers["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Subscription.objects.create(user=self.user, course=self.course)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["results"][0]["is_subscribed"])
+
+    def test_lesson_list_if_modified_since(self):
+        """Список уроков отвечает 304 на If-Modified-Since до следующего изменения."""
+        url = reverse("materials:lessons_list")
+        last_modified = self.client.get(url).headers["Last-Modified"]
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Lesson.objects.create(
+                name="New Lesson",
+                course=self.course,
+                video_link="https://youtube.com/etag-new",
+            )
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_lesson_retrieve_skips_serialization(self):
+        """Урок проверяется одним запросом: права и валидаторы без сериализации."""
+        url = reverse("materials:lesson_retrieve", kwargs={"pk": self.lesson.pk})
+        etag = self.client.get(url).headers["ETag"]
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.lesson.description = "Changed"
+        self.lesson.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_other_user_cannot_probe_lesson_etag(self):
+        """Проверка прав выполняется раньше условного ответа."""
+        url = reverse("materials:lesson_retrieve", kwargs={"pk": self.lesson.pk})
+        etag = self.client.get(url).headers["ETag"]
+        other = User.objects.create(email="stranger@test.com", password="testpass")
+        self.client.force_authenticate(user=other)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ORJSONRendererTestCase(SimpleTestCase):
+    """ORJSONRenderer и ORJSONParser совпадают с JSON-классами DRF."""
+
+    def assertSameAsDefault(self, data, renderer_context=None):
+        expected = JSONRenderer().render(data, "application/json", renderer_context)
+        actual = ORJSONRenderer().render(data, "application/json", renderer_context)
+        self.assertEqual(actual, expected)
+
+    def test_special_values_match_default_renderer(self):
+        """datetime, Decimal, ленивые строки, UUID и нестроковые ключи."""
+        self.assertSameAsDefault(
+            {
+                "naive": datetime(2025, 1, 2, 3, 4, 5, 123456),
+                "aware": datetime(2025, 1, 2, 3, 4, 5, tzinfo=dt_timezone.utc),
+                "day": date(2025, 1, 2),
+                "price": Decimal("10.50"),
+                "label": gettext_lazy("Курс"),
+                "uuid": UUID("12345678-1234-5678-1234-567812345678"),
+                1: "Юникод строка",
+                "nested": [{"value": None, "flag": True}],
+            }
+        )
+
+    def test_indent_and_big_ints_fall_back(self):
+        """Отступы и целые больше 64 бит обрабатывает JSONRenderer."""
+        self.assertSameAsDefault({"a": [1, 2]}, {"indent": 4})
+        self.assertSameAsDefault({"big": 2**70})
+
+    def test_non_finite_floats_are_rejected(self):
+        """NaN и бесконечность отклоняются так же, как в строгом JSONRenderer."""
+        for value in (float("nan"), float("inf"), float("-inf")):
+            with self.subTest(value=value):
+                data = {"score": None, "stats": [{"avg": value}]}
+                with self.assertRaises(ValueError):
+                    JSONRenderer().render(data)
+                with self.assertRaises(ValueError):
+                    ORJSONRenderer().render(data)
+
+        class LaxRenderer(ORJSONRenderer):
+            strict = False
+
+        data = {"avg": float("nan"), "max": float("inf")}
+        self.assertEqual(LaxRenderer().render(data), b'{"avg":NaN,"max":Infinity}')
+
+    def test_parser(self):
+        """Парсер читает тело запроса и сообщает об ошибке как ParseError."""
+        parser = ORJSONParser()
+        body = '{"name": "Курс", "ids": [1, 2]}'.encode()
+        self.assertEqual(
+            parser.parse(io.BytesIO(body)), {"name": "Курс", "ids": [1, 2]}
+        )
+        with self.assertRaises(ParseError):
+            parser.parse(io.BytesIO(b"{broken"))
+
+
+class BenchmarkApiTestCase(APITestCase):
+    def test_seed_dataset_sizes(self):
+        """Набор данных для замеров создается заданного размера."""
+        user_ids, course_ids = seed_dataset(
+            1, users=5, courses=3, lessons=2, subscribers=2, payments=4
+        )
+        self.assertEqual(len(user_ids), 5)
+        self.assertEqual(len(course_ids), 3)
+        self.assertEqual(Lesson.objects.count(), 6)
+        self.assertEqual(Subscription.objects.count(), 6)
+        self.assertEqual(Payment.objects.count(), 20)
+
+    def test_summarize_reports_percentiles_and_queries(self):
+        """Отчет содержит перцентили задержки и статистику SQL-запросов."""
+        summary = summarize(
+            [float(value) for value in range(1, 101)], [2] * 99 + [5], [200] * 100
+        )
+        self.assertEqual(summary["latency_ms"]["p50"], 50.5)
+        self.assertEqual(summary["latency_ms"]["max"], 100.0)
+        self.assertEqual(summary["queries"], {"min": 2, "max": 5, "mean": 2.03})
+        self.assertEqual(summary["statuses"], {"200": 100})
+
+    def test_single_request_is_rejected(self):
+        """Меньше двух замеров не дают перцентилей: команда сразу отказывает."""
+        with self.assertRaises(CommandError):
+            call_command("benchmark_api", requests=1)
+
+    def test_empty_dataset_is_rejected(self):
+        """Без пользователей или курсов замерять нечего: команда сразу отказывает."""
+        for sizes in ({"users": 0}, {"courses": 0}):
+            with self.subTest(**sizes), self.assertRaises(CommandError):
+                call_command("benchmark_api", **sizes)
+
+    def test_apply_role(self):
+        """Замеры можно вести от имени модератора или сотрудника."""
+        moderator = User.objects.create(email="bench-moder@test.com")
+        staff = User.objects.create(email="bench-staff@test.com")
+        apply_role(moderator, "moderator")
+        apply_role(staff, "staff")
+        self.assertTrue(moderator.groups.filter(name=MODERATORS_GROUP).exists())
+        self.assertTrue(User.objects.get(pk=staff.pk).is_staff)
+
+
+class QueryInstrumentationTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="sql@test.com", password="testpass")
+        self.staff = User.objects.create(
+            email="staff@test.com", password="testpass", is_staff=True
+        )
+        Lesson.objects.create(
+            name="SQL Lesson",
+            course=Course.objects.create(name="SQL Course"),
+            video_link="https://youtube.com/sql",
+        )
+        self.url = reverse("materials:lessons_list")
+
+    def test_staff_gets_query_headers(self):
+        """Staff видит число запросов и время в БД в заголовках ответа."""
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.get(self.url)
+        self.assertEqual(response.headers["X-DB-Queries"], "2")
+        self.assertIn("X-DB-Time-Ms", response.headers)
+        self.assertIn("db;dur=", response.headers["Server-Timing"])
+
+    def test_regular_user_gets_no_query_headers(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.url)
+        self.assertNotIn("X-DB-Queries", response.headers)
+
+    @override_settings(QUERY_BUDGETS={"materials:lessons_list": 1})
+    def test_budget_breach_fails_in_tests(self):
+        """В тестах превышение бюджета роняет запрос."""
+        self.client.force_authenticate(user=self.user)
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(self.url)
+
+    @override_settings(
+        QUERY_BUDGETS={"materials:lessons_list": 1}, QUERY_BUDGET_STRICT=False
+    )
+    def test_budget_breach_logs_warning_in_production(self):
+        """Вне тестов превышение бюджета пишется в лог как структурная запись."""
+        self.client.force_authenticate(user=self.user)
+        with self.assertLogs("config.sql", "WARNING") as logs:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        record = logs.records[0].sql
+        self.assertEqual(record["view"], "materials:lessons_list")
+        self.assertEqual(record["queries"], 2)
+        self.assertTrue(record["budget_exceeded"])
+        self.assertLessEqual(len(record["slowest"]), 3)
+
+    def test_viewset_budget_by_action(self):
+        """Бюджет ViewSet задается по действию."""
+        self.client.force_authenticate(user=self.user)
+        with override_settings(COURSE_RESPONSE_CACHE_TIMEOUT=0):
+            with patch.object(CourseViewSet, "query_budget", {"list": 0}):
+                with self.assertRaises(QueryBudgetExceeded):
+                    self.client.get(reverse("materials:course-list"))
+            with patch.object(CourseViewSet, "query_budget", {"retrieve": 0}):
+                self.client.get(reverse("materials:course-list"))
+
+
+class OpenAPISchemaCacheTestCase(APITestCase):
+    """Схема OpenAPI строится один раз и отдается как статический файл."""
+
+    def setUp(self):
+        self.schema_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.schema_dir.cleanup)
+        settings_override = override_settings(OPENAPI_SCHEMA_DIR=self.schema_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        schema.reset_schema_artifact()
+        self.addCleanup(schema.reset_schema_artifact)
+        self.url = reverse("schema-json", kwargs={"format": ".json"})
+
+    def test_schema_generated_once(self):
+        with patch.object(
+            schema, "generate_schema", wraps=schema.generate_schema
+        ) as generate:
+            first = self.client.get(self.url)
+            second = self.client.get(self.url)
+            yaml = self.client.get(reverse("schema-json", kwargs={"format": ".yaml"}))
+        self.assertEqual(generate.call_count, 1)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.content, second.content)
+        self.assertIn("/materials/", first.json()["paths"])
+        self.assertEqual(yaml["Content-Type"], "application/yaml; charset=utf-8")
+        self.assertIn("max-age=300", first["Cache-Control"])
+        # Схема, построенная на лету, не записывается: файлы пишет только
+        # generate_schema, иначе их читали бы процессы следующего деплоя
+        self.assertEqual(list(Path(self.schema_dir.name).iterdir()), [])
+
+    def test_etag_revalidation(self):
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+
+    def test_artifact_loaded_from_deploy_files(self):
+        """Файлы generate_schema читаются без повторной генерации."""
+        call_command("generate_schema", stdout=io.StringIO())
+        schema.reset_schema_artifact()
+        with patch.object(schema, "generate_schema") as generate:
+            response = self.client.get(self.url)
+        generate.assert_not_called()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_files_are_ignored_without_schema_files_setting(self):
+        """Без OPENAPI_SCHEMA_FILES схема строится заново и файлы не пишутся."""
+        call_command("generate_schema", stdout=io.StringIO())
+        schema.reset_schema_artifact()
+        with override_settings(OPENAPI_SCHEMA_FILES=False), patch.object(
+            schema, "generate_schema", wraps=schema.generate_schema
+        ) as generate, patch.object(schema, "write_schema_artifact") as write:
+            response = self.client.get(self.url)
+        generate.assert_called_once()
+        write.assert_not_called()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_hashed_artifact_is_immutable(self):
+        artifact = schema.get_schema_artifact()
+        url = reverse(
+            "schema-artifact",
+            kwargs={"schema_hash": artifact.schema_hash, "extension": "json"},
+        )
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, artifact.contents["json"])
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertIn("max-age=31536000", response["Cache-Control"])
+
+        stale = reverse(
+            "schema-artifact", kwargs={"schema_hash": "0" * 12, "extension": "json"}
+        )
+        self.assertEqual(self.client.get(stale).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_ui_does_not_generate_schema(self):
+        with patch.object(schema, "generate_schema") as generate:
+            page = self.client.get(reverse("schema-swagger-ui"))
+            spec = self.client.get(reverse("schema-swagger-ui"), {"format": "openapi"})
+        generate.assert_not_called()
+        self.assertEqual(page.status_code, status.HTTP_200_OK)
+        self.assertContains(page, f'"url": "{self.url}"')
+        self.assertEqual(spec.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(COURSE_NOTIFICATION_DEBOUNCE_SECONDS=0)
+class SharedCacheCheckTestCase(SimpleTestCase):
+    @override_settings(COURSE_RESPONSE_CACHE_TIMEOUT=300, CONDITIONAL_GET=False)
+    def test_response_cache_requires_shared_cache(self):
+        """Кэш ответов на кэше в памяти процесса не проходит проверку."""
+        self.assertEqual(
+            [error.id for error in check_shared_cache(None)], ["materials.E001"]
+        )
+        redis = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache"}}
+        with override_settings(CACHES=redis):
+            self.assertEqual(check_shared_cache(None), [])
+
+    @override_settings(COURSE_RESPONSE_CACHE_TIMEOUT=0, CONDITIONAL_GET=True)
+    def test_conditional_get_requires_shared_cache(self):
+        self.assertEqual(
+            [error.id for error in check_shared_cache(None)], ["materials.E002"]
+        )
+
+    @override_settings(
+        COURSE_RESPONSE_CACHE_TIMEOUT=0,
+        CONDITIONAL_GET=False,
+        COURSE_NOTIFICATION_DEBOUNCE_SECONDS=60,
+    )
+    def test_notification_debounce_requires_shared_cache(self):
+        """Отложенные уведомления на кэше в памяти процесса теряют правки."""
+        self.assertEqual(
+            [error.id for error in check_shared_cache(None)], ["materials.E003"]
+        )
+
+    @override_settings(COURSE_RESPONSE_CACHE_TIMEOUT=0, CONDITIONAL_GET=False)
+    def test_disabled_caches_pass(self):
+        self.assertEqual(check_shared_cache(None), [])
+
+
+class CeleryRoutingTestCase(SimpleTestCase):
+    def route(self, task_name):
+        route = celery_app.amqp.router.route({}, task_name)
+        return route["queue"].name, route.get("priority")
+
+    def test_tasks_routed_by_workload(self):
+        """Рассылка, обслуживание и оплата идут в свои очереди."""
+        self.assertEqual(
+            self.route("materials.tasks.send_course_update_notification"),
+            ("notifications", 0),
+        )
+        self.assertEqual(
+            self.route("materials.tasks.send_course_update_batch"),
+            ("notifications", 5),
+        )
+        self.assertEqual(
+            self.route("users.tasks.check_inactive_users"), ("maintenance", 9)
+        )
+        self.assertEqual(
+            self.route("users.tasks.create_checkout_session"), ("payments", 0)
+        )
+        self.assertEqual(self.route("unknown.task")[0], "celery")
+
+    def test_queues_have_own_routing_keys(self):
+        """Сообщение одной очереди не дублируется в другие."""
+        queues = celery_app.amqp.queues.values()
+        self.assertEqual(len({queue.routing_key for queue in queues}), len(queues))
+
+
+class ProfileStartupTestCase(SimpleTestCase):
+    def test_parse_importtime(self):
+        output = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |     stripe._util\n"
+            "import time:      2000 |       2120 |   stripe\n"
+            "import time:       300 |       2420 | users.services\n"
+        )
+        modules = parse_importtime(output)
+        self.assertEqual(
+            [(module["module"], module["depth"]) for module in modules],
+            [("stripe._util", 2), ("stripe", 1), ("users.services", 0)],
+        )
+        summary = summarize_imports(modules, top=1)
+        self.assertEqual(summary["import_ms"], 2.4)
+        self.assertEqual(summary["packages_ms"], {"stripe": 2.1})
+        self.assertEqual(summary["slowest_imports_ms"], {"users.services": 2.4})
+
+    def test_worker_boot_skips_heavy_imports(self):
+        """Воркер Celery стартует без SDK Stripe, drf_yasg и представлений."""
+        output = io.StringIO()
+        call_command(
+            "profile_startup",
+            entry=["worker"],
+            repeat=1,
+            top=10_000,
+            stdout=output,
+            stderr=io.StringIO(),
+        )
+        loaded = json.loads(output.getvalue())["worker"]["slowest_imports_ms"]
+        # Задачи импортируют users.services, но не SDK Stripe
+        self.assertIn("users.services", loaded)
+        for module in ("stripe", "drf_yasg.views", "materials.views", "users.views"):
+            self.assertNotIn(module, loaded)
+
+
+@override_settings(SQL_INSTRUMENTATION_HEADERS=True, CONDITIONAL_GET=True)
+class AsyncViewsTestCase(APITestCase):
+    def setUp(self):
+        """Курс с уроком владельца, модератор и посторонний пользователь."""
+        cache.clear()
+        self.owner = User.objects.create(email="async@test.com", password="testpass")
+        self.moderator = User.objects.create(
+            email="async-moder@test.com", password="testpass"
+        )
+        self.moderator.groups.add(Group.objects.create(name="moders"))
+        self.other_user = User.objects.create(
+            email="async-other@test.com", password="testpass"
+        )
+        self.course = Course.objects.create(name="Async Course")
+        self.lesson = Lesson.objects.create(
+            name="Async Lesson",
+            course=self.course,
+            video_link="https://youtube.com/async",
+            owner=self.owner,
+        )
+
+    def auth_headers(self, user):
+        token = RefreshToken.for_user(user).access_token
+        return {"Authorization": f"Bearer {token}"}
+
+    async def test_course_list_and_detail_match_sync_views(self):
+        """Ответы async-представлений курсов совпадают с синхронными."""
+        headers = self.auth_headers(self.owner)
+        for async_url, sync_url in (
+            (reverse("materials:async_course_list"), reverse("materials:course-list")),
+            (
+                reverse("materials:async_course_detail", args=[self.course.pk]),
+                reverse("materials:course-detail", args=[self.course.pk]),
+            ),
+        ):
+            response = await self.async_client.get(async_url, headers=headers)
+            expected = await self.async_client.get(sync_url, headers=headers)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.json(), expected.json())
+            self.assertLessEqual(int(response.headers["X-DB-Queries"]), 5)
+
+    async def test_unchanged_course_returns_304(self):
+        url = reverse("materials:async_course_detail", args=[self.course.pk])
+        headers = self.auth_headers(self.owner)
+        response = await self.async_client.get(url, headers=headers)
+        response = await self.async_client.get(
+            url, headers={**headers, "If-None-Match": response.headers["ETag"]}
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_lesson_list_requires_authentication(self):
+        url = reverse("materials:async_lessons_list")
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = await self.async_client.get(
+            url, headers=self.auth_headers(self.other_user)
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["results"][0]["name"], "Async Lesson")
+
+    async def test_lesson_retrieve_permissions(self):
+        """Урок видят владелец и модератор, остальным — 403."""
+        url = reverse("materials:async_lesson_retrieve", args=[self.lesson.pk])
+        for user, expected in (
+            (self.owner, status.HTTP_200_OK),
+            (self.moderator, status.HTTP_200_OK),
+            (self.other_user, status.HTTP_403_FORBIDDEN),
+        ):
+            response = await self.async_client.get(url, headers=self.auth_headers(user))
+            self.assertEqual(response.status_code, expected)
+
+    async def test_subscription_toggle(self):
+        url = reverse("materials:async_subscriptions")
+        headers = self.auth_headers(self.other_user)
+        subscription = Subscription.objects.filter(
+            user=self.other_user, course=self.course
+        )
+        response = await self.async_client.post(
+            url,
+            {"course_id": self.course.pk},
+            content_type="application/json",
+            headers=headers,
+        )
+        self.assertEqual(response.json()["message"], "Подписка добавлена")
+        self.assertTrue(await subscription.aexists())
+        response = await self.async_client.post(
+            url,
+            {"course_id": self.course.pk},
+            content_type="application/json",
+            headers=headers,
+        )
+        self.assertEqual(response.json()["message"], "Подписка удалена")
+        self.assertFalse(await subscription.aexists())
+        response = await self.async_client.post(
+            url, {"course_id": "x"}, content_type="application/json", headers=headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+def make_image(name="preview.jpg", size=(2400, 1200), pil_format="JPEG"):
+    """Загружаемое изображение заданного размера."""
+    output = io.BytesIO()
+    mode = "RGBA" if pil_format == "PNG" else "RGB"
+    Image.new(mode, size, "teal").save(output, pil_format)
+    return SimpleUploadedFile(name, output.getvalue())
+
+
+class ImageVariantsTestCase(APITestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media = override_settings(MEDIA_ROOT=media_root.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        cache.clear()
+        self.user = User.objects.create(email="image@test.com", password="testpass")
+
+    def save_and_process(self, instance):
+        """Сохраняет объект и выполняет поставленную после коммита задачу."""
+        with patch.object(
+            generate_image_variants, "delay", side_effect=generate_image_variants
+        ) as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                instance.save()
+        instance.refresh_from_db()
+        return delay
+
+    def test_upload_builds_variants(self):
+        """Загрузка превью строит все размеры в WebP и JPEG."""
+        course = Course(name="Image Course", preview=make_image())
+        self.save_and_process(course)
+
+        self.assertEqual(len(course.preview_hash), 64)
+        self.assertEqual(set(course.preview_variants), set(IMAGE_VARIANTS))
+        for variant, (size, crop) in IMAGE_VARIANTS.items():
+            self.assertEqual(set(course.preview_variants[variant]), set(IMAGE_FORMATS))
+            with default_storage.open(course.preview_variants[variant]["webp"]) as file:
+                with Image.open(file) as image:
+                    if crop:
+                        self.assertEqual(image.size, size)
+                    else:
+                        self.assertEqual(image.size, (1600, 800))
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse("materials:course-list"))
+        urls = response.data["results"][0]["preview_variants"]
+        self.assertTrue(urls["card"]["webp"].startswith("http://testserver/media/"))
+        self.assertNotIn("preview_hash", response.data["results"][0])
+
+    def test_same_image_is_not_processed_again(self):
+        """Повторная загрузка того же изображения не перекодируется."""
+        course = Course(name="First", preview=make_image())
+        self.save_and_process(course)
+        lesson = Lesson(
+            name="Same preview",
+            course=course,
+            video_link="https://youtube.com/same",
+            preview=make_image("copy.jpg"),
+        )
+        with patch("materials.images.Image.open") as decode:
+            self.save_and_process(lesson)
+            self.assertEqual(
+                generate_image_variants(
+                    "materials.Lesson", lesson.pk, "preview", lesson.preview.name
+                ),
+                "Копии изображения уже построены",
+            )
+        decode.assert_not_called()
+        self.assertEqual(lesson.preview_hash, course.preview_hash)
+        self.assertEqual(lesson.preview_variants, course.preview_variants)
+
+    @override_settings(CONDITIONAL_GET=True)
+    def test_variants_change_lesson_etag(self):
+        """Новые копии меняют updated_at: кэш клиента не отвечает 304."""
+        course = Course.objects.create(name="ETag Image")
+        lesson = Lesson.objects.create(
+            name="ETag Image Lesson",
+            course=course,
+            video_link="https://youtube.com/etag-image",
+            owner=self.user,
+        )
+        url = reverse("materials:lesson_retrieve", kwargs={"pk": lesson.pk})
+        self.client.force_authenticate(user=self.user)
+        etag = self.client.get(url).headers["ETag"]
+
+        lesson.preview = make_image()
+        with patch("materials.tasks.generate_image_variants.delay"):
+            with self.captureOnCommitCallbacks(execute=True):
+                lesson.save()
+        etag = self.client.get(url).headers["ETag"]
+        updated_at = Lesson.objects.get(pk=lesson.pk).updated_at
+        generate_image_variants(
+            "materials.Lesson", lesson.pk, "preview", lesson.preview.name
+        )
+        self.assertGreater(Lesson.objects.get(pk=lesson.pk).updated_at, updated_at)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("card", response.data["preview_variants"])
+
+    def test_save_without_new_image_does_not_schedule(self):
+        course = Course(name="Stable", preview=make_image())
+        self.save_and_process(course)
+        course.name = "Renamed"
+        self.assertFalse(self.save_and_process(course).called)
+
+        course.preview = None
+        self.assertFalse(self.save_and_process(course).called)
+        self.assertEqual(course.preview_variants, {})
+        self.assertEqual(course.preview_hash, "")
+
+    def test_transparent_png(self):
+        """Прозрачное PNG кодируется в JPEG на белом фоне."""
+        course = Course(
+            name="PNG", preview=make_image("logo.png", (300, 300), pil_format="PNG")
+        )
+        self.save_and_process(course)
+        with default_storage.open(course.preview_variants["thumbnail"]["jpg"]) as file:
+            with Image.open(file) as image:
+                self.assertEqual(image.mode, "RGB")
+
+    def test_broken_image_is_reported(self):
+        course = Course(
+            name="Broken", preview=SimpleUploadedFile("broken.jpg", b"not an image")
+        )
+        self.save_and_process(course)
+        self.assertEqual(course.preview_variants, {})
@@ -1,14 +1,24 @@
 from django.urls import path
 from rest_framework.routers import SimpleRouter
 from materials.apps import MaterialsConfig
+from materials.async_views import (
+    AsyncCourseDetailView,
+    AsyncCourseListView,
+    AsyncLessonListView,
+    AsyncLessonRetrieveView,
+    AsyncSubscriptionView,
+)
 from materials.views import (
     CourseViewSet,
+    CourseSearchAPIView,
     LessonCreateApiView,
     LessonUpdateApiView,
     LessonDestroyApiView,
     LessonListApiView,
     LessonRetrieveApiView,
+    LessonSearchAPIView,
     SubscriptionAPIView,
+    SubscriptionBulkAPIView,
 )
 from drf_yasg.utils import swagger_auto_schema
 
@@ -27,6 +37,7 @@ lesson_list = swagger_auto_schema(
 urlpatterns = [
     path("lessons/", lesson_list, name="lessons_list"),
     # path("lessons/", LessonListApiView.as_view(), name="lessons_list"),
+    path("lessons/search/", LessonSearchAPIView.as_view(), name="lesson_search"),
     path("lessons/<int:pk>/", LessonRetrieveApiView.as_view(), name="lesson_retrieve"),
     path("lessons/create/", LessonCreateApiView.as_view(), name="lesson_create"),
     path(
@@ -36,7 +47,29 @@ urlpatterns = [
         "lessons/<int:pk>/update/", LessonUpdateApiView.as_view(), name="lesson_update"
     ),
     # path("lessons/", LessonListApiView.as_view(), name="lessons_list"),
+    path("search/", CourseSearchAPIView.as_view(), name="course_search"),
     path("subscriptions/", SubscriptionAPIView.as_view(), name="subscriptions"),
+    path(
+        "subscriptions/bulk/",
+        SubscriptionBulkAPIView.as_view(),
+        name="subscriptions_bulk",
+    ),
+    # Асинхронные варианты чтения и подписки для ASGI (materials.async_views)
+    path("async/", AsyncCourseListView.as_view(), name="async_course_list"),
+    path(
+        "async/<int:pk>/", AsyncCourseDetailView.as_view(), name="async_course_detail"
+    ),
+    path("async/lessons/", AsyncLessonListView.as_view(), name="async_lessons_list"),
+    path(
+        "async/lessons/<int:pk>/",
+        AsyncLessonRetrieveView.as_view(),
+        name="async_lesson_retrieve",
+    ),
+    path(
+        "async/subscriptions/",
+        AsyncSubscriptionView.as_view(),
+        name="async_subscriptions",
+    ),
 ]
 
 urlpatterns += router.urls
@@ -1,5 +1,9 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, OuterRef, Prefetch, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -11,24 +15,170 @@ from rest_framework.generics import (
     UpdateAPIView,
     DestroyAPIView,
 )
+from materials.caching import (
+    CONTENT_MODIFIED_KEY,
+    CONTENT_VERSION_KEY,
+    conditional_validators,
+    course_modified_key,
+    course_version_key,
+    course_detail_cache_key,
+    course_list_cache_key,
+    drop_fields,
+    get_cached_response_data,
+    get_modified,
+    get_subscribed_course_ids,
+    invalidate_user_subscriptions,
+    make_etag,
+    merge_user_fields,
+    response_cache_enabled,
+    strip_user_fields,
+)
+from materials.mixins import ConditionalGetMixin, SparseFieldsetViewMixin
 from materials.models import Course, Lesson, Subscription
-from materials.paginators import CoursePaginator, LessonPaginator
+from materials.paginators import (
+    CoursePaginator,
+    CourseCursorPaginator,
+    CursorPaginationMixin,
+    LessonPaginator,
+    LessonCursorPaginator,
+    SearchCursorPaginator,
+)
+from materials.search import SEARCH_QUERY_PARAM, search_queryset
 from materials.serializers import (
     CourseSerializer,
     LessonSerializer,
     CourseDetailSerializer,
+    CourseSearchSerializer,
+    LessonSearchSerializer,
+    SubscriptionBulkSerializer,
 )
 from drf_yasg import openapi
 from users.permissions import IsModer, IsOwner
 from drf_yasg.utils import swagger_auto_schema
-from materials.tasks import send_course_update_notification
+from materials.tasks import schedule_course_update_notification
 
 
 # Create your views here.
-class CourseViewSet(ModelViewSet):
-    queryset = Course.objects.all()
+class CourseAnnotationMixin:
+    """
+    Аннотации для CourseSerializer: количество уроков, уроки и признак
+    подписки считаются фиксированным числом запросов на страницу, а не
+    3 запроса на курс; не запрошенные через ?fields= поля не считаются вовсе.
+    """
+
+    def user_merge_fields(self):
+        """
+        Поля, без которых персональный is_subscribed не подмешать к общему
+        кэшу списка: ?fields= без id оставил бы курсы без идентификатора.
+        """
+        requested = self.get_requested_fields()
+        if requested is None or "is_subscribed" not in requested:
+            return set()
+        return {"id"} - requested
+
+    def annotate_course_fields(self, queryset):
+        if self.is_field_requested("count_lessons_in_course"):
+            # Коррелированный подзапрос вместо JOIN + GROUP BY по всем полям
+            # курса: страница считает уроки только своих курсов
+            lessons_count = (
+                Lesson.objects.filter(course=OuterRef("pk"))
+                .order_by()
+                .values("course")
+                .annotate(count=Count("*"))
+                .values("count")
+            )
+            queryset = queryset.annotate(
+                lessons_count=Coalesce(Subquery(lessons_count), 0)
+            )
+        if self.is_field_requested("is_subscribed"):
+            user = self.request.user
+            if user.is_authenticated:
+                is_subscribed = Exists(
+                    Subscription.objects.filter(course=OuterRef("pk"), user=user)
+                )
+            else:
+                is_subscribed = Value(False)
+            queryset = queryset.annotate(user_is_subscribed=is_subscribed)
+        if self.is_field_requested("lessons"):
+            queryset = queryset.prefetch_related(
+                Prefetch("lesson_set", queryset=Lesson.objects.defer("search_vector"))
+            )
+        return queryset
+
+
+class CourseViewSet(
+    ConditionalGetMixin,
+    CursorPaginationMixin,
+    CourseAnnotationMixin,
+    SparseFieldsetViewMixin,
+    ModelViewSet,
+):
+    queryset = Course.objects.defer("search_vector")
     serializer_class = CourseSerializer
     pagination_class = CoursePaginator
+    cursor_pagination_class = CourseCursorPaginator
+    # Бюджеты SQL-запросов (config.middleware): рост означает N+1
+    query_budget = {"list": 5, "retrieve": 5}
+
+    def list(self, request, *args, **kwargs):
+        # Версия и время изменения контента берутся из кэша: 304 без запросов к БД
+        etag, last_modified = conditional_validators(
+            request, CONTENT_VERSION_KEY, CONTENT_MODIFIED_KEY, personal=True
+        )
+        return self.conditional_get(
+            request,
+            lambda: self.list_response(request, *args, **kwargs),
+            etag,
+            last_modified,
+        )
+
+    def list_response(self, request, *args, **kwargs):
+        if not response_cache_enabled():
+            return super().list(request, *args, **kwargs)
+        # id сериализуется и для ?fields= без него: по нему подмешивается
+        # подписка, после чего он убирается из ответа
+        self.sparse_fieldset_extra_fields = self.user_merge_fields()
+        data = get_cached_response_data(
+            course_list_cache_key(request),
+            lambda: strip_user_fields(
+                super(CourseViewSet, self).list(request, *args, **kwargs).data
+            ),
+        )
+        data = merge_user_fields(data, get_subscribed_course_ids(request.user))
+        return Response(drop_fields(data, self.sparse_fieldset_extra_fields))
+
+    def retrieve(self, request, *args, **kwargs):
+        course_id = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        etag, last_modified = conditional_validators(
+            request,
+            course_version_key(course_id),
+            course_modified_key(course_id),
+            personal=True,
+        )
+        return self.conditional_get(
+            request,
+            lambda: self.retrieve_response(request, *args, **kwargs),
+            etag,
+            last_modified,
+        )
+
+    def retrieve_response(self, request, *args, **kwargs):
+        if not response_cache_enabled():
+            return super().retrieve(request, *args, **kwargs)
+        # Общие для всех данные курса кэшируются по версии курса,
+        # персональный is_subscribed подмешивается из кэша подписок
+        course_id = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        data = get_cached_response_data(
+            course_detail_cache_key(course_id, request),
+            lambda: strip_user_fields(
+                super(CourseViewSet, self).retrieve(request, *args, **kwargs).data
+            ),
+        )
+        return Response(
+            merge_user_fields(
+                data, get_subscribed_course_ids(request.user), course_id=course_id
+            )
+        )
 
     @swagger_auto_schema(
         operation_summary="Создание курса",
@@ -67,6 +217,13 @@ class CourseViewSet(ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         return super().destroy(request, *args, **kwargs)
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in ("list", "retrieve"):
+            return queryset
+        queryset = self.apply_sparse_fieldset(queryset).order_by("id")
+        return self.annotate_course_fields(queryset)
+
     def get_serializer_class(self):
         if self.action == "retrieve":
             return CourseDetailSerializer
@@ -94,8 +251,14 @@ class CourseViewSet(ModelViewSet):
         return context
 
     def perform_update(self, serializer):
+        changed_fields = [
+            field_name
+            for field_name, value in serializer.validated_data.items()
+            if getattr(serializer.instance, field_name) != value
+        ]
         instance = serializer.save()
-        send_course_update_notification.delay(instance.id)
+        if changed_fields:
+            schedule_course_update_notification(instance.id, changed_fields)
 
 
 class LessonCreateApiView(CreateAPIView):
@@ -122,20 +285,67 @@ class LessonCreateApiView(CreateAPIView):
         serializer.save(owner=self.request.user)
 
 
-class LessonListApiView(ListAPIView):
-    queryset = Lesson.objects.all()
+class LessonListApiView(
+    ConditionalGetMixin, CursorPaginationMixin, SparseFieldsetViewMixin, ListAPIView
+):
+    queryset = Lesson.objects.defer("search_vector").order_by("id")
     serializer_class = LessonSerializer
     permission_classes = (IsAuthenticated,)
     pagination_class = LessonPaginator
+    cursor_pagination_class = LessonCursorPaginator
+    query_budget = 3
 
+    def get_queryset(self):
+        return self.apply_sparse_fieldset(super().get_queryset())
 
-class LessonRetrieveApiView(RetrieveAPIView):
-    queryset = Lesson.objects.all()
+    def list(self, request, *args, **kwargs):
+        etag, last_modified = conditional_validators(
+            request, CONTENT_VERSION_KEY, CONTENT_MODIFIED_KEY
+        )
+        return self.conditional_get(
+            request,
+            lambda: super(LessonListApiView, self).list(request, *args, **kwargs),
+            etag,
+            last_modified,
+        )
+
+
+class LessonRetrieveApiView(
+    ConditionalGetMixin, SparseFieldsetViewMixin, RetrieveAPIView
+):
+    queryset = Lesson.objects.defer("search_vector")
     serializer_class = LessonSerializer
     permission_classes = (
         IsAuthenticated,
         IsModer | IsOwner,
     )
+    sparse_fieldset_required_fields = ("owner", "course", "updated_at")
+    query_budget = 3
+
+    def get_queryset(self):
+        return self.apply_sparse_fieldset(super().get_queryset())
+
+    def retrieve(self, request, *args, **kwargs):
+        # Урок загружается один раз: для проверки прав, валидаторов и ответа
+        lesson = self.get_object()
+        etag = make_etag(
+            lesson.pk,
+            lesson.updated_at.isoformat(),
+            request.get_full_path(),
+            request.accepted_renderer.format,
+        )
+        # Отметка курса строго растет при каждом изменении его уроков и
+        # точнее updated_at с округлением Last-Modified до секунды
+        last_modified = max(
+            int(lesson.updated_at.timestamp()),
+            get_modified(course_modified_key(lesson.course_id)),
+        )
+        return self.conditional_get(
+            request,
+            lambda: Response(self.get_serializer(lesson).data),
+            etag,
+            last_modified,
+        )
 
     @swagger_auto_schema(
         operation_summary="Детали урока",
@@ -189,8 +399,76 @@ class LessonDestroyApiView(DestroyAPIView):
         return super().delete(request, *args, **kwargs)
 
 
+SEARCH_QUERY_PARAMETER = openapi.Parameter(
+    SEARCH_QUERY_PARAM,
+    openapi.IN_QUERY,
+    description='Поисковый запрос: слова, "фраза", or, -исключение',
+    type=openapi.TYPE_STRING,
+    required=True,
+)
+
+
+class SearchMixin:
+    """
+    Полнотекстовый поиск по ?q= с сортировкой по релевантности и
+    keyset-пагинацией по (rank, id).
+    """
+
+    pagination_class = SearchCursorPaginator
+
+    def get_search_text(self):
+        text = self.request.query_params.get(SEARCH_QUERY_PARAM, "").strip()
+        if not text:
+            raise ValidationError({SEARCH_QUERY_PARAM: "Укажите поисковый запрос"})
+        return text
+
+    def get_queryset(self):
+        queryset = self.apply_sparse_fieldset(super().get_queryset())
+        return search_queryset(queryset, self.get_search_text())
+
+
+class CourseSearchAPIView(
+    SearchMixin, CourseAnnotationMixin, SparseFieldsetViewMixin, ListAPIView
+):
+    queryset = Course.objects.defer("search_vector")
+    serializer_class = CourseSearchSerializer
+    permission_classes = (IsAuthenticated,)
+    query_budget = 5
+
+    def get_queryset(self):
+        return self.annotate_course_fields(super().get_queryset())
+
+    @swagger_auto_schema(
+        operation_summary="Поиск курсов",
+        operation_description="Полнотекстовый поиск курсов по названию и описанию, "
+        "отсортированный по релевантности.",
+        tags=["Курсы"],
+        manual_parameters=[SEARCH_QUERY_PARAMETER],
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
+class LessonSearchAPIView(SearchMixin, SparseFieldsetViewMixin, ListAPIView):
+    queryset = Lesson.objects.defer("search_vector")
+    serializer_class = LessonSearchSerializer
+    permission_classes = (IsAuthenticated,)
+    query_budget = 3
+
+    @swagger_auto_schema(
+        operation_summary="Поиск уроков",
+        operation_description="Полнотекстовый поиск уроков по названию и описанию, "
+        "отсортированный по релевантности.",
+        tags=["Уроки"],
+        manual_parameters=[SEARCH_QUERY_PARAMETER],
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
 class SubscriptionAPIView(APIView):
     permission_classes = [IsAuthenticated]
+    query_budget = 10
 
     @swagger_auto_schema(
         operation_summary="Подписка/отписка на курс",
@@ -220,12 +498,74 @@ class SubscriptionAPIView(APIView):
         user = request.user
         course_id = request.data.get("course_id")
         course = get_object_or_404(Course, id=course_id)
-        subscription, created = Subscription.objects.get_or_create(
-            user=user, course=course
-        )
-        if not created:
-            subscription.delete()
+        deleted, _ = Subscription.objects.filter(user=user, course=course).delete()
+        if deleted:
             message = "Подписка удалена"
         else:
+            try:
+                with transaction.atomic():
+                    Subscription.objects.create(user=user, course=course)
+            except IntegrityError:
+                # Параллельный запрос уже создал подписку
+                pass
             message = "Подписка добавлена"
         return Response({"message": message}, status=status.HTTP_200_OK)
+
+
+class SubscriptionBulkAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Массовая подписка/отписка",
+        operation_description="Подписывает пользователя на курсы из subscribe "
+        "и отписывает от курсов из unsubscribe одним запросом.",
+        tags=["Подписки"],
+        request_body=SubscriptionBulkSerializer,
+        responses={
+            200: openapi.Response(
+                description="Успешная операция",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        "subscribed": openapi.Schema(
+                            type=openapi.TYPE_ARRAY,
+                            items=openapi.Schema(type=openapi.TYPE_INTEGER),
+                        ),
+                        "unsubscribed": openapi.Schema(
+                            type=openapi.TYPE_ARRAY,
+                            items=openapi.Schema(type=openapi.TYPE_INTEGER),
+                        ),
+                    },
+                ),
+            ),
+            400: "Неверные данные или курсы не найдены",
+        },
+    )
+    def post(self, request, *args, **kwargs):
+        serializer = SubscriptionBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        subscribe = serializer.validated_data["subscribe"]
+        unsubscribe = serializer.validated_data["unsubscribe"]
+        user = request.user
+
+        with transaction.atomic():
+            if subscribe:
+                # Уникальное ограничение (user, course) делает повторную подписку no-op
+                Subscription.objects.bulk_create(
+                    [
+                        Subscription(user=user, course_id=course_id)
+                        for course_id in subscribe
+                    ],
+                    ignore_conflicts=True,
+                )
+            if unsubscribe:
+                Subscription.objects.filter(
+                    user=user, course_id__in=unsubscribe
+                ).delete()
+        # bulk_create не отправляет сигналы, поэтому кэш подписок сбрасывается явно
+        invalidate_user_subscriptions(user.pk)
+
+        return Response(
+            {"subscribed": sorted(subscribe), "unsubscribed": sorted(unsubscribe)},
+            status=status.HTTP_200_OK,
+        )
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+from materials.caching import cache_is_shared
+
+# Дольше этого срока устаревшая роль в кэше процесса недопустима
+LOCAL_ROLE_CACHE_MAX_TIMEOUT = 60
+
+
+@register(Tags.caches)
+def check_role_cache_timeout(app_configs, **kwargs):
+    """Роль сбрасывается сигналами только в кэше своего процесса."""
+    if cache_is_shared() or settings.ROLE_CACHE_TIMEOUT <= LOCAL_ROLE_CACHE_MAX_TIMEOUT:
+        return []
+    return [
+        Warning(
+            f"Роль пользователя кэшируется на {settings.ROLE_CACHE_TIMEOUT} с в кэше "
+            "процесса: снятые права модератора остаются в других процессах.",
+            hint="Задайте CACHE_LOCATION (Redis) или ROLE_CACHE_TIMEOUT не больше "
+            f"{LOCAL_ROLE_CACHE_MAX_TIMEOUT}.",
+            id="users.W001",
+        )
+    ]
@@ -0,0 +1,370 @@
+import csv
+import io
+import json
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.db.models import JSONField, Max
+from django.utils import timezone
+
+from materials.caching import bump_course_version
+from materials.models import Course, Lesson, Subscription
+from users.models import Payment, User
+from users.rollups import rebuild_payment_rollups
+
+FIXED = "fixed"
+UNIFORM = "uniform"
+POWER_LAW = "power-law"
+DISTRIBUTIONS = (FIXED, UNIFORM, POWER_LAW)
+# Показатель распределения Парето: тяжелый хвост, немногие курсы собирают
+# большинство подписчиков
+POWER_LAW_ALPHA = 1.5
+
+CITIES = ("Москва", "Санкт-Петербург", "Казань", "Новосибирск", "Екатеринбург")
+TOPICS = (
+    "Python",
+    "Django",
+    "Веб-разработка",
+    "Базы данных",
+    "Алгоритмы",
+    "Машинное обучение",
+    "DevOps",
+    "Тестирование",
+)
+LEVELS = ("для начинающих", "продвинутый", "практикум", "интенсив")
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+@contextmanager
+def explicit_timestamps(model):
+    """Отключает auto_now/auto_now_add, чтобы bulk_create сохранил заданные даты."""
+    fields = [
+        field
+        for field in model._meta.concrete_fields
+        if getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def copy_supported():
+    """COPY доступен на PostgreSQL с драйвером psycopg2."""
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        return hasattr(cursor, "copy_expert")
+
+
+class DataGenerator:
+    """
+    Генератор синтетических пользователей, курсов, уроков, подписок и платежей.
+
+    Строки создаются потоком и пишутся пакетами через bulk_create либо COPY
+    на PostgreSQL. Результат воспроизводим при одинаковом seed; пароль
+    хэшируется один раз для всех пользователей.
+    """
+
+    def __init__(
+        self, seed=0, batch_size=5000, use_copy=True, password="password", log=None
+    ):
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.use_copy = use_copy and copy_supported()
+        self.password = password
+        self.log = log or (lambda message: None)
+        self.now = timezone.now()
+        self.user_ids = []
+        self.course_ids = []
+        self.course_prices = {}
+        self.course_weights = []
+        self.lesson_ids = []
+
+    def sample_count(self, mean, distribution, maximum=None):
+        if distribution == FIXED:
+            count = mean
+        elif distribution == UNIFORM:
+            count = self.rng.randint(0, 2 * mean)
+        elif distribution == POWER_LAW:
+            # Парето с минимумом, подобранным под заданное среднее
+            minimum = mean * (POWER_LAW_ALPHA - 1) / POWER_LAW_ALPHA
+            count = int(minimum * self.rng.paretovariate(POWER_LAW_ALPHA))
+        else:
+            raise ValueError(f"Неизвестное распределение: {distribution}")
+        return count if maximum is None else min(count, maximum)
+
+    def random_user(self):
+        return self.rng.choice(self.user_ids) if self.user_ids else None
+
+    def past(self, days):
+        return self.now - timedelta(seconds=self.rng.uniform(0, days * 24 * 3600))
+
+    def write(self, model, fields, rows):
+        """Записывает кортежи значений fields пакетами и возвращает их число."""
+        total = 0
+        with explicit_timestamps(model):
+            for batch in _chunks(rows, self.batch_size):
+                with transaction.atomic():
+                    if self.use_copy:
+                        self.copy(model, fields, batch)
+                    else:
+                        model.objects.bulk_create(
+                            [model(**dict(zip(fields, row))) for row in batch],
+                            batch_size=self.batch_size,
+                        )
+                total += len(batch)
+                self.log(f"{model._meta.verbose_name_plural}: {total}")
+        return total
+
+    def copy_value(self, field, value):
+        if value is None:
+            return "\\N"
+        # get_db_prep_value JSON-поля возвращает адаптер драйвера, а не текст
+        if isinstance(field, JSONField):
+            return json.dumps(value)
+        return field.get_db_prep_value(value, connection)
+
+    def copy(self, model, fields, rows):
+        """
+        Пишет строки через COPY. Значения по умолчанию Django при этом не
+        применяются: все NOT NULL поля без db_default должны быть в fields.
+        """
+        model_fields = [model._meta.get_field(name) for name in fields]
+        quote_name = connection.ops.quote_name
+        columns = ", ".join(quote_name(field.column) for field in model_fields)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(
+                [
+                    self.copy_value(field, value)
+                    for field, value in zip(model_fields, row)
+                ]
+            )
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {quote_name(model._meta.db_table)} ({columns}) "
+                f"FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+                buffer,
+            )
+
+    def write_new(self, model, fields, rows):
+        """Записывает строки и возвращает идентификаторы созданных объектов."""
+        last_pk = model.objects.aggregate(last_pk=Max("pk"))["last_pk"] or 0
+        self.write(model, fields, rows)
+        return list(
+            model.objects.filter(pk__gt=last_pk)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+
+    def generate_users(self, count, days):
+        password = make_password(self.password)
+        fields = (
+            "email",
+            "password",
+            "first_name",
+            "last_name",
+            "city",
+            "is_active",
+            "is_staff",
+            "is_superuser",
+            "is_moderator",
+            "date_joined",
+            "last_login",
+            "avatar_variants",
+            "avatar_hash",
+        )
+
+        def rows():
+            for number in range(count):
+                date_joined = self.past(days)
+                # Часть пользователей ни разу не входила или давно не заходила
+                if self.rng.random() < 0.1:
+                    last_login = None
+                else:
+                    last_login = date_joined + (self.now - date_joined) * (
+                        self.rng.random()
+                    )
+                yield (
+                    f"user{self.seed}-{number}@example.com",
+                    password,
+                    "",
+                    "",
+                    self.rng.choice(CITIES),
+                    True,
+                    False,
+                    False,
+                    self.rng.random() < 0.01,
+                    date_joined,
+                    last_login,
+                    {},
+                    "",
+                )
+
+        self.user_ids = self.write_new(User, fields, rows())
+
+    def generate_courses(self, count):
+        fields = (
+            "name",
+            "description",
+            "owner_id",
+            "price",
+            "updated_at",
+            "preview_variants",
+            "preview_hash",
+        )
+
+        def rows():
+            for number in range(count):
+                topic = self.rng.choice(TOPICS)
+                yield (
+                    f"{topic} {self.rng.choice(LEVELS)} #{number}",
+                    f"Курс по теме «{topic}»: теория, практика и проекты.",
+                    self.random_user(),
+                    self.rng.randint(1, 100) * 1000,
+                    self.now,
+                    {},
+                    "",
+                )
+
+        self.course_ids = self.write_new(Course, fields, rows())
+        self.course_prices = dict(
+            Course.objects.filter(pk__in=self.course_ids).values_list("pk", "price")
+        )
+
+    def generate_lessons(self, mean, distribution):
+        fields = (
+            "name",
+            "description",
+            "video_link",
+            "course_id",
+            "owner_id",
+            "updated_at",
+            "preview_variants",
+            "preview_hash",
+        )
+
+        def rows():
+            for course_id in self.course_ids:
+                for number in range(self.sample_count(mean, distribution)):
+                    yield (
+                        f"Урок {number + 1}",
+                        f"Урок {number + 1} курса {course_id}: разбор и задания.",
+                        f"https://youtube.com/watch?v=c{course_id}l{number}",
+                        course_id,
+                        self.random_user(),
+                        self.now,
+                        {},
+                        "",
+                    )
+
+        self.lesson_ids = self.write_new(Lesson, fields, rows())
+
+    def generate_subscriptions(self, mean, distribution):
+        # Популярность курса (число подписчиков) задает и вероятность покупки
+
+        def rows():
+            for course_id in self.course_ids:
+                count = self.sample_count(mean, distribution, len(self.user_ids))
+                self.course_weights.append(count + 1)
+                for user_id in self.rng.sample(self.user_ids, count):
+                    yield user_id, course_id
+
+        return self.write(Subscription, ("user_id", "course_id"), rows())
+
+    def generate_payments(self, mean, distribution, days, lesson_share=0.2):
+        fields = (
+            "user_id",
+            "paid_course_id",
+            "paid_lesson_id",
+            "amount",
+            "payment_method",
+            "is_paid",
+            "checkout_status",
+            "payment_date",
+        )
+        methods = [method for method, _ in Payment.PAYMENT_METHOD_CHOICES]
+        cum_weights = list(accumulate(self.course_weights))
+
+        def rows():
+            for user_id in self.user_ids:
+                for _ in range(self.sample_count(mean, distribution)):
+                    if self.lesson_ids and self.rng.random() < lesson_share:
+                        course_id = None
+                        lesson_id = self.rng.choice(self.lesson_ids)
+                        amount = self.rng.randint(5, 50) * 100
+                    else:
+                        course_id = self.rng.choices(
+                            self.course_ids, cum_weights=cum_weights
+                        )[0]
+                        lesson_id = None
+                        amount = self.course_prices[course_id]
+                    yield (
+                        user_id,
+                        course_id,
+                        lesson_id,
+                        amount,
+                        self.rng.choice(methods),
+                        self.rng.random() < 0.85,
+                        Payment.CHECKOUT_READY,
+                        self.past(days),
+                    )
+
+        return self.write(Payment, fields, rows())
+
+    def generate(
+        self,
+        users,
+        courses,
+        lessons,
+        subscribers,
+        payments,
+        lessons_distribution=UNIFORM,
+        subscribers_distribution=POWER_LAW,
+        payments_distribution=POWER_LAW,
+        days=365,
+    ):
+        """Создает весь набор данных и возвращает число строк по моделям."""
+        started = time.monotonic()
+        self.generate_users(users, days)
+        self.generate_courses(courses)
+        self.generate_lessons(lessons, lessons_distribution)
+        subscriptions_count = self.generate_subscriptions(
+            subscribers, subscribers_distribution
+        )
+        payments_count = (
+            self.generate_payments(payments, payments_distribution, days)
+            if self.course_ids
+            else 0
+        )
+
+        # bulk_create и COPY не отправляют сигналы: агрегаты платежей и
+        # кэш материалов обновляются явно
+        rebuild_payment_rollups(batch_size=self.batch_size)
+        bump_course_version()
+        return {
+            "users": len(self.user_ids),
+            "courses": len(self.course_ids),
+            "lessons": len(self.lesson_ids),
+            "subscriptions": subscriptions_count,
+            "payments": payments_count,
+            "seconds": round(time.monotonic() - started, 3),
+        }
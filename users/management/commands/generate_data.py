@@ -0,0 +1,100 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from users.generators import DISTRIBUTIONS, POWER_LAW, UNIFORM, DataGenerator
+
+
+class Command(BaseCommand):
+    help = "Generate synthetic users, courses, lessons, subscriptions and payments"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000, help="Пользователей")
+        parser.add_argument("--courses", type=int, default=100, help="Курсов")
+        parser.add_argument(
+            "--lessons", type=int, default=10, help="Среднее число уроков в курсе"
+        )
+        parser.add_argument(
+            "--lessons-distribution", choices=DISTRIBUTIONS, default=UNIFORM
+        )
+        parser.add_argument(
+            "--subscribers",
+            type=int,
+            default=50,
+            help="Среднее число подписчиков курса",
+        )
+        parser.add_argument(
+            "--subscribers-distribution", choices=DISTRIBUTIONS, default=POWER_LAW
+        )
+        parser.add_argument(
+            "--payments",
+            type=int,
+            default=2,
+            help="Среднее число платежей пользователя",
+        )
+        parser.add_argument(
+            "--payments-distribution", choices=DISTRIBUTIONS, default=POWER_LAW
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=365,
+            help="За сколько последних дней распределяются даты",
+        )
+        parser.add_argument("--seed", type=int, default=0, help="Seed генератора")
+        parser.add_argument(
+            "--batch-size", type=int, default=5000, help="Строк в одном пакете"
+        )
+        parser.add_argument(
+            "--password", default="password", help="Пароль всех пользователей"
+        )
+        parser.add_argument(
+            "--no-copy",
+            action="store_true",
+            help="Писать через bulk_create даже на PostgreSQL",
+        )
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Очистить базу (manage.py flush) перед генерацией",
+        )
+
+    def handle(self, *args, **options):
+        sizes = ("users", "courses", "lessons", "subscribers", "payments")
+        negative = [f"--{size}" for size in sizes if options[size] < 0]
+        if negative:
+            raise CommandError(f"{', '.join(negative)}: не может быть меньше 0")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size должно быть не меньше 1")
+
+        if options["clear"]:
+            call_command("flush", interactive=False, verbosity=0)
+
+        generator = DataGenerator(
+            seed=options["seed"],
+            batch_size=options["batch_size"],
+            use_copy=not options["no_copy"],
+            password=options["password"],
+            log=self.stdout.write if options["verbosity"] > 1 else None,
+        )
+        self.stdout.write(
+            f"Запись через {'COPY' if generator.use_copy else 'bulk_create'}"
+        )
+        stats = generator.generate(
+            users=options["users"],
+            courses=options["courses"],
+            lessons=options["lessons"],
+            subscribers=options["subscribers"],
+            payments=options["payments"],
+            lessons_distribution=options["lessons_distribution"],
+            subscribers_distribution=options["subscribers_distribution"],
+            payments_distribution=options["payments_distribution"],
+            days=options["days"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Создано: {users} пользователей, {courses} курсов, {lessons} уроков, "
+                "{subscriptions} подписок, {payments} платежей за {seconds} с".format(
+                    **stats
+                )
+            )
+        )
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from users.rollups import rebuild_payment_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild daily payment rollups from the payments table"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Количество строк агрегата в одном INSERT",
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_payment_rollups(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Пересчитано строк агрегата: {count}"))
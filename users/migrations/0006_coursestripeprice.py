@@ -0,0 +1,57 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0005_subscription_unique_user_course"),
+        ("users", "0005_payment_is_paid_payment_stripe_payment_link_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CourseStripePrice",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("amount", models.PositiveIntegerField(verbose_name="Сумма")),
+                (
+                    "stripe_product_id",
+                    models.CharField(max_length=100, verbose_name="Продукт Stripe"),
+                ),
+                (
+                    "stripe_price_id",
+                    models.CharField(max_length=100, verbose_name="Цена Stripe"),
+                ),
+                (
+                    "course",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stripe_prices",
+                        to="materials.course",
+                        verbose_name="Курс",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Цена курса в Stripe",
+                "verbose_name_plural": "Цены курсов в Stripe",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("course", "amount"),
+                        name="unique_stripe_price_course_amount",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0005_subscription_unique_user_course"),
+        ("users", "0006_coursestripeprice"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="payment",
+            name="checkout_status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Сессия создается"),
+                    ("ready", "Ссылка на оплату готова"),
+                    ("failed", "Ошибка создания сессии"),
+                ],
+                default="ready",
+                max_length=20,
+                verbose_name="Статус платежной сессии",
+            ),
+        ),
+        migrations.AddField(
+            model_name="payment",
+            name="idempotency_key",
+            field=models.CharField(
+                blank=True,
+                help_text="Значение заголовка Idempotency-Key запроса на оплату",
+                max_length=64,
+                null=True,
+                verbose_name="Ключ идемпотентности",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="payment",
+            constraint=models.UniqueConstraint(
+                fields=("user", "idempotency_key"),
+                name="unique_payment_user_idempotency_key",
+            ),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("users", "0007_payment_checkout_status"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["last_login"],
+                name="users_user_active_login_idx",
+            ),
+        ),
+    ]
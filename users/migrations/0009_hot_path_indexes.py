@@ -0,0 +1,20 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0006_hot_path_indexes"),
+        ("users", "0008_user_active_last_login_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(
+                fields=["user", "-payment_date"], name="users_payment_user_date_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0006_hot_path_indexes"),
+        ("users", "0009_hot_path_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PaymentDailyRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField(verbose_name="День")),
+                (
+                    "payment_method",
+                    models.CharField(max_length=20, verbose_name="Способ оплаты"),
+                ),
+                ("is_paid", models.BooleanField(verbose_name="Оплачено")),
+                (
+                    "payments_count",
+                    models.IntegerField(default=0, verbose_name="Количество платежей"),
+                ),
+                (
+                    "amount_total",
+                    models.BigIntegerField(default=0, verbose_name="Сумма платежей"),
+                ),
+                (
+                    "paid_course",
+                    models.ForeignKey(
+                        blank=True,
+                        db_constraint=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="payment_rollups",
+                        to="materials.course",
+                        verbose_name="Оплаченный курс",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Дневной итог платежей",
+                "verbose_name_plural": "Дневные итоги платежей",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("day", "paid_course", "payment_method", "is_paid"),
+                        name="unique_payment_rollup_bucket",
+                        nulls_distinct=False,
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0010_paymentdailyrollup"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="avatar_hash",
+            field=models.CharField(
+                blank=True, editable=False, max_length=64, verbose_name="Хэш аватара"
+            ),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="avatar_variants",
+            field=models.JSONField(
+                blank=True, default=dict, editable=False, verbose_name="Размеры аватара"
+            ),
+        ),
+    ]
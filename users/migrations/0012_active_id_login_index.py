@@ -0,0 +1,26 @@
+# Generated by Django 5.2.3 on 2026-10-18 15:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("users", "0011_image_variants"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="user",
+            name="users_user_active_login_idx",
+        ),
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["id", "last_login"],
+                name="users_user_active_id_login_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+def backfill_payment_rollups(apps, schema_editor):
+    # Платежи, созданные до 0010_paymentdailyrollup, в агрегатах не учтены
+    from users.rollups import rebuild_payment_rollups
+
+    rebuild_payment_rollups(
+        payment_model=apps.get_model("users", "Payment"),
+        rollup_model=apps.get_model("users", "PaymentDailyRollup"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0012_active_id_login_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            backfill_payment_rollups, migrations.RunPython.noop, elidable=True
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.3 on 2026-10-18 15:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0013_backfill_payment_rollups"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="payment",
+            name="user",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="payments",
+                to=settings.AUTH_USER_MODEL,
+                verbose_name="Пользователь",
+            ),
+        ),
+    ]
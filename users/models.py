@@ -1,6 +1,6 @@
 from django.contrib.auth.base_user import BaseUserManager
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
 
 from materials.models import Course, Lesson
 
@@ -48,6 +48,19 @@ class User(AbstractUser):
         verbose_name="Аватар",
         help_text="Загрузите аватар",
     )
+    # Уменьшенные копии изображения (materials.images), заполняет задача Celery
+    avatar_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name="Размеры аватара",
+    )
+    avatar_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        editable=False,
+        verbose_name="Хэш аватара",
+    )
     is_moderator = models.BooleanField(
         default=False,
         verbose_name="Модератор",
@@ -60,6 +73,15 @@ class User(AbstractUser):
     class Meta:
         verbose_name = "Пользователь"
         verbose_name_plural = "Пользователи"
+        indexes = [
+            # Для ночной деактивации: активные пользователи обходятся пакетами
+            # по возрастанию pk, а last_login проверяется прямо в индексе
+            models.Index(
+                fields=["id", "last_login"],
+                condition=models.Q(is_active=True),
+                name="users_user_active_id_login_idx",
+            ),
+        ]
 
 
 class Payment(models.Model):
@@ -67,12 +89,23 @@ class Payment(models.Model):
         ("cash", "Наличные"),
         ("transfer", "Перевод на счет"),
     ]
+    CHECKOUT_PENDING = "pending"
+    CHECKOUT_READY = "ready"
+    CHECKOUT_FAILED = "failed"
+    CHECKOUT_STATUS_CHOICES = [
+        (CHECKOUT_PENDING, "Сессия создается"),
+        (CHECKOUT_READY, "Ссылка на оплату готова"),
+        (CHECKOUT_FAILED, "Ошибка создания сессии"),
+    ]
 
+    # Отдельный индекс по user_id не нужен: его заменяет
+    # users_payment_user_date_idx (user, -payment_date)
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         verbose_name="Пользователь",
         related_name="payments",
+        db_index=False,
     )
     payment_date = models.DateTimeField(auto_now_add=True, verbose_name="Дата оплаты")
     paid_course = models.ForeignKey(
@@ -98,8 +131,97 @@ class Payment(models.Model):
     stripe_session_id = models.CharField(max_length=100, blank=True, null=True)
     stripe_payment_link = models.URLField(max_length=500, blank=True, null=True)
     is_paid = models.BooleanField(default=False, verbose_name="Оплачено")
+    checkout_status = models.CharField(
+        max_length=20,
+        choices=CHECKOUT_STATUS_CHOICES,
+        default=CHECKOUT_READY,
+        verbose_name="Статус платежной сессии",
+    )
+    idempotency_key = models.CharField(
+        max_length=64,
+        blank=True,
+        null=True,
+        verbose_name="Ключ идемпотентности",
+        help_text="Значение заголовка Idempotency-Key запроса на оплату",
+    )
+
+    def save(self, *args, **kwargs):
+        # Платеж и его дневной агрегат (users.signals) меняются вместе
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
 
     class Meta:
         verbose_name = "Платеж"
         verbose_name_plural = "Платежи"
         ordering = ["-payment_date"]
+        indexes = [
+            # Платежи пользователя от новых к старым (PaymentViewSet, UserListAPIView)
+            models.Index(
+                fields=["user", "-payment_date"], name="users_payment_user_date_idx"
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "idempotency_key"],
+                name="unique_payment_user_idempotency_key",
+            ),
+        ]
+
+
+class CourseStripePrice(models.Model):
+    """Продукт и цена Stripe, созданные для курса по конкретной сумме."""
+
+    course = models.ForeignKey(
+        Course,
+        on_delete=models.CASCADE,
+        verbose_name="Курс",
+        related_name="stripe_prices",
+    )
+    amount = models.PositiveIntegerField(verbose_name="Сумма")
+    stripe_product_id = models.CharField(max_length=100, verbose_name="Продукт Stripe")
+    stripe_price_id = models.CharField(max_length=100, verbose_name="Цена Stripe")
+
+    class Meta:
+        verbose_name = "Цена курса в Stripe"
+        verbose_name_plural = "Цены курсов в Stripe"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["course", "amount"], name="unique_stripe_price_course_amount"
+            ),
+        ]
+
+
+class PaymentDailyRollup(models.Model):
+    """Дневной агрегат платежей по курсу, способу оплаты и признаку оплаты."""
+
+    day = models.DateField(verbose_name="День")
+    # Ссылка без ограничения в БД: итоги удаляемого курса переносятся
+    # в строки без курса сигналом, а не каскадом
+    paid_course = models.ForeignKey(
+        Course,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        verbose_name="Оплаченный курс",
+        related_name="payment_rollups",
+    )
+    payment_method = models.CharField(max_length=20, verbose_name="Способ оплаты")
+    is_paid = models.BooleanField(verbose_name="Оплачено")
+    payments_count = models.IntegerField(default=0, verbose_name="Количество платежей")
+    amount_total = models.BigIntegerField(default=0, verbose_name="Сумма платежей")
+
+    class Meta:
+        verbose_name = "Дневной итог платежей"
+        verbose_name_plural = "Дневные итоги платежей"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "paid_course", "payment_method", "is_paid"],
+                name="unique_payment_rollup_bucket",
+                nulls_distinct=False,
+            ),
+        ]
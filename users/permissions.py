@@ -1,12 +1,13 @@
 from rest_framework import permissions
 
 from users.models import User
+from users.roles import ais_moderator, is_moderator
 
 
 class IsModer(permissions.BasePermission):
 
     def has_permission(self, request, view):
-        return request.user.groups.filter(name="moders").exists()
+        return is_moderator(request.user)
 
 
 class IsOwner(permissions.BasePermission):
@@ -16,9 +17,9 @@ class IsOwner(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if isinstance(obj, User):
             return obj == request.user
-        if hasattr(obj, "owner"):
-            return obj.owner == request.user
-        return False
+        # Сравнение по owner_id не загружает владельца отдельным запросом
+        owner_id = getattr(obj, "owner_id", None)
+        return owner_id is not None and owner_id == request.user.pk
 
 
 class IsOwnerOrModer(permissions.BasePermission):
@@ -27,7 +28,36 @@ class IsOwnerOrModer(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
         return (
-            obj == request.user
-            or request.user.is_staff
-            or request.user.groups.filter(name="moders").exists()
+            obj == request.user or request.user.is_staff or is_moderator(request.user)
         )
+
+
+# Разрешения, которые обращаются к роли пользователя через is_moderator
+ROLE_PERMISSIONS = (IsModer, IsOwnerOrModer)
+
+
+def _permission_operands(permission):
+    # Композиции (IsModer | IsOwner, ~IsModer) хранят операнды в op1/op2
+    operands = [getattr(permission, name, None) for name in ("op1", "op2")]
+    operands = [operand for operand in operands if operand is not None]
+    if not operands:
+        yield permission
+    for operand in operands:
+        yield from _permission_operands(operand)
+
+
+async def aprepare_permissions(request, permissions):
+    """
+    Готовит синхронные разрешения к проверке в async-представлении.
+
+    Роль модератора загружается асинхронно и запоминается на пользователе,
+    после чего IsModer, IsOwner и их композиции проверяются без обращений
+    к кэшу и БД в цикле событий.
+    """
+    for permission in permissions:
+        if any(
+            isinstance(operand, ROLE_PERMISSIONS)
+            for operand in _permission_operands(permission)
+        ):
+            await ais_moderator(request.user)
+            return
@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.core.cache import cache
+
+MODERATORS_GROUP = "moders"
+
+# Атрибут, в котором статус запоминается на объекте пользователя на время запроса
+_REQUEST_CACHE_ATTR = "_is_moderator_cached"
+
+
+def moderator_cache_key(user_id) -> str:
+    return f"users:is_moderator:{user_id}"
+
+
+def is_moderator(user) -> bool:
+    """
+    Возвращает, состоит ли пользователь в группе модераторов.
+
+    Результат запоминается на объекте пользователя (один раз за запрос) и
+    в общем кэше между запросами; кэш сбрасывается сигналами при изменении
+    групп пользователя или самого пользователя.
+    """
+    if not user.is_authenticated:
+        return False
+
+    cached = getattr(user, _REQUEST_CACHE_ATTR, None)
+    if cached is not None:
+        return cached
+
+    key = moderator_cache_key(user.pk)
+    cached = cache.get(key)
+    if cached is None:
+        cached = user.groups.filter(name=MODERATORS_GROUP).exists()
+        cache.set(key, cached, settings.ROLE_CACHE_TIMEOUT)
+
+    setattr(user, _REQUEST_CACHE_ATTR, cached)
+    return cached
+
+
+async def ais_moderator(user) -> bool:
+    """Асинхронный is_moderator: тот же кэш и то же запоминание на пользователе."""
+    if not user.is_authenticated:
+        return False
+
+    cached = getattr(user, _REQUEST_CACHE_ATTR, None)
+    if cached is not None:
+        return cached
+
+    key = moderator_cache_key(user.pk)
+    cached = await cache.aget(key)
+    if cached is None:
+        cached = await user.groups.filter(name=MODERATORS_GROUP).aexists()
+        await cache.aset(key, cached, settings.ROLE_CACHE_TIMEOUT)
+
+    setattr(user, _REQUEST_CACHE_ATTR, cached)
+    return cached
+
+
+def invalidate_moderator_cache(*user_ids):
+    """Сбрасывает закэшированный статус модератора для указанных пользователей."""
+    cache.delete_many([moderator_cache_key(user_id) for user_id in user_ids])
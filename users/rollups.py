@@ -0,0 +1,131 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from users.models import Payment, PaymentDailyRollup
+
+
+ROLLUP_SOURCE_FIELDS = (
+    "payment_date",
+    "paid_course_id",
+    "payment_method",
+    "is_paid",
+    "amount",
+)
+
+
+def payment_bucket(payment_id):
+    """
+    Ключ дневного агрегата и сумма платежа по его строке в БД либо None,
+    если платежа еще (или уже) нет.
+
+    Состояние читается из БД, а не из объекта: объект мог устареть
+    (например, SET_NULL при удалении курса обновляет платежи без сигналов).
+    Строка блокируется до конца транзакции, чтобы параллельные изменения
+    платежа не разошлись с агрегатом.
+    """
+    if payment_id is None:
+        return None
+    values = (
+        Payment.objects.select_for_update()
+        .filter(pk=payment_id)
+        .values(*ROLLUP_SOURCE_FIELDS)
+        .first()
+    )
+    if values is None:
+        return None
+    bucket = (
+        timezone.localdate(values["payment_date"]),
+        values["paid_course_id"],
+        values["payment_method"],
+        values["is_paid"],
+    )
+    return bucket, values["amount"]
+
+
+def apply_rollup_delta(bucket, count, amount):
+    day, paid_course_id, payment_method, is_paid = bucket
+    rollups = PaymentDailyRollup.objects.filter(
+        day=day,
+        paid_course_id=paid_course_id,
+        payment_method=payment_method,
+        is_paid=is_paid,
+    )
+    changes = {
+        "payments_count": F("payments_count") + count,
+        "amount_total": F("amount_total") + amount,
+    }
+    if rollups.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            PaymentDailyRollup.objects.create(
+                day=day,
+                paid_course_id=paid_course_id,
+                payment_method=payment_method,
+                is_paid=is_paid,
+                payments_count=count,
+                amount_total=amount,
+            )
+    except IntegrityError:
+        # Строку агрегата успел создать параллельный платеж
+        rollups.update(**changes)
+
+
+def update_payment_rollups(old_state, new_state):
+    """Переносит платеж из старого дневного агрегата в новый."""
+    if old_state == new_state:
+        return
+    with transaction.atomic():
+        if old_state is not None:
+            bucket, amount = old_state
+            apply_rollup_delta(bucket, -1, -amount)
+        if new_state is not None:
+            bucket, amount = new_state
+            apply_rollup_delta(bucket, 1, amount)
+
+
+def move_course_rollups(course_id):
+    """
+    Переносит итоги удаляемого курса в строки без курса.
+
+    paid_course платежей обнуляется через SET_NULL без сигналов, и
+    rebuild_payment_rollups отнесет эти платежи к строкам без курса.
+    """
+    with transaction.atomic():
+        rollups = list(
+            PaymentDailyRollup.objects.select_for_update().filter(
+                paid_course_id=course_id
+            )
+        )
+        for rollup in rollups:
+            bucket = (rollup.day, None, rollup.payment_method, rollup.is_paid)
+            apply_rollup_delta(bucket, rollup.payments_count, rollup.amount_total)
+        PaymentDailyRollup.objects.filter(
+            pk__in=[rollup.pk for rollup in rollups]
+        ).delete()
+
+
+def rebuild_payment_rollups(
+    batch_size=1000, payment_model=Payment, rollup_model=PaymentDailyRollup
+):
+    """
+    Пересчитывает все дневные агрегаты по таблице платежей.
+
+    Модели передаются миграциями, которые заполняют агрегаты исторических
+    платежей.
+    """
+    rows = (
+        payment_model.objects.annotate(day=TruncDate("payment_date"))
+        .values("day", "paid_course_id", "payment_method", "is_paid")
+        .annotate(payments_count=Count("id"), amount_total=Sum("amount"))
+        .order_by()
+    )
+    with transaction.atomic():
+        rollup_model.objects.all().delete()
+        created = rollup_model.objects.bulk_create(
+            (rollup_model(**row) for row in rows.iterator()),
+            batch_size=batch_size,
+        )
+    return len(created)
@@ -1,17 +1,21 @@
+from rest_framework import serializers
 from rest_framework.serializers import ModelSerializer
+from materials.mixins import SparseFieldsetSerializerMixin
+from materials.serializers import ImageVariantsField
 from users.models import Payment, User
 from django.contrib.auth.hashers import make_password
 
 
-class PaymentSerializer(ModelSerializer):
+class PaymentSerializer(SparseFieldsetSerializerMixin, ModelSerializer):
 
     class Meta:
         model = Payment
         fields = "__all__"
 
 
-class UserSerializer(ModelSerializer):
+class UserSerializer(SparseFieldsetSerializerMixin, ModelSerializer):
     payments = PaymentSerializer(many=True, read_only=True)  # Добавляем read_only=True
+    avatar_variants = ImageVariantsField()
 
     class Meta:
         model = User
@@ -22,6 +26,7 @@ class UserSerializer(ModelSerializer):
             "phone",
             "city",
             "avatar",
+            "avatar_variants",
             "payments",
             "is_moderator",
         ]
@@ -39,7 +44,43 @@ class UserSerializer(ModelSerializer):
         return instance
 
 
-class UserProfileSerializer(ModelSerializer):
+class UserListSerializer(SparseFieldsetSerializerMixin, ModelSerializer):
+    """Пользователь в списке: сводка по платежам и несколько последних платежей."""
+
+    payments_count = serializers.IntegerField(read_only=True)
+    payments_total = serializers.IntegerField(read_only=True)
+    recent_payments = PaymentSerializer(many=True, read_only=True)
+    avatar_variants = ImageVariantsField()
+
+    class Meta:
+        model = User
+        fields = [
+            "id",
+            "email",
+            "phone",
+            "city",
+            "avatar",
+            "avatar_variants",
+            "is_moderator",
+            "payments_count",
+            "payments_total",
+            "recent_payments",
+        ]
+        expandable_fields = ("recent_payments", "payments")
+
+
+class UserListFullSerializer(UserListSerializer):
+    """Пользователь в списке с полной историей платежей (?payments=full)."""
+
+    payments = PaymentSerializer(many=True, read_only=True)
+
+    class Meta(UserListSerializer.Meta):
+        fields = UserListSerializer.Meta.fields + ["payments"]
+
+
+class UserProfileSerializer(SparseFieldsetSerializerMixin, ModelSerializer):
+    avatar_variants = ImageVariantsField()
+
     class Meta:
         model = User
         fields = [
@@ -48,6 +89,19 @@ class UserProfileSerializer(ModelSerializer):
             "phone",
             "city",
             "avatar",
+            "avatar_variants",
         ]  # Только эти поля будут доступны
         read_only_fields = ["id", "email"]
         extra_kwargs = {"avatar": {"required": False}}
+
+
+class PaymentReportQuerySerializer(serializers.Serializer):
+    """Параметры отчета о выручке по дневным агрегатам платежей."""
+
+    group_by = serializers.ChoiceField(choices=["course", "period"], default="course")
+    period = serializers.ChoiceField(choices=["day", "month", "year"], default="day")
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    paid_course = serializers.IntegerField(required=False)
+    payment_method = serializers.CharField(required=False)
+    is_paid = serializers.BooleanField(default=True)
@@ -1,11 +1,28 @@
-import stripe
 from django.conf import settings
+from django.db import IntegrityError, transaction
 from materials.models import Course
+from users.models import CourseStripePrice
 
-stripe.api_key = settings.STRIPE_API_KEY
+# SDK Stripe импортируется около секунды, поэтому загружается при первом
+# обращении к Stripe, а не при старте веб-процессов и воркеров Celery
+stripe = None
 
 
-def create_stripe_product(course: Course) -> str:
+def get_stripe():
+    """Возвращает настроенный модуль stripe, импортируя его при первом вызове."""
+    global stripe
+    if stripe is None:
+        import stripe as stripe_module
+
+        stripe_module.api_key = settings.STRIPE_API_KEY
+        if settings.STRIPE_API_BASE:
+            # Например, локальный stripe-mock для тестов и стендов
+            stripe_module.api_base = settings.STRIPE_API_BASE
+        stripe = stripe_module
+    return stripe
+
+
+def create_stripe_product(course: Course, idempotency_key: str = None) -> str:
     """Создает продукт в Stripe и возвращает его ID."""
     product_data = {
         "name": course.name,
@@ -15,13 +32,18 @@ def create_stripe_product(course: Course) -> str:
     if course.description:
         product_data["description"] = course.description
 
-    product = stripe.Product.create(**product_data)
+    options = {"idempotency_key": idempotency_key} if idempotency_key else {}
+    product = get_stripe().Product.create(**options, **product_data)
     return product.id
 
 
-def create_stripe_price(product_id: str, amount: int) -> str:
+def create_stripe_price(
+    product_id: str, amount: int, idempotency_key: str = None
+) -> str:
     """Создает цену в Stripe и возвращает ее ID."""
-    price = stripe.Price.create(
+    options = {"idempotency_key": idempotency_key} if idempotency_key else {}
+    price = get_stripe().Price.create(
+        **options,
         product=product_id,
         unit_amount=amount * 100,  # Переводим в копейки
         currency="rub",
@@ -29,9 +51,66 @@ def create_stripe_price(product_id: str, amount: int) -> str:
     return price.id
 
 
-def create_stripe_session(price_id: str, success_url: str, cancel_url: str) -> dict:
-    """Создает сессию оплаты в Stripe и возвращает данные сессии."""
-    session = stripe.checkout.Session.create(
+def get_or_create_course_price(
+    course: Course, amount: int | None = None
+) -> CourseStripePrice:
+    """
+    Возвращает продукт и цену Stripe для суммы (по умолчанию — текущей цены курса).
+
+    Продукт создается один раз на курс, новая цена — только при изменении
+    Course.price; повторные оплаты обходятся без запросов к Stripe.
+    Первые параллельные оплаты курса ждут друг друга на блокировке строки
+    курса, а ключи идемпотентности Stripe не дают создать второй продукт
+    или цену и там, где блокировки нет.
+    """
+    if amount is None:
+        amount = course.price
+    mapping = CourseStripePrice.objects.filter(course=course, amount=amount).first()
+    if mapping:
+        return mapping
+
+    with transaction.atomic():
+        Course.objects.select_for_update().filter(pk=course.pk).values_list(
+            "pk", flat=True
+        ).first()
+        # Пока ждали блокировку, цену мог сохранить параллельный запрос
+        mapping = CourseStripePrice.objects.filter(course=course, amount=amount).first()
+        if mapping:
+            return mapping
+
+        product_id = CourseStripePrice.objects.filter(course=course).values_list(
+            "stripe_product_id", flat=True
+        ).first() or create_stripe_product(
+            course, idempotency_key=f"course-product-{course.pk}"
+        )
+        price_id = create_stripe_price(
+            product_id,
+            amount,
+            idempotency_key=f"course-price-{course.pk}-{product_id}-{amount}",
+        )
+        try:
+            with transaction.atomic():
+                return CourseStripePrice.objects.create(
+                    course=course,
+                    amount=amount,
+                    stripe_product_id=product_id,
+                    stripe_price_id=price_id,
+                )
+        except IntegrityError:
+            # Параллельная оплата уже сохранила цену для этой суммы
+            return CourseStripePrice.objects.get(course=course, amount=amount)
+
+
+def create_stripe_session(
+    price_id: str, success_url: str, cancel_url: str, idempotency_key: str = None
+) -> dict:
+    """Создает сессию оплаты в Stripe и возвращает данные сессии.
+
+    С idempotency_key повторный вызов вернет ту же сессию, а не создаст новую.
+    """
+    options = {"idempotency_key": idempotency_key} if idempotency_key else {}
+    session = get_stripe().checkout.Session.create(
+        **options,
         payment_method_types=["card"],
         line_items=[
             {
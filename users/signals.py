@@ -0,0 +1,83 @@
+from django.contrib.auth.models import Group
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_init,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from materials.images import remember_image_names
+from materials.models import Course
+from materials.tasks import schedule_image_variants
+from users.models import Payment, User
+from users.roles import invalidate_moderator_cache
+from users.rollups import (
+    move_course_rollups,
+    payment_bucket,
+    update_payment_rollups,
+)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def reset_user_role_cache(sender, instance, **kwargs):
+    invalidate_moderator_cache(instance.pk)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def reset_role_cache_on_groups_change(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    if action not in ("post_add", "post_remove", "pre_clear", "post_clear"):
+        return
+    if not reverse:
+        # user.groups.add(...)/remove(...)/clear()
+        invalidate_moderator_cache(instance.pk)
+    elif pk_set:
+        # group.user_set.add(...)/remove(...)
+        invalidate_moderator_cache(*pk_set)
+    elif action == "pre_clear":
+        # group.user_set.clear(): после очистки участников уже не узнать
+        invalidate_moderator_cache(*instance.user_set.values_list("pk", flat=True))
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def reset_role_cache_on_group_change(sender, instance, **kwargs):
+    # Переименование или удаление группы меняет статус всех ее участников
+    if instance.pk:
+        invalidate_moderator_cache(*instance.user_set.values_list("pk", flat=True))
+
+
+@receiver(pre_save, sender=Payment)
+@receiver(pre_delete, sender=Payment)
+def remember_payment_bucket(sender, instance, **kwargs):
+    instance._rollup_state = payment_bucket(instance.pk)
+
+
+@receiver(post_save, sender=Payment)
+def update_rollups_on_payment_save(sender, instance, **kwargs):
+    update_payment_rollups(instance._rollup_state, payment_bucket(instance.pk))
+
+
+@receiver(post_delete, sender=Payment)
+def update_rollups_on_payment_delete(sender, instance, **kwargs):
+    update_payment_rollups(instance._rollup_state, None)
+
+
+@receiver(pre_delete, sender=Course)
+def move_rollups_of_deleted_course(sender, instance, **kwargs):
+    move_course_rollups(instance.pk)
+
+
+@receiver(post_init, sender=User)
+def remember_avatar_name(sender, instance, **kwargs):
+    remember_image_names(instance, "avatar")
+
+
+@receiver(post_save, sender=User)
+def build_avatar_variants(sender, instance, **kwargs):
+    schedule_image_variants(instance, "avatar")
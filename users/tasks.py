@@ -1,16 +1,31 @@
 from celery import shared_task
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.utils import timezone
 from datetime import timedelta
 import logging
+import time
+
+from users.models import Payment
+from users.services import create_stripe_session, get_or_create_course_price
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
 
+INACTIVE_SWEEP_CHECKPOINT_KEY = "users:check_inactive_users:checkpoint"
+# Контрольная точка живет меньше суток: следующий ночной запуск начнет обход заново
+INACTIVE_SWEEP_CHECKPOINT_TIMEOUT = 60 * 60 * 20
+
 
 @shared_task
-def check_inactive_users():
-    """Проверяет пользователей, которые не заходили больше месяца, и деактивирует их."""
+def check_inactive_users(batch_size=None, dry_run=False, resume=True):
+    """Проверяет пользователей, которые не заходили больше месяца, и деактивирует их.
+
+    Пользователи обрабатываются пакетами по возрастанию pk; после каждого пакета
+    сохраняется контрольная точка, с которой продолжит прерванный запуск.
+    В режиме dry_run только считает, сколько пользователей будет затронуто.
+    """
     try:
         one_month_ago = timezone.now() - timedelta(days=30)
         inactive_users = User.objects.filter(
@@ -18,12 +33,96 @@ def check_inactive_users():
             is_active=True
         )
 
-        count = inactive_users.count()
-        inactive_users.update(is_active=False)  # Массово деактивируем
+        if dry_run:
+            count = inactive_users.count()
+            logger.info(f"Будет заблокировано {count} неактивных пользователей.")
+            return f"Будет заблокировано {count} пользователей."
+
+        batch_size = batch_size or settings.INACTIVE_USERS_BATCH_SIZE
+        checkpoint = cache.get(INACTIVE_SWEEP_CHECKPOINT_KEY) if resume else None
+        last_pk = checkpoint["last_pk"] if checkpoint else 0
+        count = checkpoint["count"] if checkpoint else 0
+        if checkpoint:
+            logger.info(f"Продолжение с pk > {last_pk}, уже заблокировано {count}.")
 
+        while True:
+            started = time.monotonic()
+            # Частичный индекс (id, last_login) отдает пакет по порядку pk
+            # без сортировки, last_login проверяется в самом индексе
+            batch_pks = list(
+                inactive_users.filter(pk__gt=last_pk)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not batch_pks:
+                break
+            # Условие повторяется, чтобы не задеть вошедших за время обхода
+            updated = inactive_users.filter(pk__in=batch_pks).update(is_active=False)
+            last_pk = batch_pks[-1]
+            count += updated
+            cache.set(
+                INACTIVE_SWEEP_CHECKPOINT_KEY,
+                {"last_pk": last_pk, "count": count},
+                INACTIVE_SWEEP_CHECKPOINT_TIMEOUT,
+            )
+            logger.info(
+                f"Пакет до pk={last_pk}: заблокировано {updated} "
+                f"за {time.monotonic() - started:.3f} с."
+            )
+
+        cache.delete(INACTIVE_SWEEP_CHECKPOINT_KEY)
         logger.info(f"Заблокировано {count} неактивных пользователей.")
         return f"Заблокировано {count} пользователей."
 
     except Exception as e:
         logger.error(f"Ошибка: {str(e)}")
-        return f"Ошибка: {str(e)}"
\ No newline at end of file
+        return f"Ошибка: {str(e)}"
+
+
+@shared_task(bind=True, max_retries=5)
+def create_checkout_session(self, payment_id, success_url, cancel_url):
+    """Создает платежную сессию Stripe для ожидающего платежа.
+
+    Ключ идемпотентности выводится из платежа, поэтому повторы задачи
+    не создают в Stripe лишних сессий.
+    """
+    # Импорт SDK Stripe отложен до первой задачи оплаты (см. users.services)
+    from stripe import StripeError
+
+    payment = Payment.objects.select_related("paid_course").get(id=payment_id)
+    if payment.checkout_status != Payment.CHECKOUT_PENDING:
+        return f"Платеж {payment_id} уже обработан"
+
+    try:
+        stripe_price = get_or_create_course_price(payment.paid_course, payment.amount)
+        session_data = create_stripe_session(
+            stripe_price.stripe_price_id,
+            success_url,
+            cancel_url,
+            idempotency_key=f"checkout-session-payment-{payment.id}",
+        )
+    except StripeError as e:
+        if self.request.retries >= self.max_retries:
+            Payment.objects.filter(id=payment_id).update(
+                checkout_status=Payment.CHECKOUT_FAILED
+            )
+            logger.error(f"Не удалось создать сессию для платежа {payment_id}: {e}")
+            return f"Ошибка: {str(e)}"
+        raise self.retry(exc=e, countdown=2 ** self.request.retries)
+    except Exception as e:
+        # Непредвиденная ошибка не повторяется: без отметки платеж навсегда
+        # остался бы в ожидании, и клиент опрашивал бы его бесконечно
+        Payment.objects.filter(id=payment_id).update(
+            checkout_status=Payment.CHECKOUT_FAILED
+        )
+        logger.exception(f"Ошибка создания сессии для платежа {payment_id}: {e}")
+        return f"Ошибка: {str(e)}"
+
+    Payment.objects.filter(id=payment_id).update(
+        stripe_product_id=stripe_price.stripe_product_id,
+        stripe_price_id=stripe_price.stripe_price_id,
+        stripe_session_id=session_data["session_id"],
+        stripe_payment_link=session_data["payment_link"],
+        checkout_status=Payment.CHECKOUT_READY,
+    )
+    return f"Сессия для платежа {payment_id} создана"
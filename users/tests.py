@@ -1,3 +1,680 @@
-from django.test import TestCase
+import csv
+import io
+import re
+import tempfile
+from datetime import timedelta
+from importlib import import_module
+from itertools import count
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from django.apps import apps as django_apps
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import NOT_PROVIDED, Sum
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from PIL import Image
+
+from materials.models import Course, Lesson, Subscription
+from materials.tasks import generate_image_variants
+from users.checks import check_role_cache_timeout
+from users.generators import FIXED, POWER_LAW, DataGenerator
+from users.models import CourseStripePrice, Payment, PaymentDailyRollup, User
+from users.roles import is_moderator
+from users.rollups import rebuild_payment_rollups
+from users.services import create_stripe_session, get_or_create_course_price
+from users.tasks import (
+    INACTIVE_SWEEP_CHECKPOINT_KEY,
+    check_inactive_users,
+    create_checkout_session,
+)
+
+
+class FakeStripe:
+    """Локальная заглушка модуля stripe: запоминает вызовы и выдает id."""
+
+    def __init__(self):
+        self.calls = []
+        self._ids = count(1)
+        self._idempotent = {}
+        self.Product = SimpleNamespace(create=self._factory("Product", "prod"))
+        self.Price = SimpleNamespace(create=self._factory("Price", "price"))
+        self.checkout = SimpleNamespace(
+            Session=SimpleNamespace(create=self._factory("Session", "cs"))
+        )
+
+    def _factory(self, name, prefix):
+        def create(idempotency_key=None, **kwargs):
+            # Как и Stripe, возвращает тот же объект для повторного ключа
+            if idempotency_key in self._idempotent:
+                return self._idempotent[idempotency_key]
+            self.calls.append((name, kwargs))
+            object_id = f"{prefix}_{next(self._ids)}"
+            created = SimpleNamespace(
+                id=object_id, url=f"https://checkout.test/{object_id}"
+            )
+            if idempotency_key:
+                self._idempotent[idempotency_key] = created
+            return created
+
+        return create
+
+    def count(self, name):
+        return sum(1 for call_name, _ in self.calls if call_name == name)
+
 
 # Create your tests here.
+class ModeratorRoleCacheTestCase(TestCase):
+    def setUp(self):
+        """Подготовка пользователя и группы модераторов."""
+        cache.clear()
+        self.moder_group = Group.objects.create(name="moders")
+        self.user = User.objects.create(email="role@test.com", password="testpass")
+
+    def test_role_is_resolved_once(self):
+        """Статус модератора вычисляется одним запросом и затем берется из кэша."""
+        with self.assertNumQueries(1):
+            self.assertFalse(is_moderator(self.user))
+            self.assertFalse(is_moderator(self.user))
+
+        fresh_user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertFalse(is_moderator(fresh_user))
+
+    def test_group_membership_change_invalidates_cache(self):
+        """Изменение групп пользователя сбрасывает общий кэш роли."""
+        self.assertFalse(is_moderator(self.user))
+
+        self.user.groups.add(self.moder_group)
+        self.assertTrue(is_moderator(User.objects.get(pk=self.user.pk)))
+
+        self.moder_group.user_set.remove(self.user)
+        self.assertFalse(is_moderator(User.objects.get(pk=self.user.pk)))
+
+
+class RoleCacheCheckTestCase(SimpleTestCase):
+    @override_settings(ROLE_CACHE_TIMEOUT=3600)
+    def test_long_role_cache_needs_shared_cache(self):
+        """Долгий кэш роли в памяти процесса дает предупреждение."""
+        self.assertEqual(
+            [warning.id for warning in check_role_cache_timeout(None)], ["users.W001"]
+        )
+        redis = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache"}}
+        with override_settings(CACHES=redis):
+            self.assertEqual(check_role_cache_timeout(None), [])
+
+    @override_settings(ROLE_CACHE_TIMEOUT=10)
+    def test_short_role_cache_passes(self):
+        self.assertEqual(check_role_cache_timeout(None), [])
+
+
+class CoursePaymentStripeReuseTestCase(APITestCase):
+    def setUp(self):
+        """Подготовка курса и заглушки Stripe."""
+        self.user = User.objects.create(email="buyer@test.com", password="testpass")
+        self.course = Course.objects.create(name="Paid Course", price=1000)
+        self.url = reverse("users:course-pay", kwargs={"course_id": self.course.pk})
+        self.stripe = FakeStripe()
+        patcher = patch("users.services.stripe", self.stripe)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_product_and_price_are_reused(self):
+        """Повторная оплата создает только сессию, без нового продукта и цены."""
+        self.client.force_authenticate(user=self.user)
+        self.client.post(self.url)
+        response = self.client.post(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.stripe.count("Product"), 1)
+        self.assertEqual(self.stripe.count("Price"), 1)
+        self.assertEqual(self.stripe.count("Session"), 2)
+        self.assertEqual(Payment.objects.count(), 2)
+
+    def test_price_change_creates_only_new_price(self):
+        """Изменение цены курса создает новую цену Stripe для того же продукта."""
+        self.client.force_authenticate(user=self.user)
+        self.client.post(self.url)
+        self.course.price = 1500
+        self.course.save()
+        self.client.post(self.url)
+
+        self.assertEqual(self.stripe.count("Product"), 1)
+        self.assertEqual(self.stripe.count("Price"), 2)
+        prices = CourseStripePrice.objects.filter(course=self.course)
+        self.assertEqual(set(prices.values_list("amount", flat=True)), {1000, 1500})
+        self.assertEqual(
+            len(set(prices.values_list("stripe_product_id", flat=True))), 1
+        )
+
+    def test_concurrent_first_checkout_creates_one_price(self):
+        """Параллельная первая оплата курса не создает второй продукт и цену."""
+        first = get_or_create_course_price(self.course)
+        # Второй запрос не видит еще не сохраненную цену первого
+        CourseStripePrice.objects.all().delete()
+        second = get_or_create_course_price(self.course)
+
+        self.assertEqual(first.stripe_product_id, second.stripe_product_id)
+        self.assertEqual(first.stripe_price_id, second.stripe_price_id)
+        self.assertEqual(self.stripe.count("Product"), 1)
+        self.assertEqual(self.stripe.count("Price"), 1)
+        self.assertEqual(CourseStripePrice.objects.count(), 1)
+
+    def test_concurrent_idempotency_key_returns_existing_payment(self):
+        """Гонка повторов с одним ключом отдает платеж, сохраненный первым."""
+
+        def create_session_during_retry(*args, **kwargs):
+            # Параллельный запрос с тем же ключом сохраняет платеж, пока
+            # этот создает сессию в Stripe
+            Payment.objects.create(
+                user=self.user,
+                paid_course=self.course,
+                amount=1000,
+                payment_method="card",
+                stripe_payment_link="https://checkout.test/first",
+                idempotency_key="checkout-1",
+            )
+            return create_stripe_session(*args, **kwargs)
+
+        self.client.force_authenticate(user=self.user)
+        with patch(
+            "users.views.create_stripe_session",
+            side_effect=create_session_during_retry,
+        ):
+            response = self.client.post(
+                self.url, headers={"Idempotency-Key": "checkout-1"}
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["payment_link"], "https://checkout.test/first")
+        self.assertEqual(Payment.objects.count(), 1)
+
+    def test_idempotency_key_for_other_course_is_rejected(self):
+        """Ключ, уже использованный для одного курса, не оплачивает другой."""
+        other_course = Course.objects.create(name="Other Course", price=700)
+        other_url = reverse("users:course-pay", kwargs={"course_id": other_course.pk})
+        headers = {"Idempotency-Key": "checkout-1"}
+        self.client.force_authenticate(user=self.user)
+        self.client.post(self.url, headers=headers)
+
+        response = self.client.post(other_url, headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        response = self.client.post(other_url + "?async=true", headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Payment.objects.count(), 1)
+        self.assertEqual(self.stripe.count("Session"), 1)
+
+    def test_idempotency_key_reuses_stripe_session(self):
+        """Повтор, не заставший сохраненный платеж, получает ту же сессию Stripe."""
+        headers = {"Idempotency-Key": "checkout-1"}
+        self.client.force_authenticate(user=self.user)
+        first = self.client.post(self.url, headers=headers)
+        # Платеж первого запроса еще не виден повтору
+        Payment.objects.all().delete()
+        second = self.client.post(self.url, headers=headers)
+
+        self.assertEqual(first.data["payment_link"], second.data["payment_link"])
+        self.assertEqual(self.stripe.count("Session"), 1)
+
+
+class AsyncCheckoutTestCase(APITestCase):
+    def setUp(self):
+        """Подготовка курса, заглушки Stripe и синхронного запуска задачи."""
+        self.user = User.objects.create(email="async@test.com", password="testpass")
+        self.course = Course.objects.create(name="Async Course", price=500)
+        self.url = (
+            reverse("users:course-pay", kwargs={"course_id": self.course.pk})
+            + "?async=true"
+        )
+        self.stripe = FakeStripe()
+        patcher = patch("users.services.stripe", self.stripe)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch.object(
+            create_checkout_session, "delay", side_effect=create_checkout_session
+        )
+        self.delay = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_async_checkout_returns_pending_payment(self):
+        """Платеж записывается сразу, ссылка появляется после фоновой задачи."""
+        self.client.force_authenticate(user=self.user)
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(self.url)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["status"], Payment.CHECKOUT_PENDING)
+        self.assertEqual(self.stripe.calls, [])
+        status_url = reverse(
+            "users:payment-status", kwargs={"pk": response.data["payment_id"]}
+        )
+
+        # Пока сессия создается, статус отдается сразу с Retry-After
+        response = self.client.get(status_url)
+        self.assertEqual(response.data["status"], Payment.CHECKOUT_PENDING)
+        self.assertEqual(response["Retry-After"], "1")
+
+        for callback in callbacks:
+            callback()
+        response = self.client.get(status_url)
+        self.assertEqual(response.data["status"], Payment.CHECKOUT_READY)
+        self.assertNotIn("Retry-After", response)
+        self.assertTrue(response.data["payment_link"].startswith("https://"))
+
+    def test_idempotency_key_prevents_duplicates(self):
+        """Повтор запроса с тем же ключом не создает второй платеж и сессию."""
+        self.client.force_authenticate(user=self.user)
+        headers = {"Idempotency-Key": "checkout-1"}
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.client.post(self.url, headers=headers)
+        with self.captureOnCommitCallbacks(execute=True):
+            second = self.client.post(self.url, headers=headers)
+
+        self.assertEqual(first.data["payment_id"], second.data["payment_id"])
+        self.assertEqual(Payment.objects.count(), 1)
+        self.assertEqual(self.stripe.count("Session"), 1)
+
+        # Повтор задачи переиспользует сессию по ключу идемпотентности Stripe
+        payment = Payment.objects.get()
+        Payment.objects.filter(id=payment.id).update(
+            checkout_status=Payment.CHECKOUT_PENDING
+        )
+        create_checkout_session(payment.id, "https://s.test", "https://c.test")
+        payment.refresh_from_db()
+        self.assertEqual(payment.stripe_session_id, "cs_3")
+        self.assertEqual(self.stripe.count("Session"), 1)
+
+    def test_unexpected_error_marks_payment_failed(self):
+        """Непредвиденная ошибка задачи переводит платеж в failed."""
+        payment = Payment.objects.create(
+            user=self.user,
+            paid_course=self.course,
+            amount=1000,
+            payment_method="card",
+            checkout_status=Payment.CHECKOUT_PENDING,
+        )
+        with patch(
+            "users.tasks.create_stripe_session", side_effect=KeyError("url")
+        ), self.assertLogs("users.tasks", level="ERROR"):
+            create_checkout_session(payment.id, "https://s.test", "https://c.test")
+        payment.refresh_from_db()
+        self.assertEqual(payment.checkout_status, Payment.CHECKOUT_FAILED)
+
+    def test_status_of_foreign_payment_is_hidden(self):
+        """Статус чужого платежа недоступен."""
+        other = User.objects.create(email="stranger@test.com", password="testpass")
+        payment = Payment.objects.create(
+            user=other, paid_course=self.course, amount=500, payment_method="card"
+        )
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(
+            reverse("users:payment-status", kwargs={"pk": payment.pk})
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class CheckInactiveUsersTestCase(TestCase):
+    def setUp(self):
+        """Подготовка активных пользователей с давним и недавним входом."""
+        cache.clear()
+        long_ago = timezone.now() - timedelta(days=45)
+        self.inactive = [
+            User.objects.create(email=f"idle{i}@test.com", last_login=long_ago)
+            for i in range(5)
+        ]
+        self.active = User.objects.create(
+            email="recent@test.com", last_login=timezone.now()
+        )
+
+    def test_dry_run_only_counts(self):
+        """Пробный запуск сообщает число пользователей и ничего не меняет."""
+        result = check_inactive_users(dry_run=True)
+        self.assertIn("5", result)
+        self.assertEqual(User.objects.filter(is_active=False).count(), 0)
+
+    def test_users_are_deactivated_in_batches(self):
+        """Неактивные пользователи блокируются пакетами, остальные не затронуты."""
+        with self.assertNumQueries(7):
+            result = check_inactive_users(batch_size=2)
+        self.assertIn("5", result)
+        self.assertEqual(set(User.objects.filter(is_active=False)), set(self.inactive))
+        self.assertTrue(User.objects.get(pk=self.active.pk).is_active)
+        self.assertIsNone(cache.get(INACTIVE_SWEEP_CHECKPOINT_KEY))
+
+    def test_resume_from_checkpoint(self):
+        """Прерванный обход продолжается с сохраненной контрольной точки."""
+        cache.set(
+            INACTIVE_SWEEP_CHECKPOINT_KEY,
+            {"last_pk": self.inactive[2].pk, "count": 3},
+        )
+        result = check_inactive_users(batch_size=2)
+        self.assertIn("5", result)
+        self.assertEqual(
+            set(User.objects.filter(is_active=False)), set(self.inactive[3:])
+        )
+
+
+class PaymentRollupTestCase(APITestCase):
+    def setUp(self):
+        """Подготовка курсов, покупателя и администратора."""
+        self.buyer = User.objects.create(email="payer@test.com", password="testpass")
+        self.admin = User.objects.create(
+            email="finance@test.com", password="testpass", is_staff=True
+        )
+        self.course = Course.objects.create(name="Course A", price=100)
+        self.other_course = Course.objects.create(name="Course B", price=300)
+        self.url = reverse("users:payment-report")
+
+    def _pay(self, course, amount, is_paid=True, method="transfer"):
+        return Payment.objects.create(
+            user=self.buyer,
+            paid_course=course,
+            amount=amount,
+            payment_method=method,
+            is_paid=is_paid,
+        )
+
+    def test_rollups_follow_payment_changes(self):
+        """Агрегаты обновляются при создании, оплате и удалении платежа."""
+        self._pay(self.course, 100)
+        pending = self._pay(self.course, 100, is_paid=False)
+        rollup = PaymentDailyRollup.objects.get(paid_course=self.course, is_paid=True)
+        self.assertEqual((rollup.payments_count, rollup.amount_total), (1, 100))
+
+        pending.is_paid = True
+        pending.save()
+        rollup.refresh_from_db()
+        self.assertEqual((rollup.payments_count, rollup.amount_total), (2, 200))
+        self.assertEqual(
+            PaymentDailyRollup.objects.get(
+                paid_course=self.course, is_paid=False
+            ).payments_count,
+            0,
+        )
+
+        pending.delete()
+        rollup.refresh_from_db()
+        self.assertEqual((rollup.payments_count, rollup.amount_total), (1, 100))
+
+    def test_rebuild_matches_incremental_rollups(self):
+        """Пересчет с нуля дает те же итоги, что и инкрементальное обновление."""
+        self._pay(self.course, 100)
+        self._pay(self.other_course, 300, method="cash")
+        self._pay(None, 50)
+        incremental = set(
+            PaymentDailyRollup.objects.filter(payments_count__gt=0).values_list(
+                "day", "paid_course_id", "payment_method", "is_paid", "amount_total"
+            )
+        )
+        rebuild_payment_rollups()
+        rebuilt = set(
+            PaymentDailyRollup.objects.values_list(
+                "day", "paid_course_id", "payment_method", "is_paid", "amount_total"
+            )
+        )
+        self.assertEqual(incremental, rebuilt)
+
+    def rollup_rows(self):
+        return set(
+            PaymentDailyRollup.objects.filter(payments_count__gt=0).values_list(
+                "day",
+                "paid_course_id",
+                "payment_method",
+                "is_paid",
+                "payments_count",
+                "amount_total",
+            )
+        )
+
+    def test_course_deletion_keeps_rollups_consistent(self):
+        """Удаление курса (SET_NULL без сигналов) не рассогласует агрегаты."""
+        payment = self._pay(self.course, 100)
+        self._pay(self.course, 100, is_paid=False)
+        course_id = self.course.pk
+        self.course.delete()
+        self.assertFalse(
+            PaymentDailyRollup.objects.filter(paid_course_id=course_id).exists()
+        )
+        # Объект платежа устарел: paid_course в нем все еще указывает на курс
+        payment.delete()
+
+        incremental = self.rollup_rows()
+        rebuild_payment_rollups()
+        self.assertEqual(incremental, self.rollup_rows())
+        self.assertEqual(len(incremental), 1)
+
+    def test_payment_without_rollup_is_backfilled(self):
+        """Платежи без агрегата (до миграции 0010) учитываются миграцией."""
+        self._pay(self.course, 100)
+        PaymentDailyRollup.objects.all().delete()
+        migration = import_module("users.migrations.0013_backfill_payment_rollups")
+        migration.backfill_payment_rollups(django_apps, None)
+        self.assertEqual(len(self.rollup_rows()), 1)
+        Payment.objects.get().delete()
+        self.assertEqual(self.rollup_rows(), set())
+
+    def test_report_by_course_and_period(self):
+        """Отчет о выручке строится по агрегатам и доступен только администратору."""
+        self._pay(self.course, 100)
+        self._pay(self.course, 100)
+        self._pay(self.other_course, 300)
+        self._pay(self.other_course, 300, is_paid=False)
+
+        self.client.force_authenticate(user=self.buyer)
+        self.assertEqual(
+            self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN
+        )
+
+        self.client.force_authenticate(user=self.admin)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {"group_by": "course"})
+        self.assertEqual(
+            {
+                row["paid_course"]: row["amount_total"]
+                for row in response.data["results"]
+            },
+            {self.course.pk: 200, self.other_course.pk: 300},
+        )
+
+        response = self.client.get(self.url, {"group_by": "period", "period": "month"})
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(response.data["amount_total"], 500)
+        self.assertEqual(response.data["results"][0]["payments_count"], 3)
+
+
+@override_settings(USER_LIST_RECENT_PAYMENTS=2)
+class UserListPaymentsTestCase(APITestCase):
+    def setUp(self):
+        """Подготовка администратора и пользователей с платежами."""
+        self.admin = User.objects.create(
+            email="staff@test.com", password="testpass", is_staff=True
+        )
+        self.url = reverse("users:users-list")
+
+    def _create_users(self, count):
+        start = User.objects.count()
+        for i in range(start, start + count):
+            user = User.objects.create(email=f"client{i}@test.com")
+            for amount in (100, 200, 300):
+                Payment.objects.create(
+                    user=user, amount=amount, payment_method="cash", is_paid=True
+                )
+
+    def test_query_count_does_not_depend_on_users(self):
+        """Список пользователей строится фиксированным числом запросов."""
+        self.client.force_authenticate(user=self.admin)
+        self._create_users(1)
+        with self.assertNumQueries(3):
+            self.client.get(self.url)
+        self._create_users(4)
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+
+        client = next(row for row in response.data["results"] if row["payments_count"])
+        self.assertEqual(client["payments_total"], 600)
+        self.assertEqual(len(client["recent_payments"]), 2)
+        self.assertNotIn("payments", client)
+
+    def test_full_history_on_request(self):
+        """Полная история платежей возвращается только по ?payments=full."""
+        self.client.force_authenticate(user=self.admin)
+        self._create_users(1)
+        response = self.client.get(self.url, {"payments": "full"})
+        client = next(row for row in response.data["results"] if row["payments_count"])
+        self.assertEqual(len(client["payments"]), 3)
+
+    def test_sparse_fields_skip_payment_queries(self):
+        """?fields= без платежных полей не считает сводку и не грузит платежи."""
+        self.client.force_authenticate(user=self.admin)
+        self._create_users(2)
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {"fields": "id,email"})
+        self.assertEqual(set(response.data["results"][0]), {"id", "email"})
+
+
+class DataGeneratorTestCase(TestCase):
+    def generate(self, seed=7, **sizes):
+        options = dict(users=30, courses=5, lessons=3, subscribers=6, payments=2)
+        options.update(sizes)
+        generator = DataGenerator(seed=seed, batch_size=8)
+        return generator, generator.generate(**options)
+
+    def test_same_seed_reproduces_dataset(self):
+        """Одинаковый seed дает одинаковые объемы и значения."""
+        _, first = self.generate()
+        first_payments = list(
+            Payment.objects.order_by("id").values_list("amount", "payment_method")
+        )
+        Payment.objects.all().delete()
+        User.objects.all().delete()
+        Course.objects.all().delete()
+
+        _, second = self.generate()
+        second_payments = list(
+            Payment.objects.order_by("id").values_list("amount", "payment_method")
+        )
+        first.pop("seconds")
+        second.pop("seconds")
+        self.assertEqual(first, second)
+        self.assertEqual(first_payments, second_payments)
+
+    def test_password_is_hashed_once(self):
+        """Пароль хэшируется один раз для всех пользователей."""
+        with patch(
+            "users.generators.make_password", wraps=make_password
+        ) as make_password_mock:
+            generator, _ = self.generate()
+        make_password_mock.assert_called_once()
+        self.assertTrue(
+            User.objects.get(pk=generator.user_ids[-1]).check_password("password")
+        )
+
+    def test_copy_lists_all_required_columns(self):
+        """COPY получает значения всех NOT NULL полей без db_default."""
+        statements = []
+
+        def copy_expert(sql, buffer):
+            statements.append((sql, list(csv.reader(buffer))))
+
+        cursor = MagicMock()
+        cursor.__enter__.return_value.copy_expert.side_effect = copy_expert
+        generator = DataGenerator(seed=3, batch_size=8)
+
+        def write_new(model, fields, rows):
+            with patch.object(connection, "cursor", return_value=cursor):
+                generator.copy(model, fields, list(rows))
+            return [1]
+
+        with patch.object(generator, "write_new", side_effect=write_new):
+            generator.generate_users(2, days=30)
+            generator.generate_courses(2)
+            generator.generate_lessons(2, FIXED)
+
+        for model, (sql, rows) in zip((User, Course, Lesson), statements):
+            columns = re.search(r"\((.*?)\) FROM STDIN", sql).group(1)
+            columns = [column.strip('"') for column in columns.split(", ")]
+            required = {
+                field.column
+                for field in model._meta.concrete_fields
+                if not field.null
+                and not field.primary_key
+                and field.db_default is NOT_PROVIDED
+            }
+            self.assertLessEqual(required, set(columns), model)
+            self.assertTrue(all(len(row) == len(columns) for row in rows))
+            if "preview_variants" in columns:
+                self.assertEqual(rows[0][columns.index("preview_variants")], "{}")
+
+    def test_power_law_subscribers(self):
+        """Число подписчиков курса распределено по степенному закону."""
+        generator = DataGenerator(seed=1)
+        counts = sorted(generator.sample_count(50, POWER_LAW) for _ in range(10000))
+        median = counts[len(counts) // 2]
+        self.assertLess(median, 50)
+        self.assertGreater(counts[-1], 10 * median)
+
+    def test_payment_dates_and_rollups(self):
+        """Даты платежей сохраняются, а агрегаты пересчитываются после генерации."""
+        self.generate(payments=5)
+        self.assertGreater(
+            Payment.objects.filter(
+                payment_date__lt=timezone.now() - timedelta(days=1)
+            ).count(),
+            0,
+        )
+        totals = PaymentDailyRollup.objects.aggregate(total=Sum("payments_count"))
+        self.assertEqual(totals["total"], Payment.objects.count())
+        self.assertTrue(Payment._meta.get_field("payment_date").auto_now_add)
+
+    def test_command_without_users(self):
+        """Без пользователей создаются курсы и уроки, но не подписки и платежи."""
+        out = io.StringIO()
+        call_command(
+            "generate_data", users=0, courses=3, lessons=2, payments=2, stdout=out
+        )
+        self.assertIn("0 пользователей, 3 курсов", out.getvalue())
+        self.assertFalse(Subscription.objects.exists())
+        self.assertFalse(Payment.objects.exists())
+
+        with self.assertRaises(CommandError):
+            call_command("generate_data", users=-1, stdout=out)
+
+
+class AvatarVariantsTestCase(APITestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media = override_settings(MEDIA_ROOT=media_root.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.user = User.objects.create(email="avatar@test.com", password="testpass")
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("users:profile-detail", kwargs={"pk": self.user.pk})
+
+    def test_avatar_upload_exposes_variant_urls(self):
+        """После загрузки аватара профиль отдает URL его уменьшенных копий."""
+        output = io.BytesIO()
+        Image.new("RGB", (800, 800), "navy").save(output, "JPEG")
+        avatar = SimpleUploadedFile("avatar.jpg", output.getvalue())
+        with patch.object(
+            generate_image_variants, "delay", side_effect=generate_image_variants
+        ):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.patch(
+                    self.url, {"avatar": avatar}, format="multipart"
+                )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Ответ на загрузку собран до построения копий
+        self.assertEqual(response.data["avatar_variants"], {})
+
+        response = self.client.get(self.url)
+        urls = response.data["avatar_variants"]
+        self.assertEqual(set(urls), {"thumbnail", "card", "full"})
+        self.assertTrue(urls["thumbnail"]["webp"].endswith("/thumbnail.webp"))
@@ -11,6 +11,8 @@ from users.views import (
     UserListAPIView,
     PaymentViewSet,
     CoursePaymentAPIView,
+    PaymentStatusAPIView,
+    PaymentReportAPIView,
 )
 from users.apps import UsersConfig
 
@@ -46,6 +48,12 @@ urlpatterns = [
         CoursePaymentAPIView.as_view(),
         name="course-pay",
     ),
+    path("payments/report/", PaymentReportAPIView.as_view(), name="payment-report"),
+    path(
+        "payments/<int:pk>/status/",
+        PaymentStatusAPIView.as_view(),
+        name="payment-status",
+    ),
     path(
         "payment/success/", payment_success, name="payment-success"
     ),  # Теперь обращение через users:payment-success
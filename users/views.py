@@ -1,3 +1,8 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Prefetch, Sum
+from django.db.models.functions import Coalesce
+from django.db.models.functions import TruncMonth, TruncYear
 from django.urls import reverse
 from rest_framework import status
 from drf_yasg import openapi
@@ -10,9 +15,17 @@ from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 
+from materials.mixins import SparseFieldsetViewMixin
 from materials.models import Course
-from users.models import Payment, User
-from users.serializers import PaymentSerializer, UserSerializer, UserProfileSerializer
+from users.models import Payment, PaymentDailyRollup, User
+from users.serializers import (
+    PaymentReportQuerySerializer,
+    PaymentSerializer,
+    UserListFullSerializer,
+    UserListSerializer,
+    UserSerializer,
+    UserProfileSerializer,
+)
 from rest_framework.generics import (
     CreateAPIView,
     RetrieveUpdateAPIView,
@@ -20,23 +33,38 @@ from rest_framework.generics import (
     ListAPIView,
 )
 from users.permissions import IsOwner
+from users.roles import is_moderator
 from drf_yasg.utils import swagger_auto_schema
 
 from users.services import (
-    create_stripe_product,
-    create_stripe_price,
     create_stripe_session,
+    get_or_create_course_price,
+)
+from users.tasks import create_checkout_session
+
+PAYMENT_STATUS_SCHEMA = openapi.Schema(
+    type=openapi.TYPE_OBJECT,
+    properties={
+        "payment_id": openapi.Schema(type=openapi.TYPE_INTEGER),
+        "status": openapi.Schema(
+            type=openapi.TYPE_STRING, enum=["pending", "ready", "failed"]
+        ),
+        "payment_link": openapi.Schema(type=openapi.TYPE_STRING),
+        "status_url": openapi.Schema(type=openapi.TYPE_STRING),
+    },
 )
 
 
 # Create your views here.
-class PaymentViewSet(ModelViewSet):
+class PaymentViewSet(SparseFieldsetViewMixin, ModelViewSet):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ("payment_date", "paid_course", "paid_lesson", "payment_method")
     ordering_fields = ("payment_date",)
     ordering = ("-payment_date",)
+    # Бюджеты SQL-запросов (config.middleware): рост означает N+1
+    query_budget = {"list": 4, "retrieve": 4}
 
     @swagger_auto_schema(
         operation_summary="Список платежей",
@@ -55,9 +83,65 @@ class PaymentViewSet(ModelViewSet):
         return super().retrieve(request, *args, **kwargs)
 
     def get_queryset(self):
+        if getattr(self, "swagger_fake_view", False):
+            # Генерация схемы OpenAPI идет от анонимного запроса
+            return Payment.objects.none()
         if not self.request.user.is_staff:
-            return Payment.objects.filter(user=self.request.user)
-        return super().get_queryset()
+            queryset = Payment.objects.filter(user=self.request.user)
+        else:
+            queryset = super().get_queryset()
+        return self.apply_sparse_fieldset(queryset)
+
+
+class PaymentReportAPIView(APIView):
+    permission_classes = [IsAdminUser]
+    period_functions = {"month": TruncMonth, "year": TruncYear}
+
+    @swagger_auto_schema(
+        operation_summary="Отчет о выручке",
+        operation_description="Выручка по курсам (group_by=course) или по периодам "
+        "(group_by=period, period=day|month|year) из дневных агрегатов платежей. "
+        "Только для администраторов.",
+        tags=["Платежи"],
+        query_serializer=PaymentReportQuerySerializer,
+    )
+    def get(self, request):
+        query = PaymentReportQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+
+        rollups = PaymentDailyRollup.objects.filter(is_paid=params["is_paid"])
+        if "date_from" in params:
+            rollups = rollups.filter(day__gte=params["date_from"])
+        if "date_to" in params:
+            rollups = rollups.filter(day__lte=params["date_to"])
+        if "paid_course" in params:
+            rollups = rollups.filter(paid_course_id=params["paid_course"])
+        if "payment_method" in params:
+            rollups = rollups.filter(payment_method=params["payment_method"])
+
+        if params["group_by"] == "course":
+            group_field = "paid_course"
+            rollups = rollups.values("paid_course")
+        else:
+            group_field = "period"
+            truncate = self.period_functions.get(params["period"])
+            period = truncate("day") if truncate else F("day")
+            rollups = rollups.values(period=period)
+
+        rows = list(
+            rollups.annotate(
+                payments_count=Sum("payments_count"),
+                amount_total=Sum("amount_total"),
+            ).order_by(group_field)
+        )
+        return Response(
+            {
+                "group_by": params["group_by"],
+                "results": rows,
+                "amount_total": sum(row["amount_total"] for row in rows),
+            }
+        )
 
 
 class UserCreateAPIView(CreateAPIView):
@@ -147,11 +231,12 @@ class UserDeleteAPIView(DestroyAPIView):
         return self.request.user
 
 
-class UserListAPIView(ListAPIView):
-    serializer_class = UserSerializer
+class UserListAPIView(SparseFieldsetViewMixin, ListAPIView):
+    serializer_class = UserListSerializer
     permission_classes = [
         IsAuthenticated,
     ]
+    query_budget = 6
     filter_backends = [
         DjangoFilterBackend,
         filters.SearchFilter,
@@ -169,19 +254,49 @@ class UserListAPIView(ListAPIView):
 
     @swagger_auto_schema(
         operation_summary="Список пользователей",
-        operation_description="Список пользователей. Для администраторов/модераторов — все пользователи, для остальных — только свой профиль.",
+        operation_description="Список пользователей. Для администраторов/модераторов — все пользователи, для остальных — только свой профиль. "
+        "Вместо полной истории платежей возвращаются их количество, сумма и последние платежи; "
+        "полная история — с ?payments=full.",
         tags=["Пользователи"],
     )
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
 
     def get_queryset(self):
-        if (
-            self.request.user.is_staff
-            or self.request.user.groups.filter(name="moders").exists()
-        ):
-            return User.objects.all()
-        return User.objects.filter(id=self.request.user.id)
+        if self.request.user.is_staff or is_moderator(self.request.user):
+            queryset = User.objects.all()
+        else:
+            queryset = User.objects.filter(id=self.request.user.id)
+
+        # Сводка по платежам считается в том же запросе, что и пользователи,
+        # а последние платежи подгружаются одним запросом на страницу
+        queryset = self.apply_sparse_fieldset(queryset)
+        if self.is_field_requested("payments_count"):
+            queryset = queryset.annotate(payments_count=Count("payments"))
+        if self.is_field_requested("payments_total"):
+            queryset = queryset.annotate(
+                payments_total=Coalesce(Sum("payments__amount"), 0)
+            )
+        if self.is_field_requested("recent_payments"):
+            recent_payments = Payment.objects.order_by("-payment_date")[
+                : settings.USER_LIST_RECENT_PAYMENTS
+            ]
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    "payments", queryset=recent_payments, to_attr="recent_payments"
+                )
+            )
+        if self.full_payments_requested() and self.is_field_requested("payments"):
+            queryset = queryset.prefetch_related("payments")
+        return queryset
+
+    def full_payments_requested(self):
+        return self.request.query_params.get("payments") == "full"
+
+    def get_serializer_class(self):
+        if self.full_payments_requested():
+            return UserListFullSerializer
+        return super().get_serializer_class()
 
 
 class CoursePaymentAPIView(APIView):
@@ -189,8 +304,25 @@ class CoursePaymentAPIView(APIView):
 
     @swagger_auto_schema(
         operation_summary="Оплата курса",
-        operation_description="Создает платежную сессию Stripe для оплаты курса.",
+        operation_description="Создает платежную сессию Stripe для оплаты курса. "
+        "С ?async=true (или STRIPE_ASYNC_CHECKOUT) сразу возвращает 202 и ссылку "
+        "на статус платежа, а сессия создается в фоне. Заголовок Idempotency-Key "
+        "защищает от повторных платежей при повторе запроса.",
         tags=["Платежи"],
+        manual_parameters=[
+            openapi.Parameter(
+                "async",
+                openapi.IN_QUERY,
+                description="Создать сессию в фоне",
+                type=openapi.TYPE_BOOLEAN,
+            ),
+            openapi.Parameter(
+                "Idempotency-Key",
+                openapi.IN_HEADER,
+                description="Ключ идемпотентности запроса",
+                type=openapi.TYPE_STRING,
+            ),
+        ],
         responses={
             200: openapi.Response(
                 description="Ссылка на оплату",
@@ -201,34 +333,169 @@ class CoursePaymentAPIView(APIView):
                     },
                 ),
             ),
+            202: openapi.Response(
+                description="Платеж принят, сессия создается",
+                schema=PAYMENT_STATUS_SCHEMA,
+            ),
             404: "Курс не найден",
+            422: "Idempotency-Key уже использован для другого курса",
         },
     )
     def post(self, request, course_id):
         course = get_object_or_404(Course, id=course_id)
         user = request.user
+        idempotency_key = request.headers.get("Idempotency-Key") or None
 
-        # Создаем продукт и цену в Stripe
-        product_id = create_stripe_product(course)
-        price_id = create_stripe_price(product_id, course.price)
+        if idempotency_key:
+            payment = Payment.objects.filter(
+                user=user, idempotency_key=idempotency_key
+            ).first()
+            if payment:
+                return self.replay_response(request, payment, course)
 
-        # Создаем сессию оплаты
         success_url = request.build_absolute_uri(reverse("users:payment-success"))
         cancel_url = request.build_absolute_uri(reverse("users:payment-cancel"))
-        session_data = create_stripe_session(price_id, success_url, cancel_url)
 
-        # Сохраняем платеж в БД
-        payment = Payment.objects.create(
-            user=user,
-            paid_course=course,
-            amount=course.price,
-            payment_method="card",
-            stripe_product_id=product_id,
-            stripe_price_id=price_id,
-            stripe_session_id=session_data["session_id"],
-            stripe_payment_link=session_data["payment_link"],
+        if self.use_async_checkout(request):
+            return self.post_async(
+                request, course, idempotency_key, success_url, cancel_url
+            )
+
+        # Продукт и цена Stripe переиспользуются, пока цена курса не изменилась
+        stripe_price = get_or_create_course_price(course)
+        product_id = stripe_price.stripe_product_id
+        price_id = stripe_price.stripe_price_id
+
+        # Создаем сессию оплаты; с Idempotency-Key повтор, не заставший
+        # сохраненный платеж, получит от Stripe ту же сессию
+        session_data = create_stripe_session(
+            price_id,
+            success_url,
+            cancel_url,
+            idempotency_key=(
+                f"checkout-session-user-{user.pk}-{idempotency_key}"
+                if idempotency_key
+                else None
+            ),
         )
 
+        # Сохраняем платеж в БД
+        try:
+            with transaction.atomic():
+                Payment.objects.create(
+                    user=user,
+                    paid_course=course,
+                    amount=course.price,
+                    payment_method="card",
+                    stripe_product_id=product_id,
+                    stripe_price_id=price_id,
+                    stripe_session_id=session_data["session_id"],
+                    stripe_payment_link=session_data["payment_link"],
+                    idempotency_key=idempotency_key,
+                )
+        except IntegrityError:
+            if not idempotency_key:
+                raise
+            # Параллельный повтор с тем же ключом успел сохранить свой платеж:
+            # клиент получает его, а созданная здесь сессия не используется
+            payment = Payment.objects.get(user=user, idempotency_key=idempotency_key)
+            return self.replay_response(request, payment, course)
+
         return Response(
             {"payment_link": session_data["payment_link"]}, status=status.HTTP_200_OK
         )
+
+    def use_async_checkout(self, request):
+        return settings.STRIPE_ASYNC_CHECKOUT or request.query_params.get("async") in (
+            "1",
+            "true",
+        )
+
+    def post_async(self, request, course, idempotency_key, success_url, cancel_url):
+        try:
+            with transaction.atomic():
+                payment = Payment.objects.create(
+                    user=request.user,
+                    paid_course=course,
+                    amount=course.price,
+                    payment_method="card",
+                    checkout_status=Payment.CHECKOUT_PENDING,
+                    idempotency_key=idempotency_key,
+                )
+        except IntegrityError:
+            # Параллельный повтор с тем же ключом уже создал платеж
+            payment = Payment.objects.get(
+                user=request.user, idempotency_key=idempotency_key
+            )
+            return self.replay_response(request, payment, course)
+
+        transaction.on_commit(
+            lambda: create_checkout_session.delay(payment.id, success_url, cancel_url)
+        )
+        return self.payment_response(request, payment)
+
+    def replay_response(self, request, payment, course):
+        """Ответ на повтор по Idempotency-Key; ключ от оплаты другого курса отклоняется."""
+        if payment.paid_course_id != course.id:
+            return Response(
+                {"detail": "Idempotency-Key уже использован для оплаты другого курса."},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        return self.payment_response(request, payment)
+
+    def payment_response(self, request, payment):
+        """Ответ для уже принятого платежа (в том числе повтора по Idempotency-Key)."""
+        is_ready = payment.checkout_status == Payment.CHECKOUT_READY
+        if is_ready and not self.use_async_checkout(request):
+            return Response(
+                {"payment_link": payment.stripe_payment_link},
+                status=status.HTTP_200_OK,
+            )
+        return Response(
+            payment_status_data(request, payment),
+            status=status.HTTP_202_ACCEPTED,
+            headers=payment_status_headers(payment),
+        )
+
+
+def payment_status_headers(payment):
+    """Retry-After для клиента, который опрашивает еще не готовый платеж."""
+    if payment.checkout_status == Payment.CHECKOUT_PENDING:
+        return {"Retry-After": str(settings.PAYMENT_STATUS_RETRY_AFTER)}
+    return None
+
+
+def payment_status_data(request, payment):
+    return {
+        "payment_id": payment.id,
+        "status": payment.checkout_status,
+        "payment_link": payment.stripe_payment_link,
+        "status_url": request.build_absolute_uri(
+            reverse("users:payment-status", kwargs={"pk": payment.id})
+        ),
+    }
+
+
+class PaymentStatusAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Статус платежа",
+        operation_description="Статус создания платежной сессии и ссылка на оплату. "
+        "Пока сессия создается, ответ сразу приходит со status=pending и "
+        "заголовком Retry-After: через сколько секунд повторить запрос.",
+        tags=["Платежи"],
+        responses={200: PAYMENT_STATUS_SCHEMA, 404: "Платеж не найден"},
+    )
+    def get(self, request, pk):
+        # Ответ отдается сразу: ожидание в синхронном представлении держало бы
+        # поток воркера все время опроса
+        payment = get_object_or_404(
+            Payment.objects.filter(user=request.user, id=pk).only(
+                "id", "checkout_status", "stripe_payment_link"
+            )
+        )
+        return Response(
+            payment_status_data(request, payment),
+            headers=payment_status_headers(payment),
+        )